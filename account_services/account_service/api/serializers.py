@@ -9,11 +9,16 @@ class BankAccountSerializer(serializers.ModelSerializer):
         
 class pinserializer(serializers.Serializer):
     pin = serializers.IntegerField(write_only=True, required=True)
+    # Transfer grant (see grants.py): the payment being authorised and a grant from an earlier check
+    amount = serializers.DecimalField(max_digits=12, decimal_places=2, min_value=0, required=False)
+    grant = serializers.CharField(required=False, allow_blank=True)
 
 class CardInputSerializer(serializers.Serializer):
     PIN = serializers.CharField(required=True)
     card_number = serializers.CharField(required=True)
     cvv = serializers.CharField(required=True)
+    amount = serializers.DecimalField(max_digits=12, decimal_places=2, min_value=0, required=False)
+    grant = serializers.CharField(required=False, allow_blank=True)
         
 class LoanSerializer(serializers.ModelSerializer):
     class Meta:
@@ -64,5 +69,63 @@ class CreditSerializer(serializers.Serializer):
             raise serializers.ValidationError("Debit amount must be positive.")
         return value
 
+class TransferSerializer(serializers.Serializer):
+    payer_account_number = serializers.CharField(required=True)
+    payee_account_number = serializers.CharField(required=True)
+    amount = serializers.DecimalField(max_digits=12, decimal_places=2, required=True)
+    # Caller's id for this transfer (PaymentRequest id). Makes retries safe: a reference
+    # is applied at most once
+    reference = serializers.CharField(required=False, max_length=64)
+
+    def validate_amount(self, value):
+        if value <= 0:
+            raise serializers.ValidationError("Transfer amount must be positive.")
+        return value
+
+    def validate(self, data):
+        if data['payer_account_number'] == data['payee_account_number']:
+            raise serializers.ValidationError("Payer and payee accounts must be different.")
+        return data
+
+class ReverseTransferSerializer(TransferSerializer):
+    reference = serializers.CharField(required=True, max_length=64)
+
+class TransferBatchRowSerializer(serializers.Serializer):
+    reference = serializers.CharField(required=True)
+    payee_account_number = serializers.CharField(required=True)
+    amount = serializers.DecimalField(max_digits=12, decimal_places=2, required=True)
+
+    def validate_amount(self, value):
+        if value <= 0:
+            raise serializers.ValidationError("Transfer amount must be positive.")
+        return value
+
+class TransferBatchSerializer(serializers.Serializer):
+    payer_account_number = serializers.CharField(required=True)
+    transfers = serializers.ListField(child=TransferBatchRowSerializer(), min_length=1)
+
 class BankSerializer(serializers.Serializer):
-    amount = serializers.DecimalField(max_digits=12, decimal_places=2, required=True)
\ No newline at end of file
+    amount = serializers.DecimalField(max_digits=12, decimal_places=2, required=True)
+
+
+class LoanRepaymentRunSerializer(serializers.Serializer):
+    run_date = serializers.DateField(required=False)
+    after = serializers.UUIDField(required=False)      # keyset cursor: last loan_id of the previous chunk
+    limit = serializers.IntegerField(required=False, min_value=1, max_value=5000, default=500)
+    # Retried run: also report instalments collected since then (a chunk whose response was lost)
+    settled_since = serializers.DateTimeField(required=False)
+
+
+class BalanceSnapshotSerializer(serializers.Serializer):
+    account_numbers = serializers.ListField(child=serializers.CharField(max_length=20),
+                                            allow_empty=False, max_length=5000)
+
+
+class AccountLookupSerializer(serializers.Serializer):
+    account_numbers = serializers.ListField(child=serializers.CharField(max_length=20), required=False, max_length=1000)
+    user_ids = serializers.ListField(child=serializers.IntegerField(), required=False, max_length=1000)
+
+    def validate(self, attrs):
+        if not attrs.get('account_numbers') and not attrs.get('user_ids'):
+            raise serializers.ValidationError("Provide account_numbers and/or user_ids.")
+        return attrs
@@ -16,6 +16,8 @@ urlpatterns = [
     path('loan_operations/', views.GetAndUpdateLoan.as_view(), name='loan_operations'),    #Good
     path('loan_detail/', views.LoanDetailView.as_view(), name='loan_detail'),                      #Good
     path('get_pendingloans/', views.GetPendingLoans.as_view(), name='get_pendingloans'),
+    path('loan_repayments/settle/', views.SettleDueLoanRepayments.as_view(), name='settle_loan_repayments'),
+    path('reconciliation/balances/', views.BalanceSnapshot.as_view(), name='balance_snapshot'),
     path('bankpool_details/', views.BankPoolDetails.as_view(), name='bankpool_details'),                      #Good
     
     path('BankAccountDetails/', views.BankAccountDetails.as_view(), name='BankAccountDetails'),
@@ -30,6 +32,7 @@ urlpatterns = [
     path('staff_block_account/', views.StaffBlockAccount.as_view(), name='staff_block_account'),         #Good
     path('block_card/', views.BlockCard.as_view(), name='block_card'),                 #Good
     path('get_balance/', views.GetBalance.as_view(), name='get_balance'),              #Good
+    path('accounts/lookup/', views.AccountLookup.as_view(), name='account_lookup'),
     
     path('create_ticket/', views.CreateTicket.as_view(), name='create_ticket'),              #Good
     path('fetch_update_ticket/', views.GetAndUpdateTicket.as_view(), name='fetch_update_ticket'),              #Good
@@ -38,6 +41,9 @@ urlpatterns = [
     
     path('debit/', views.DebitAccount.as_view(), name='debit'),
     path('credit/', views.CreditAccount.as_view(), name='credit'),
+    path('transfer/', views.TransferFunds.as_view(), name='transfer'),
+    path('transfer/reverse/', views.ReverseTransfer.as_view(), name='reverse_transfer'),
+    path('transfer_batch/', views.TransferBatch.as_view(), name='transfer_batch'),
     path('debit_bank/', views.DebitBankPool.as_view(), name='debit_bank'),
     path('credit_bank/', views.CreditBankPool.as_view(), name='credit_bank')
 ]
\ No newline at end of file
@@ -1,4 +1,9 @@
+from django.conf import settings
 from django.db import transaction
+from django.utils import timezone
+from dateutil.relativedelta import relativedelta
+import uuid
+from decimal import Decimal
 from django.db.models import Q
 from django.shortcuts import get_object_or_404
 from rest_framework.views import APIView
@@ -12,7 +17,8 @@ from rest_framework import status
 from .serializers import *
 from ..generator import *
 
-from ..utils import encrypt_data, decrypt_data
+from ..utils import encrypt_data, decrypt_data, fingerprint, fingerprints_match
+from .. import balances, bank_pool, grants
 
 
 
@@ -106,10 +112,13 @@ class CreateCard(APIView):
             if Card.objects.filter(user_id=user_id, active=False).exists():  #delete inactive card if it exists
                 Card.objects.filter(user_id=user_id, active=False).delete()
             
+            card_number, cvv = generate_card_number(), generate_cvv()
             Card.objects.create(
                 user_id=user_id,
-                card_number=encrypt_data(generate_card_number()), # Encrypted Card Number
-                cvv=encrypt_data(generate_cvv()),                 # Encrypted CVV
+                card_number=encrypt_data(card_number),            # Encrypted Card Number
+                cvv=encrypt_data(cvv),                            # Encrypted CVV
+                card_fingerprint=fingerprint(card_number),        # Keyed HMAC, for lookups/verification
+                cvv_fingerprint=fingerprint(cvv),
                 PIN= hashed_pin,                                  # Hashed Pin
                 bank_account=acc,
             )
@@ -257,9 +266,10 @@ class BankPoolDetails(APIView):
     queryset = BankPool.objects.all()
     
     def get(self, request, format=None):
-        bank_pool = BankPool.objects.first()
+        # The pool is split into slots (see bank_pool.py): its funds are their sum
         data = {
-            "total_funds": str(bank_pool.total_funds)
+            "total_funds": str(bank_pool.total()),
+            "slots": BankPool.objects.count(),
         }
         
         return Response(data, status=status.HTTP_200_OK) 
@@ -334,29 +344,46 @@ class VerifyCard(APIView):
             input_pin = serializer.validated_data["PIN"]
             input_card_num = serializer.validated_data["card_number"]
             input_cvv = serializer.validated_data["cvv"]
+            amount = serializer.validated_data.get("amount")
+            grant = serializer.validated_data.get("grant")
+            subject = f"card:{card.pk}"
    
-            # 3.1 VERIFY PIN
-            if not check_password(input_pin, card.PIN):
+            # 3.1 VERIFY PIN (a live transfer grant for this card + PIN skips PBKDF2, see grants.py)
+            granted = grants.redeem(grant, subject, user_id, input_pin, amount)
+            if not granted and not check_password(input_pin, card.PIN):
                 return Response({
                     'message': 'Invalid PIN', 
                     'validity': False
                 }, status=status.HTTP_403_FORBIDDEN)
             
-            # 3.2 VERIFY CARD NUMBER    
-            if input_card_num != decrypt_data(card.card_number):
+            # 3.2 VERIFY CARD NUMBER (fingerprint compare; cards not yet backfilled are decrypted)
+            if card.card_fingerprint:
+                card_matches = fingerprints_match(input_card_num, card.card_fingerprint)
+            else:
+                card_matches = input_card_num == decrypt_data(card.card_number)
+            if not card_matches:
                 return Response({
                     'message': 'Invalid Card Number', 
                     'validity': False
                 }, status=status.HTTP_403_FORBIDDEN)
                 
             #3.3 VERIFY CARD CVV    
-            if input_cvv != decrypt_data(card.cvv):
+            if card.cvv_fingerprint:
+                cvv_matches = fingerprints_match(input_cvv, card.cvv_fingerprint)
+            else:
+                cvv_matches = input_cvv == decrypt_data(card.cvv)
+            if not cvv_matches:
                 return Response({
                     'message': 'Invalid cvv', 
                     'validity': False
                 }, status=status.HTTP_403_FORBIDDEN)
                 
             data = {"validity": True}   #ALL CHECKS PASSED, CARD IS VALID
+            if granted:
+                data["grant"] = grant
+            else:
+                data["grant"] = grants.issue(subject, user_id, input_pin, amount)
+                data["grant_expires_in"] = grants.TRANSFER_GRANT_TTL_SECONDS
             return Response({'message': 'Card Verified.', 'data': data}, status=status.HTTP_200_OK)
         
             """
@@ -391,7 +418,9 @@ class VerifyAccountPin(APIView):
         if serializer.is_valid():
             user_id = request.user.id
             
-            input_pin = serializer.validated_data["pin"]
+            input_pin = str(serializer.validated_data["pin"])
+            amount = serializer.validated_data.get("amount")
+            grant = serializer.validated_data.get("grant")
         
             account = BankAccount.objects.filter(user_id=user_id).first()
 
@@ -402,6 +431,12 @@ class VerifyAccountPin(APIView):
             if account.active is False:
                 return Response ({'message': 'Account is blocked.'}, status=status.HTTP_403_FORBIDDEN)
             
+            # A live transfer grant for this account + PIN skips the PBKDF2 check (see grants.py)
+            subject = f"account:{account.account_number}"
+            if grants.redeem(grant, subject, user_id, input_pin, amount):
+                data = {"validity": True, "grant": grant}
+                return Response({'message': 'Valid', 'data': data}, status=status.HTTP_200_OK)
+
             stored_hash = account.PIN
             
             if not check_password(input_pin, stored_hash):
@@ -414,6 +449,8 @@ class VerifyAccountPin(APIView):
             
             data = {
                 "validity": True,
+                "grant": grants.issue(subject, user_id, input_pin, amount),
+                "grant_expires_in": grants.TRANSFER_GRANT_TTL_SECONDS,
             }
 
             return Response({'message': 'Valid', 'data': data}, status=status.HTTP_200_OK)
@@ -445,6 +482,15 @@ class BlockCard(APIView):
         else:
             return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
+def _account_event_data(account):
+    return {
+        "user_id": account.user_id,
+        "account_number": account.account_number,
+        "currency": account.currency,
+        "active": account.active,
+    }
+
+
 class BlockAccount(APIView):    #REVIEW THIS LOGIC
     authentication_classes = [JWTAuthentication]
     permission_classes = [IsAuthenticated,] 
@@ -470,6 +516,7 @@ class BlockAccount(APIView):    #REVIEW THIS LOGIC
             
             account.active = False
             account.save()
+            transaction.on_commit(lambda: publish_BankAccount_updated.apply_async(args=[_account_event_data(account)]))
             return Response({'message': 'Account blocked successfully.'}, status=status.HTTP_200_OK)        
         
         else:
@@ -501,6 +548,7 @@ class StaffBlockAccount(APIView):
             
             account.active = False
             account.save()
+            transaction.on_commit(lambda: publish_BankAccount_updated.apply_async(args=[_account_event_data(account)]))
             return Response({'message': 'Account blocked successfully.'}, status=status.HTTP_200_OK)        
         
         else:
@@ -616,9 +664,7 @@ class DebitBankPool(APIView):
             return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
         
         amount = serializer.validated_data['amount']
-        acc = BankPool.objects.select_for_update().first()
-        acc.total_funds -= amount
-        acc.save()
+        bank_pool.debit(amount)       # One slot, one conditional UPDATE
         return Response({"status": "success"}, status=status.HTTP_200_OK)
         
 
@@ -633,13 +679,15 @@ class CreditBankPool(APIView):
             return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
         
         amount = serializer.validated_data['amount']
-        acc = BankPool.objects.select_for_update().first()
-        acc.total_funds += amount
-        acc.save()
+        bank_pool.credit(amount)      # One slot, one UPDATE
         return Response({"status": "success"}, status=status.HTTP_200_OK)
         
 
 class DebitAccount(APIView):
+    """
+    One conditional UPDATE (see balances.py): the row is locked for that statement only,
+    instead of from select_for_update() until save().
+    """
     authentication_classes = [JWTAuthentication]
     permission_classes = [IsAuthenticated, ]
     
@@ -651,30 +699,25 @@ class DebitAccount(APIView):
         account_number = serializer.validated_data['account_number']
         amount = serializer.validated_data['amount'] # This is now a Decimal
 
+        new_balance, error = balances.debit(account_number, amount)
 
-        # Lock the row (select_for_update), This pauses other transactions trying to touch this specific row
-        account = BankAccount.objects.filter(account_number=account_number).select_for_update().first()
-            
-        if account.active == False:
-            return Response({"error": "Account is blocked"}, status=status.HTTP_403_FORBIDDEN)
- 
-        if account is None:
-            return Response({"error": "Account not found"}, status=status.HTTP_404_NOT_FOUND)
+        if error == balances.NOT_FOUND:
+            return Response({"error": error}, status=status.HTTP_404_NOT_FOUND)
 
+        if error == balances.BLOCKED:
+            return Response({"error": error}, status=status.HTTP_403_FORBIDDEN)
 
-        if account.balance < amount:
+        if error == balances.INSUFFICIENT_FUNDS:
             return Response({
                 "status": "failed", 
-                "message": "Insufficient funds"
+                "message": error
             }, status=status.HTTP_400_BAD_REQUEST)
 
-        account.balance -= amount
-        account.save()
-
-        return Response({"status": "success", "new_balance": str(account.balance)}, status=status.HTTP_200_OK)
+        return Response({"status": "success", "new_balance": str(new_balance)}, status=status.HTTP_200_OK)
     
 
 class CreditAccount(APIView):
+    """One conditional UPDATE, like DebitAccount."""
     authentication_classes = [JWTAuthentication]
     permission_classes = [IsAuthenticated]
     
@@ -688,16 +731,409 @@ class CreditAccount(APIView):
         account_number = serializer.validated_data['account_number']
         amount = serializer.validated_data['amount'] # This is now a Decimal
 
-        #Lock the row (select_for_update), This pauses other transactions trying to touch this specific row
-        account = BankAccount.objects.filter(account_number=account_number).select_for_update().first()
-        
-        if account.active == False:
-                return Response({"error": "Account is blocked"}, status=status.HTTP_403_FORBIDDEN)
+        new_balance, error = balances.credit(account_number, amount)
+
+        if error == balances.NOT_FOUND:
+            return Response({"error": error}, status=status.HTTP_404_NOT_FOUND)
+
+        if error == balances.BLOCKED:
+            return Response({"error": error}, status=status.HTTP_403_FORBIDDEN)
+
+        return Response({"status": "success", "new_balance": str(new_balance)}, status=status.HTTP_200_OK)
+
+
+def _is_staff(user):
+    """Staff are flagged on their User by the Identity_service.staff.created consumer."""
+    return bool(user.is_staff)
+
+
+def _is_service(user, setting_name):
+    """True for the Identity user configured in `setting_name`; nobody is, while it is unset."""
+    service_user_id = getattr(settings, setting_name, None)
+    return service_user_id is not None and user.id == service_user_id
 
-        if account is None:
-            return Response({"error": "Account not found"}, status=status.HTTP_404_NOT_FOUND)
 
-        account.balance += amount
-        account.save()
+def _lock_accounts(*account_numbers):
+    """select_for_update() the given accounts in account_number order; returns {number: account}."""
+    return {
+        acc.account_number: acc
+        for acc in BankAccount.objects.select_for_update()
+                                      .filter(account_number__in=account_numbers)
+                                      .order_by('account_number')
+    }
 
-        return Response({"status": "success", "new_balance": str(account.balance)}, status=status.HTTP_200_OK)
+
+class TransferFunds(APIView):
+    """
+    Debits the payer and credits the payee in ONE database transaction.
+    Replaces the debit -> credit -> (refund) sequence of HTTP calls made by the payment service.
+    """
+    authentication_classes = [JWTAuthentication]
+    permission_classes = [IsAuthenticated]
+
+    @transaction.atomic
+    def post(self, request):
+        serializer = TransferSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+        payer_number = serializer.validated_data['payer_account_number']
+        payee_number = serializer.validated_data['payee_account_number']
+        amount = serializer.validated_data['amount'] # This is now a Decimal
+        reference = serializer.validated_data.get('reference')
+
+        # Lock BOTH rows, always in account_number order, so two opposite transfers
+        # (A -> B and B -> A) can never deadlock waiting on each other
+        accounts = _lock_accounts(payer_number, payee_number)
+        payer = accounts.get(payer_number)
+        payee = accounts.get(payee_number)
+
+        if payer is None or payee is None:
+            return Response({"status": "failed", "message": "Account not found"}, status=status.HTTP_404_NOT_FOUND)
+
+        # Retry of a reference we already saw (checked under the account locks, so two
+        # concurrent retries cannot both get past this)
+        if reference:
+            record = TransferRecord.objects.filter(reference=reference).first()
+            if record is not None and record.applied and not record.reversed:
+                return Response({"status": "success", "duplicate": True}, status=status.HTTP_200_OK)
+            if record is not None:
+                return Response({"status": "failed", "message": "Transfer was reversed"},
+                                status=status.HTTP_409_CONFLICT)
+
+        if payer.active == False or payee.active == False:
+            return Response({"status": "failed", "message": "Account is blocked"}, status=status.HTTP_403_FORBIDDEN)
+
+        if payer.balance < amount:
+            return Response({
+                "status": "failed",
+                "message": "Insufficient funds"
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        payer.balance -= amount
+        payee.balance += amount
+        payer.save(update_fields=['balance'])
+        payee.save(update_fields=['balance'])
+
+        if reference:
+            TransferRecord.objects.create(reference=reference, payer_account_number=payer_number,
+                                          payee_account_number=payee_number, amount=amount)
+
+        return Response({"status": "success", "new_balance": str(payer.balance)}, status=status.HTTP_200_OK)
+
+
+class ReverseTransfer(APIView):
+    """
+    Compensation for the payment saga: undoes the transfer with the given reference.
+    Idempotent. If the transfer never landed, a tombstone is left so a late retry of it
+    is refused instead of moving money after its reversal.
+    """
+    authentication_classes = [JWTAuthentication]
+    permission_classes = [IsAuthenticated]
+
+    @transaction.atomic
+    def post(self, request):
+        serializer = ReverseTransferSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+        payer_number = serializer.validated_data['payer_account_number']
+        payee_number = serializer.validated_data['payee_account_number']
+        reference = serializer.validated_data['reference']
+
+        # Same lock order as TransferFunds, so a reversal and a late transfer serialise
+        accounts = _lock_accounts(payer_number, payee_number)
+        record = TransferRecord.objects.filter(reference=reference).first()
+
+        if record is None:
+            TransferRecord.objects.create(reference=reference, payer_account_number=payer_number,
+                                          payee_account_number=payee_number,
+                                          amount=serializer.validated_data['amount'],
+                                          applied=False, reversed=True, reversed_at=timezone.now())
+            return Response({"status": "success", "reversed": False,
+                             "message": "Transfer was never applied"}, status=status.HTTP_200_OK)
+
+        if record.reversed:
+            return Response({"status": "success", "reversed": record.applied, "duplicate": True},
+                            status=status.HTTP_200_OK)
+
+        payer = accounts.get(record.payer_account_number)
+        payee = accounts.get(record.payee_account_number)
+        if payer is None or payee is None:
+            return Response({"status": "failed", "message": "Account not found"}, status=status.HTTP_404_NOT_FOUND)
+
+        if payee.balance < record.amount:
+            return Response({"status": "failed", "message": "Payee has insufficient funds to reverse"},
+                            status=status.HTTP_409_CONFLICT)
+
+        payee.balance -= record.amount
+        payer.balance += record.amount
+        payer.save(update_fields=['balance'])
+        payee.save(update_fields=['balance'])
+
+        record.reversed = True
+        record.reversed_at = timezone.now()
+        record.save(update_fields=['reversed', 'reversed_at'])
+
+        return Response({"status": "success", "reversed": True}, status=status.HTTP_200_OK)
+
+
+class TransferBatch(APIView):
+    """
+    Settles many payer -> payee transfers (e.g. a payroll run) in ONE database transaction.
+    Each row succeeds or fails on its own; the response reports a status per row.
+    Like transfer/, every row is keyed by its reference: a retried batch reports the rows
+    that already landed as duplicates instead of paying them again.
+    """
+    authentication_classes = [JWTAuthentication]
+    permission_classes = [IsAuthenticated]
+
+    @transaction.atomic
+    def post(self, request):
+        serializer = TransferBatchSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+        payer_number = serializer.validated_data['payer_account_number']
+        rows = serializer.validated_data['transfers']
+
+        # Lock the payer and every payee in account_number order (same order as TransferFunds)
+        numbers = {payer_number} | {row['payee_account_number'] for row in rows}
+        accounts = _lock_accounts(*numbers)
+        payer = accounts.get(payer_number)
+
+        if payer is None:
+            return Response({"status": "failed", "message": "Account not found"}, status=status.HTTP_404_NOT_FOUND)
+
+        if payer.active == False:
+            return Response({"status": "failed", "message": "Account is blocked"}, status=status.HTTP_403_FORBIDDEN)
+
+        # Rows already seen (checked under the account locks, one query for the whole batch)
+        records = {record.reference: record for record in
+                   TransferRecord.objects.filter(reference__in=[row['reference'] for row in rows])}
+
+        results = []
+        touched = {}
+        applied = []
+        for row in rows:
+            payee = accounts.get(row['payee_account_number'])
+            amount = row['amount']
+
+            record = records.get(row['reference'])
+            if record is not None and record.applied and not record.reversed:
+                results.append({"reference": row['reference'], "status": "success", "duplicate": True})
+                continue
+            if record is not None:
+                results.append({"reference": row['reference'], "status": "failed", "message": "Transfer was reversed"})
+                continue
+
+            if payee is None or payee.account_number == payer_number:
+                results.append({"reference": row['reference'], "status": "failed", "message": "Account not found"})
+                continue
+
+            if payee.active == False:
+                results.append({"reference": row['reference'], "status": "failed", "message": "Account is blocked"})
+                continue
+
+            if payer.balance < amount:
+                results.append({"reference": row['reference'], "status": "failed", "message": "Insufficient funds"})
+                continue
+
+            payer.balance -= amount
+            payee.balance += amount
+            touched[payer.account_number] = payer
+            touched[payee.account_number] = payee
+            record = TransferRecord(reference=row['reference'], payer_account_number=payer_number,
+                                    payee_account_number=payee.account_number, amount=amount)
+            records[row['reference']] = record      # The same reference twice in one batch is paid once
+            applied.append(record)
+            results.append({"reference": row['reference'], "status": "success"})
+
+        # One UPDATE round for every account that moved, instead of a save() per row
+        if touched:
+            BankAccount.objects.bulk_update(list(touched.values()), ['balance'])
+            TransferRecord.objects.bulk_create(applied, batch_size=1000)
+
+        return Response({"status": "success", "new_balance": str(payer.balance), "results": results},
+                        status=status.HTTP_200_OK)
+
+
+def _settled_loan_rows(since):
+    """Result rows for the instalments collected since `since`, rebuilt from their TransferRecords."""
+    records = list(TransferRecord.objects.filter(payee_account_number="BANKPOOL", reference__startswith="loan:",
+                                                 created_at__gte=since, applied=True, reversed=False)
+                   .order_by('created_at'))
+    user_ids = dict(Loan.objects.filter(loan_id__in={record.reference.split(':')[1] for record in records})
+                                .values_list('loan_id', 'user_id'))
+    rows = []
+    for record in records:
+        _, loan_id, due_date = record.reference.split(':')
+        rows.append({
+            "reference": record.reference,
+            "loan_id": loan_id,
+            "user_id": user_ids.get(uuid.UUID(loan_id)),
+            "account_number": record.payer_account_number,
+            "amount": str(record.amount),
+            "due_date": due_date,
+            "status": "success",
+            "replayed": True,
+        })
+    return rows
+
+
+class SettleDueLoanRepayments(APIView):
+    """
+    Daily loan repayment run, ONE CHUNK per call (the payment service's scheduled job loops
+    over chunks with the `after` cursor). Every approved loan with an instalment due on or
+    before run_date is debited in bulk and one BankPool slot is credited ONCE with the chunk total.
+    Paid instalments advance next_repayment_date in the same transaction, so re-running a
+    day never charges them twice; borrowers without funds are reported and stay due.
+    A retried run passes `settled_since`: its first chunk then also reports (as "replayed")
+    the instalments collected since then, so a chunk whose response was lost is not lost with it.
+    Only staff and the loan engine's service user may start a run.
+    """
+    authentication_classes = [JWTAuthentication]
+    permission_classes = [IsAuthenticated]
+
+    @transaction.atomic
+    def post(self, request):
+        if not (_is_staff(request.user) or _is_service(request.user, 'LOAN_ENGINE_SERVICE_USER_ID')):
+            return Response({"status": "failed", "message": "Staff only"}, status=status.HTTP_403_FORBIDDEN)
+
+        serializer = LoanRepaymentRunSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+        run_date = serializer.validated_data.get('run_date') or timezone.now().date()
+        after = serializer.validated_data.get('after')
+        limit = serializer.validated_data['limit']
+        settled_since = serializer.validated_data.get('settled_since')
+        replayed = _settled_loan_rows(settled_since) if settled_since and not after else []
+
+        loans = Loan.objects.select_for_update().filter(loan_status='approved', paid_off=False,
+                                                        next_repayment_date__lte=run_date)
+        if after:
+            loans = loans.filter(loan_id__gt=after)
+        loans = list(loans.order_by('loan_id')[:limit])
+
+        if not loans:
+            return Response({"status": "success", "run_date": run_date, "collected": "0.00",
+                             "results": replayed, "next_cursor": None}, status=status.HTTP_200_OK)
+
+        accounts = _lock_accounts(*{loan.account_number for loan in loans})
+
+        results, paid, records = list(replayed), [], []
+        collected = Decimal('0.00')
+
+        for loan in loans:
+            account = accounts.get(loan.account_number)
+            due_date = loan.next_repayment_date
+            instalment = min(loan.monthly_repayment, loan.amount_to_repay - loan.amount_repaid).quantize(Decimal('0.01'))
+            row = {
+                "reference": f"loan:{loan.loan_id}:{due_date.isoformat()}",
+                "loan_id": str(loan.loan_id),
+                "user_id": loan.user_id,
+                "account_number": loan.account_number,
+                "amount": str(instalment),
+                "due_date": due_date,
+            }
+
+            if account is None or account.active == False:
+                row.update(status="failed", message="Account not found or blocked")
+            elif account.balance < instalment:
+                row.update(status="failed", message="Insufficient funds")
+            else:
+                account.balance -= instalment
+                collected += instalment
+                loan.amount_repaid += instalment
+                loan.next_repayment_date = due_date + relativedelta(months=+1)
+                if loan.amount_repaid >= loan.amount_to_repay:
+                    loan.paid_off = True
+                    loan.next_repayment_date = None
+                paid.append(loan)
+                records.append(TransferRecord(reference=row["reference"], payer_account_number=loan.account_number,
+                                              payee_account_number="BANKPOOL", amount=instalment))
+                row["status"] = "success"
+            results.append(row)
+
+        # Bulk writes: one UPDATE batch per table, one BankPool slot update for the whole chunk
+        BankAccount.objects.bulk_update([accounts[loan.account_number] for loan in paid], ['balance'], batch_size=500)
+        Loan.objects.bulk_update(paid, ['amount_repaid', 'next_repayment_date', 'paid_off'], batch_size=500)
+        TransferRecord.objects.bulk_create(records, batch_size=500)
+        if collected:
+            bank_pool.credit(collected)
+
+        return Response({
+            "status": "success",
+            "run_date": run_date,
+            "collected": str(collected),
+            "results": results,
+            "next_cursor": str(loans[-1].loan_id) if len(loans) == limit else None,
+        }, status=status.HTTP_200_OK)
+
+
+class BalanceSnapshot(APIView):
+    """
+    Balances of a chunk of accounts in one query, for the ledger's reconciliation job (or staff).
+    Accounts that do not exist are simply absent from `balances`.
+    """
+    authentication_classes = [JWTAuthentication]
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request):
+        if not (_is_staff(request.user) or _is_service(request.user, 'RECONCILIATION_SERVICE_USER_ID')):
+            return Response({"status": "failed", "message": "Staff only"}, status=status.HTTP_403_FORBIDDEN)
+
+        serializer = BalanceSnapshotSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+        balances = dict(BankAccount.objects.filter(account_number__in=serializer.validated_data['account_numbers'])
+                                           .values_list('account_number', 'balance'))
+        return Response({"balances": {number: str(balance) for number, balance in balances.items()}},
+                        status=status.HTTP_200_OK)
+
+
+class AccountLookup(APIView):
+    """
+    Balance, status and currency of many accounts (by account number and/or user id) in ONE
+    query, for staff screens that list customers instead of one get_balance call per row.
+    Customers only ever get their own account back; unknown accounts are listed in `missing`.
+    """
+    authentication_classes = [JWTAuthentication]
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request):
+        serializer = AccountLookupSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+        account_numbers = set(serializer.validated_data.get('account_numbers', []))
+        user_ids = set(serializer.validated_data.get('user_ids', []))
+
+        wanted = Q()
+        if account_numbers:
+            wanted |= Q(account_number__in=account_numbers)
+        if user_ids:
+            wanted |= Q(user_id__in=user_ids)
+        accounts = BankAccount.objects.filter(wanted)
+        if not _is_staff(request.user):
+            accounts = accounts.filter(user_id=request.user.id)
+
+        rows = list(accounts.order_by('account_number')
+                    .values('account_number', 'user_id', 'balance', 'currency', 'active'))
+        found_numbers = {row['account_number'] for row in rows}
+        found_users = {row['user_id'] for row in rows}
+
+        data = [{
+            'account_number': row['account_number'],
+            'user_id': row['user_id'],
+            'balance': str(row['balance']),
+            'currency': row['currency'],
+            'status': 'active' if row['active'] else 'blocked',
+        } for row in rows]
+        missing = {
+            'account_numbers': sorted(account_numbers - found_numbers),
+            'user_ids': sorted(user_ids - found_users),
+        }
+        return Response({"status": "success", "accounts": data, "missing": missing}, status=status.HTTP_200_OK)
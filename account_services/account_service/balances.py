@@ -0,0 +1,85 @@
+# account_service/balances.py
+"""
+Balance mutation engine: every change to BankAccount.balance is ONE conditional statement
+
+    UPDATE ... SET balance = balance - x
+     WHERE account_number = ? AND active AND balance >= x
+    RETURNING balance
+
+so the row lock is held for that statement only, not for a read / check-in-Python / save()
+round trip, and save() no longer rewrites every column. The affected row count decides
+success. Where the backend supports RETURNING (PostgreSQL, SQLite >= 3.35) the new balance
+comes back from the same statement; elsewhere it is read right after.
+"""
+from decimal import Decimal
+
+from django.db import connection
+from django.db.models import F
+
+from .models import BankAccount
+
+NOT_FOUND = "Account not found"
+BLOCKED = "Account is blocked"
+INSUFFICIENT_FUNDS = "Insufficient funds"
+
+CENT = Decimal('0.01')
+
+
+def _supports_update_returning():
+    if connection.vendor == 'postgresql':
+        return True
+    if connection.vendor == 'sqlite':
+        import sqlite3
+        return sqlite3.sqlite_version_info >= (3, 35, 0)
+    return False
+
+
+def _update_returning(account_number, delta, minimum):
+    qn = connection.ops.quote_name
+    sql = (f"UPDATE {qn(BankAccount._meta.db_table)} SET {qn('balance')} = {qn('balance')} + %s "
+           f"WHERE {qn('account_number')} = %s AND {qn('active')} = %s")
+    params = [delta, account_number, True]
+    if minimum is not None:
+        sql += f" AND {qn('balance')} >= %s"
+        params.append(minimum)
+    sql += f" RETURNING {qn('balance')}"
+
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        row = cursor.fetchone()
+    return None if row is None else Decimal(str(row[0])).quantize(CENT)
+
+
+def _update(account_number, delta, minimum):
+    accounts = BankAccount.objects.filter(account_number=account_number, active=True)
+    if minimum is not None:
+        accounts = accounts.filter(balance__gte=minimum)
+    if not accounts.update(balance=F('balance') + delta):
+        return None
+    return BankAccount.objects.values_list('balance', flat=True).get(account_number=account_number)
+
+
+def _failure_reason(account_number):
+    """Why a conditional update touched no row (one indexed read, only on the failure path)."""
+    state = BankAccount.objects.filter(account_number=account_number).values_list('active', flat=True).first()
+    if state is None:
+        return NOT_FOUND
+    return BLOCKED if not state else INSUFFICIENT_FUNDS
+
+
+def _apply(account_number, delta, minimum=None):
+    apply = _update_returning if _supports_update_returning() else _update
+    new_balance = apply(account_number, delta, minimum)
+    if new_balance is None:
+        return None, _failure_reason(account_number)
+    return new_balance, None
+
+
+def debit(account_number, amount):
+    """Returns (new_balance, None) or (None, NOT_FOUND | BLOCKED | INSUFFICIENT_FUNDS)."""
+    return _apply(account_number, -amount, minimum=amount)
+
+
+def credit(account_number, amount):
+    """Returns (new_balance, None) or (None, NOT_FOUND | BLOCKED)."""
+    return _apply(account_number, amount)
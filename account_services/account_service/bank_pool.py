@@ -0,0 +1,123 @@
+# account_service/bank_pool.py
+"""
+The bank's pool is split into BANK_POOL_SLOTS BankPool rows ("slots"); its funds are the sum
+of the slots.
+
+Every disbursement / repayment moves money on ONE slot, chosen by hashing its key (stable per
+key) or at random, with one conditional UPDATE. Concurrent pool movements therefore spread
+over N row locks instead of all queueing on a single row.
+
+  * credit   always lands on its slot.
+  * debit    UPDATE ... WHERE slot = s AND total_funds >= x. When the slot has run low it is
+             rebalanced: every slot is locked in slot order (the only place more than one slot
+             is ever locked, so there is no lock-order deadlock) and funds are moved into it
+             from the fullest slots.
+  * compact  (periodic, task account.bankpool.compact) spreads the total evenly over the slots
+             again, and folds slots beyond BANK_POOL_SLOTS back in when the count is lowered.
+"""
+import random
+import zlib
+from decimal import Decimal, ROUND_DOWN
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Sum
+from django.utils import timezone
+
+from .models import BankPool
+
+BANK_POOL_SLOTS = getattr(settings, 'BANK_POOL_SLOTS', 16)
+
+CENT = Decimal('0.01')
+
+
+def slot_for(key=None):
+    """Hash-chosen slot for `key`, a random slot without one."""
+    if key is None:
+        return random.randrange(BANK_POOL_SLOTS)
+    return zlib.crc32(str(key).encode()) % BANK_POOL_SLOTS
+
+
+def ensure_slots():
+    """Creates the missing slots empty, so the pool's total does not change."""
+    BankPool.objects.bulk_create([BankPool(slot=slot, total_funds=Decimal('0.00')) for slot in range(BANK_POOL_SLOTS)],
+                                 ignore_conflicts=True)
+
+
+def total():
+    return BankPool.objects.aggregate(total=Sum('total_funds'))['total'] or Decimal('0.00')
+
+
+def _move(slot, delta, minimum=None):
+    pool = BankPool.objects.filter(slot=slot)
+    if minimum is not None:
+        pool = pool.filter(total_funds__gte=minimum)
+    return pool.update(total_funds=F('total_funds') + delta, last_updated=timezone.now().date())
+
+
+def _lock_slots():
+    ensure_slots()
+    return list(BankPool.objects.select_for_update().order_by('slot'))
+
+
+def _rebalance_into(slot, amount):
+    """
+    Tops `slot` up to `amount` plus an even share of what the rest of the pool holds, taking
+    from the fullest slots first. Must run inside a transaction.
+    """
+    slots = _lock_slots()
+    target = next(pool for pool in slots if pool.slot == slot)
+    funds = sum((pool.total_funds for pool in slots), Decimal('0.00'))
+    wanted = amount + (max(funds - amount, Decimal('0.00')) / len(slots)).quantize(CENT, rounding=ROUND_DOWN)
+
+    for donor in sorted(slots, key=lambda pool: pool.total_funds, reverse=True):
+        shortfall = wanted - target.total_funds
+        if shortfall <= 0:
+            break
+        if donor is target or donor.total_funds <= 0:
+            continue
+        moved = min(shortfall, donor.total_funds)
+        donor.total_funds -= moved
+        target.total_funds += moved
+
+    BankPool.objects.bulk_update(slots, ['total_funds'])
+
+
+def credit(amount, key=None):
+    """Adds `amount` to one slot; returns the slot used."""
+    slot = slot_for(key)
+    if not _move(slot, amount):
+        ensure_slots()
+        _move(slot, amount)
+    return slot
+
+
+def debit(amount, key=None):
+    """Takes `amount` from one slot, rebalancing it first if it has run low; returns the slot used."""
+    slot = slot_for(key)
+    if _move(slot, -amount, minimum=amount):
+        return slot
+
+    with transaction.atomic():
+        _rebalance_into(slot, amount)
+        # Like the single-row pool, a debit is not refused when the whole pool is short
+        _move(slot, -amount)
+    return slot
+
+
+def compact():
+    """Spreads the pool evenly over BANK_POOL_SLOTS slots; extra slots are folded in and deleted."""
+    with transaction.atomic():
+        slots = _lock_slots()
+        funds = sum((pool.total_funds for pool in slots), Decimal('0.00'))
+        keep = [pool for pool in slots if pool.slot < BANK_POOL_SLOTS]
+
+        share = (funds / len(keep)).quantize(CENT, rounding=ROUND_DOWN)
+        for pool in keep:
+            pool.total_funds = share
+        keep[0].total_funds += funds - share * len(keep)      # Rounding remainder
+
+        BankPool.objects.bulk_update(keep, ['total_funds'])
+        folded, _ = BankPool.objects.filter(slot__gte=BANK_POOL_SLOTS).delete()
+
+    return {"slots": len(keep), "folded": folded, "total_funds": str(funds)}
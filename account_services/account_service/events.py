@@ -0,0 +1,34 @@
+# account_service/events.py
+"""
+Event publishing shared by every task in this service.
+
+Instead of opening a broker connection per message (`with current_app.connection()`),
+publishers borrow a producer from Celery's per-process producer pool, so connections
+and channels are created once and reused. Exchanges are declared once per channel.
+
+The same module is kept in every service that publishes from tasks (Identity, account, ledger);
+the payment service publishes through its outbox relay instead.
+"""
+from celery import current_app
+
+RETRY_POLICY = {'max_retries': 5, 'interval_start': 0, 'interval_step': 2}
+
+
+def _declare_once(producer, exchange):
+    # kombu remembers what has been declared on this connection, so this only
+    # hits the broker the first time a pooled channel sees the exchange
+    producer.maybe_declare(exchange, retry=True, **RETRY_POLICY)
+
+
+def publish(exchange, routing_key, event_data):
+    """Publishes ONE event on a pooled producer. Raises if the broker stays unreachable."""
+    with current_app.producer_pool.acquire(block=True) as producer:
+        _declare_once(producer, exchange)
+        producer.publish(
+            event_data,
+            exchange=exchange,
+            routing_key=routing_key,
+            serializer='json',
+            retry=True,
+            retry_policy=RETRY_POLICY,
+        )
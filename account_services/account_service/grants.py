@@ -0,0 +1,81 @@
+# account_service/grants.py
+"""
+Transfer authorisation grants.
+
+A PIN check is a PBKDF2 run (check_password), the most expensive thing this service does.
+After one successful check VerifyAccountPin / VerifyCard issue a grant: a signed token for a
+TransferGrant row that is bound to the account (or card), the user, a keyed fingerprint of
+the PIN (under its own PIN_FINGERPRINT_KEY), an expiry, a number of uses and a cumulative amount ceiling.
+
+The payment workers send the grant with their next checks for that account. Redeeming it is
+a signature check plus ONE conditional UPDATE
+
+    UPDATE ... SET uses_left = uses_left - 1, amount_left = amount_left - x
+     WHERE grant_id = ? AND subject = ? AND user_id = ? AND pin_fingerprint = ?
+       AND uses_left > 0 AND amount_left >= x AND expires_at > now
+
+instead of PBKDF2. The PIN is still required every time: a grant only skips the hashing.
+A grant that is expired, used up, over its ceiling or presented with another PIN is simply
+not redeemed; the full check runs and, when it passes, issues a fresh grant.
+"""
+from datetime import timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.core import signing
+from django.db.models import F
+from django.utils import timezone
+
+from .models import TransferGrant
+from .utils import pin_fingerprint
+
+TRANSFER_GRANT_TTL_SECONDS = getattr(settings, 'TRANSFER_GRANT_TTL_SECONDS', 300)
+TRANSFER_GRANT_USES = getattr(settings, 'TRANSFER_GRANT_USES', 5)
+TRANSFER_GRANT_AMOUNT_CEILING = Decimal(str(getattr(settings, 'TRANSFER_GRANT_AMOUNT_CEILING', '500000.00')))
+
+GRANT_SALT = 'account_service.transfer-grant'
+
+
+def issue(subject, user_id, pin, amount=None):
+    """
+    Grant for `subject` after a successful PIN check; the checked payment (`amount`) counts
+    as its first use. Returns the signed token, or None when nothing would be left to grant.
+    """
+    amount = amount or Decimal('0.00')
+    if TRANSFER_GRANT_USES < 2 or amount >= TRANSFER_GRANT_AMOUNT_CEILING:
+        return None
+
+    grant = TransferGrant.objects.create(
+        subject=subject,
+        user_id=user_id,
+        pin_fingerprint=pin_fingerprint(pin),
+        uses_left=TRANSFER_GRANT_USES - 1,
+        amount_left=TRANSFER_GRANT_AMOUNT_CEILING - amount,
+        expires_at=timezone.now() + timedelta(seconds=TRANSFER_GRANT_TTL_SECONDS),
+    )
+    return signing.dumps({"grant": str(grant.grant_id), "subject": subject}, salt=GRANT_SALT)
+
+
+def redeem(token, subject, user_id, pin, amount=None):
+    """True if `token` is a live grant for this subject, user and PIN that covers `amount` (uses it once)."""
+    if not token:
+        return False
+    try:
+        claims = signing.loads(token, salt=GRANT_SALT, max_age=TRANSFER_GRANT_TTL_SECONDS)
+    except signing.BadSignature:        # Also raised for an expired signature
+        return False
+    if claims.get("subject") != subject:
+        return False
+
+    amount = amount or Decimal('0.00')
+    return bool(TransferGrant.objects.filter(
+        grant_id=claims["grant"], subject=subject, user_id=user_id, pin_fingerprint=pin_fingerprint(pin),
+        uses_left__gt=0, amount_left__gte=amount, expires_at__gt=timezone.now(),
+    ).update(uses_left=F('uses_left') - 1, amount_left=F('amount_left') - amount))
+
+
+def purge_expired():
+    """Deletes expired and used-up grants; returns how many."""
+    deleted, _ = TransferGrant.objects.filter(expires_at__lte=timezone.now()).delete()
+    used_up, _ = TransferGrant.objects.filter(uses_left=0).delete()
+    return deleted + used_up
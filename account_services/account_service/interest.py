@@ -0,0 +1,152 @@
+# account_service/interest.py
+"""
+Daily interest accrual on BankAccount.interest_rate (a yearly percentage).
+
+There is one InterestAccrualRun per day. It streams the active accounts with a positive
+balance in id order, INTEREST_CHUNK_SIZE at a time (keyset on the primary key, one
+.values_list() query per chunk). For each chunk it:
+
+  * computes the day's interest in integer minor units (kobo),
+        balance_kobo * rate_basis_points / (10000 * days_in_year)
+    rounded half-even with divmod, so no float ever touches money,
+  * applies it with ONE set-based UPDATE (balance = balance + CASE id WHEN ... END), so a
+    transfer that lands between the read and the write is never overwritten,
+  * records one InterestAccrual row per account and takes the chunk total out of the BankPool,
+  * advances the run's cursor and totals,
+
+all in one transaction. A run that stops resumes from its last committed chunk: the next
+call for the same day (beat or manage.py accrue_interest) picks up the cursor, and
+(run, account) is unique, so no account is ever credited twice for a day.
+
+Every committed chunk is posted to the ledger as ONE account_service.interest.accrued event
+carrying the chunk total and its rows, keyed by a reference the ledger uses for idempotency.
+"""
+import calendar
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Case, DecimalField, F, Value, When
+from django.utils import timezone
+
+from . import bank_pool
+from .models import BankAccount, InterestAccrual, InterestAccrualRun
+
+INTEREST_CHUNK_SIZE = getattr(settings, 'INTEREST_CHUNK_SIZE', 2000)
+
+
+def _to_minor(amount):
+    return int(amount * 100)
+
+
+def _from_minor(minor):
+    return Decimal(minor).scaleb(-2)
+
+
+def daily_interest_minor(balances_minor, rates_bp, days_in_year):
+    """
+    One day's interest for a whole chunk, in minor units. `rates_bp` are yearly rates in basis
+    points (1.00% = 100). Integer arithmetic throughout, rounded half to even.
+    """
+    denominator = 10000 * days_in_year
+    accrued = []
+    for balance, rate in zip(balances_minor, rates_bp):
+        quotient, remainder = divmod(balance * rate, denominator)
+        if 2 * remainder > denominator or (2 * remainder == denominator and quotient % 2):
+            quotient += 1
+        accrued.append(quotient)
+    return accrued
+
+
+def start_run(run_date=None):
+    """The run for `run_date` (default today), created or resumed from its checkpoint."""
+    run_date = run_date or timezone.now().date()
+    run, created = InterestAccrualRun.objects.get_or_create(run_date=run_date)
+    if not created and run.status == "FAILED":
+        run.status = "RUNNING"
+        run.save(update_fields=['status'])
+    return run
+
+
+def _event_data(run, rows, total, first_id, last_id):
+    return {
+        "event": "account_service.interest.accrued",
+        "reference": f"interest:{run.run_date.isoformat()}:{first_id}-{last_id}",
+        "run_date": run.run_date.isoformat(),
+        "total": str(total),
+        "currency": "NGN",
+        "batch": [
+            {"user_id": row.user_id, "account_number": row.account_number, "amount": str(row.amount)}
+            for row in rows
+        ],
+    }
+
+
+def accrue_chunk(run_id, chunk_size):
+    """
+    Accrues the next chunk of run `run_id` in one transaction and returns (run, accounts read).
+    An empty chunk completes the run.
+    """
+    from .tasks import publish_interest_accrued
+
+    with transaction.atomic():
+        # Locking the run serialises overlapping runs of the same day chunk by chunk
+        run = InterestAccrualRun.objects.select_for_update().get(pk=run_id)
+        if run.status == "COMPLETED":
+            return run, 0
+
+        accounts = list(BankAccount.objects
+                        .filter(id__gt=run.cursor, active=True, balance__gt=0, interest_rate__gt=0)
+                        .order_by('id')
+                        .values_list('id', 'account_number', 'user_id', 'balance', 'interest_rate')[:chunk_size])
+        if not accounts:
+            run.status = "COMPLETED"
+            run.finished_at = timezone.now()
+            run.save(update_fields=['status', 'finished_at'])
+            return run, 0
+
+        days_in_year = 366 if calendar.isleap(run.run_date.year) else 365
+        # Balances in kobo, rates in basis points (both are 2-decimal fields, so x100 is exact)
+        accrued = daily_interest_minor([_to_minor(balance) for _, _, _, balance, _ in accounts],
+                                       [_to_minor(rate) for *_, rate in accounts], days_in_year)
+
+        rows, credits, credited_ids = [], [], []
+        for (account_id, number, user_id, balance, rate), minor in zip(accounts, accrued):
+            if minor <= 0:
+                continue
+            amount = _from_minor(minor)
+            credits.append(When(id=account_id, then=Value(amount)))
+            credited_ids.append(account_id)
+            rows.append(InterestAccrual(run=run, account_number=number, user_id=user_id, balance=balance,
+                                        interest_rate=rate, amount=amount))
+
+        total = _from_minor(sum(accrued))
+        if rows:
+            BankAccount.objects.filter(id__in=credited_ids).update(
+                balance=F('balance') + Case(*credits, default=Value(Decimal('0.00')),
+                                            output_field=DecimalField(max_digits=12, decimal_places=2)))
+            InterestAccrual.objects.bulk_create(rows, batch_size=1000)
+            bank_pool.debit(total, key=f"interest:{run.run_date}")
+
+            event_data = _event_data(run, rows, total, accounts[0][0], accounts[-1][0])
+            transaction.on_commit(lambda: publish_interest_accrued.apply_async(args=[event_data]))
+
+        run.cursor = accounts[-1][0]
+        run.accounts_checked += len(accounts)
+        run.accounts_accrued += len(rows)
+        run.total_accrued += total
+        run.save(update_fields=['cursor', 'accounts_checked', 'accounts_accrued', 'total_accrued'])
+
+    return run, len(accounts)
+
+
+def run_accrual(run, chunk_size=None):
+    """Drives `run` chunk by chunk to the end. On error the run is marked FAILED and can be resumed."""
+    chunk_size = chunk_size or INTEREST_CHUNK_SIZE
+    try:
+        while run.status != "COMPLETED":
+            run, _ = accrue_chunk(run.pk, chunk_size)
+    except Exception as exc:
+        InterestAccrualRun.objects.filter(pk=run.pk).update(status="FAILED", last_error=str(exc))
+        raise
+    return run
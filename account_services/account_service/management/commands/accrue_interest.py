@@ -0,0 +1,24 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand
+
+from account_service.interest import run_accrual, start_run
+
+
+class Command(BaseCommand):
+    help = ("Accrues one day's interest on every bank account in checkpointed chunks. Re-running it "
+            "for the same day resumes that day's run from its last committed chunk.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--date', type=date.fromisoformat, default=None,
+                            help="Day to accrue (YYYY-MM-DD). Defaults to today.")
+        parser.add_argument('--chunk-size', type=int, default=None)
+
+    def handle(self, *args, **options):
+        run = start_run(options['date'])
+        self.stdout.write(f"Interest accrual {run.run_date}: {run.status}, resuming after account id {run.cursor}")
+
+        run = run_accrual(run, chunk_size=options['chunk_size'])
+
+        self.stdout.write(f"Done: {run.total_accrued} accrued on {run.accounts_accrued} of "
+                          f"{run.accounts_checked} accounts")
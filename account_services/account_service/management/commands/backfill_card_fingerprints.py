@@ -0,0 +1,36 @@
+from django.core.management.base import BaseCommand
+
+from account_service.models import Card
+from account_service.utils import decrypt_data, fingerprint
+
+
+class Command(BaseCommand):
+    help = ("Fills Card.card_fingerprint / cvv_fingerprint for cards created before fingerprints existed "
+            "(or, with --all, for every card after CARD_FINGERPRINT_KEY was rotated). Decrypts each card "
+            "once, in chunks; safe to interrupt and re-run.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=500)
+        parser.add_argument('--all', action='store_true',
+                            help="Recompute every card, not only the ones without a fingerprint.")
+
+    def handle(self, *args, **options):
+        cards = Card.objects.order_by('id')
+        if not options['all']:
+            cards = cards.filter(card_fingerprint__isnull=True)
+
+        last_id, updated = 0, 0
+        while True:
+            # Keyset on the primary key: each chunk is one index range scan, committed on its own
+            chunk = list(cards.filter(id__gt=last_id).only('id', 'card_number', 'cvv')[:options['chunk_size']])
+            if not chunk:
+                break
+            for card in chunk:
+                card.card_fingerprint = fingerprint(decrypt_data(card.card_number))
+                card.cvv_fingerprint = fingerprint(decrypt_data(card.cvv))
+            Card.objects.bulk_update(chunk, ['card_fingerprint', 'cvv_fingerprint'])
+            last_id = chunk[-1].id
+            updated += len(chunk)
+            self.stdout.write(f"{updated} cards fingerprinted")
+
+        self.stdout.write(f"Done: {updated} cards fingerprinted")
@@ -0,0 +1,27 @@
+# Generated by Django 4.2.25 on 2026-10-18 14:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('account_service', '0004_rename_savings_account_card_bank_account_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TransferRecord',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('reference', models.CharField(max_length=64, unique=True)),
+                ('payer_account_number', models.CharField(max_length=20)),
+                ('payee_account_number', models.CharField(max_length=20)),
+                ('amount', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('applied', models.BooleanField(default=True)),
+                ('reversed', models.BooleanField(default=False)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('reversed_at', models.DateTimeField(blank=True, null=True)),
+            ],
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 4.2.25 on 2026-10-18 15:20
+
+from dateutil.relativedelta import relativedelta
+from django.db import migrations, models
+
+
+def set_next_repayment_dates(apps, schema_editor):
+    # Loans approved before the schedule existed: first instalment one month after start
+    Loan = apps.get_model('account_service', 'Loan')
+    loans = list(Loan.objects.filter(loan_status='approved', paid_off=False, start_date__isnull=False))
+    for loan in loans:
+        loan.next_repayment_date = loan.start_date + relativedelta(months=+1)
+    Loan.objects.bulk_update(loans, ['next_repayment_date'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('account_service', '0005_transferrecord'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='loan',
+            name='amount_repaid',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=10),
+        ),
+        migrations.AddField(
+            model_name='loan',
+            name='next_repayment_date',
+            field=models.DateField(blank=True, db_index=True, null=True),
+        ),
+        migrations.RunPython(set_next_repayment_dates, migrations.RunPython.noop),
+    ]
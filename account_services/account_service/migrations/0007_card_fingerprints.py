@@ -0,0 +1,23 @@
+# Generated by Django 4.2.25 on 2026-10-18 17:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('account_service', '0006_loan_repayment_schedule'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='card',
+            name='card_fingerprint',
+            field=models.CharField(blank=True, editable=False, max_length=64, null=True, unique=True),
+        ),
+        migrations.AddField(
+            model_name='card',
+            name='cvv_fingerprint',
+            field=models.CharField(blank=True, editable=False, max_length=64),
+        ),
+    ]
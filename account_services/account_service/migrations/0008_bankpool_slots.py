@@ -0,0 +1,32 @@
+# Generated by Django 4.2.25 on 2026-10-18 18:05
+
+from django.db import migrations, models
+
+
+def number_existing_pools(apps, schema_editor):
+    # The pool used to be a single row: it becomes slot 0 (any stray rows the next slots)
+    BankPool = apps.get_model('account_service', 'BankPool')
+    for slot, pool in enumerate(BankPool.objects.order_by('id')):
+        pool.slot = slot
+        pool.save(update_fields=['slot'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('account_service', '0007_card_fingerprints'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='bankpool',
+            name='slot',
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+        migrations.RunPython(number_existing_pools, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='bankpool',
+            name='slot',
+            field=models.PositiveSmallIntegerField(default=0, unique=True),
+        ),
+    ]
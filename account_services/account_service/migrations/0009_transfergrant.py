@@ -0,0 +1,27 @@
+# Generated by Django 4.2.25 on 2026-10-18 18:40
+
+from django.db import migrations, models
+import uuid
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('account_service', '0008_bankpool_slots'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TransferGrant',
+            fields=[
+                ('grant_id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('subject', models.CharField(max_length=40)),
+                ('user_id', models.IntegerField()),
+                ('pin_fingerprint', models.CharField(editable=False, max_length=64)),
+                ('uses_left', models.PositiveIntegerField()),
+                ('amount_left', models.DecimalField(decimal_places=2, max_digits=15)),
+                ('expires_at', models.DateTimeField(db_index=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+    ]
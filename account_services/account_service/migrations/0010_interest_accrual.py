@@ -0,0 +1,46 @@
+# Generated by Django 4.2.25 on 2026-10-18 19:30
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('account_service', '0009_transfergrant'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='InterestAccrualRun',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('run_date', models.DateField(unique=True)),
+                ('status', models.CharField(choices=[('RUNNING', 'Running'), ('COMPLETED', 'Completed'), ('FAILED', 'Failed')], default='RUNNING', max_length=10)),
+                ('cursor', models.BigIntegerField(default=0)),
+                ('accounts_checked', models.PositiveIntegerField(default=0)),
+                ('accounts_accrued', models.PositiveIntegerField(default=0)),
+                ('total_accrued', models.DecimalField(decimal_places=2, default=0, max_digits=18)),
+                ('last_error', models.TextField(blank=True)),
+                ('started_at', models.DateTimeField(auto_now_add=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='InterestAccrual',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('account_number', models.CharField(max_length=20)),
+                ('user_id', models.IntegerField()),
+                ('balance', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('interest_rate', models.DecimalField(decimal_places=2, max_digits=5)),
+                ('amount', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('run', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='accruals', to='account_service.interestaccrualrun')),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='interestaccrual',
+            constraint=models.UniqueConstraint(fields=('run', 'account_number'), name='unique_accrual_per_run'),
+        ),
+    ]
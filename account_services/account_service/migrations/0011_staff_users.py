@@ -0,0 +1,25 @@
+# Generated by Django 4.2.25 on 2026-10-18 21:10
+
+from django.conf import settings
+from django.db import migrations
+
+
+def flag_staff_users(apps, schema_editor):
+    # Staff are now recognised by User.is_staff (as in the payment service); carry over the
+    # staff recorded so far as Account(role='staff')
+    Account = apps.get_model('account_service', 'Account')
+    User = apps.get_model(*settings.AUTH_USER_MODEL.split('.'))
+    staff_ids = Account.objects.filter(role='staff').values_list('user_id', flat=True)
+    User.objects.filter(id__in=list(staff_ids)).update(is_staff=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('account_service', '0010_interest_accrual'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RunPython(flag_staff_users, migrations.RunPython.noop),
+    ]
@@ -46,11 +46,92 @@ class BankAccount(models.Model):
 
 
 class BankPool(models.Model):
+    """One slot of the bank's pool; the pool's funds are the sum of the slots (see bank_pool.py)."""
+    slot = models.PositiveSmallIntegerField(unique=True, default=0)
     total_funds = models.DecimalField(max_digits=15, decimal_places=2, default=9999999999999)
     last_updated = models.DateField(auto_now=True)
 
     def __str__(self):
-        return f"Bank Pool with total funds: {self.total_funds}"
+        return f"Bank Pool slot {self.slot} with funds: {self.total_funds}"
+
+class TransferGrant(models.Model):
+    """
+    Short-lived authorisation issued after a successful PIN check (see grants.py). Lets the
+    payment workers re-authorise the same account or card with the same PIN without another
+    PBKDF2 run, within a number of uses, a cumulative amount ceiling and an expiry.
+    """
+    grant_id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    subject = models.CharField(max_length=40)           # "account:<account_number>" or "card:<card id>"
+    user_id = models.IntegerField()
+    pin_fingerprint = models.CharField(max_length=64, editable=False)
+    uses_left = models.PositiveIntegerField()
+    amount_left = models.DecimalField(max_digits=15, decimal_places=2)
+    expires_at = models.DateTimeField(db_index=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"Grant {self.grant_id} for {self.subject}: {self.uses_left} uses, {self.amount_left} left"
+
+
+class InterestAccrualRun(models.Model):
+    """
+    One daily interest accrual over every BankAccount (see interest.py). `cursor` is the last
+    BankAccount id whose chunk has committed, so a run that stops resumes where it left off.
+    """
+    STATUSES = [("RUNNING", "Running"), ("COMPLETED", "Completed"), ("FAILED", "Failed")]
+
+    run_date = models.DateField(unique=True)
+    status = models.CharField(max_length=10, choices=STATUSES, default="RUNNING")
+    cursor = models.BigIntegerField(default=0)
+    accounts_checked = models.PositiveIntegerField(default=0)
+    accounts_accrued = models.PositiveIntegerField(default=0)
+    total_accrued = models.DecimalField(max_digits=18, decimal_places=2, default=0)
+    last_error = models.TextField(blank=True)
+    started_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"Interest accrual {self.run_date} ({self.status}): {self.total_accrued} on {self.accounts_accrued} accounts"
+
+
+class InterestAccrual(models.Model):
+    """Interest credited to one account by one run, with the balance and rate it was computed on."""
+    run = models.ForeignKey(InterestAccrualRun, on_delete=models.CASCADE, related_name="accruals")
+    account_number = models.CharField(max_length=20)
+    user_id = models.IntegerField()
+    balance = models.DecimalField(max_digits=12, decimal_places=2)
+    interest_rate = models.DecimalField(max_digits=5, decimal_places=2)
+    amount = models.DecimalField(max_digits=12, decimal_places=2)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            # An account is never credited twice for the same day, even by overlapping runs
+            models.UniqueConstraint(fields=['run', 'account_number'], name='unique_accrual_per_run'),
+        ]
+
+    def __str__(self):
+        return f"Interest {self.amount} on {self.account_number} ({self.run.run_date})"
+
+
+class TransferRecord(models.Model):
+    """
+    One row per transfer reference (the payment service's PaymentRequest id), written in the
+    same transaction as the balance change. Makes transfer/ safe to retry and lets the
+    payment saga reverse a transfer by reference.
+    """
+    reference = models.CharField(max_length=64, unique=True)
+    payer_account_number = models.CharField(max_length=20)
+    payee_account_number = models.CharField(max_length=20)
+    amount = models.DecimalField(max_digits=12, decimal_places=2)
+    # applied=False: a reversal arrived first; the transfer itself must never run afterwards
+    applied = models.BooleanField(default=True)
+    reversed = models.BooleanField(default=False)
+    created_at = models.DateTimeField(auto_now_add=True)
+    reversed_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"Transfer {self.reference}: {self.payer_account_number} -> {self.payee_account_number} ({self.amount})"
 
 class Card(models.Model):
     user_id = models.IntegerField(unique=True)
@@ -60,6 +141,9 @@ class Card(models.Model):
     ], default='debit')
     expiration_date = models.DateField(default=datetime.now() + timedelta(days=365*3))  # 3 years from now
     cvv = models.CharField(max_length=255, unique=True)
+    # Keyed HMAC fingerprints (utils.fingerprint): verify / look up cards without decrypting
+    card_fingerprint = models.CharField(max_length=64, unique=True, null=True, blank=True, editable=False)
+    cvv_fingerprint = models.CharField(max_length=64, blank=True, editable=False)
     PIN = models.CharField(max_length=255, unique=True)
     issued_date = models.DateField(auto_now_add=True)
     active = models.BooleanField(default=True)
@@ -107,6 +191,9 @@ class Loan(models.Model):
         ('rejected', 'Rejected'),
     ], default='pending')
     paid_off = models.BooleanField(default=False)
+    # Repayment schedule, advanced by the daily repayment run (loan_repayments/settle/)
+    amount_repaid = models.DecimalField(max_digits=10, decimal_places=2, default=0)
+    next_repayment_date = models.DateField(null=True, blank=True, db_index=True)
 
     #Add a clean string representation
     def __str__(self):
@@ -134,10 +221,13 @@ class Loan(models.Model):
             # Only set start date if approved and not already set
             self.start_date = datetime.now().date()
             self.end_date = self.start_date + relativedelta(months=+months)
+            # First instalment falls due one month after approval
+            self.next_repayment_date = self.start_date + relativedelta(months=+1)
         elif self.loan_status == 'pending':
             # Keep dates null until approval
             self.start_date = None
             self.end_date = None
+            self.next_repayment_date = None
 
         super().save(*args, **kwargs)
     
@@ -17,6 +17,7 @@ headers = {
 
 # Define exchanges for outbound events
 from celery import current_app
+from . import events
 account_exchange = Exchange("account_service", type="topic")
 
 
@@ -55,8 +56,12 @@ def consume_staff_created(self, data):   #GOOD
             'username': username, # or whatever unique field you use
             'email': email_value,
             'is_active': True,
+            'is_staff': True,     # The staff rule every service checks (User.is_staff)
         }
     )
+    if not user.is_staff:
+        user.is_staff = True
+        user.save(update_fields=['is_staff'])
     Account.objects.get_or_create(
         user_id=user_id_value,
         role = "staff"
@@ -83,15 +88,8 @@ def _publish_event(task_self, event_data, routing_key):
     exchange = account_exchange
     
     try:
-        with current_app.connection() as conn:
-            producer = conn.Producer(serializer='json')
-            producer.publish(
-                event_data,
-                exchange=exchange,
-                routing_key=routing_key,
-                retry=True,
-                retry_policy={'max_retries': 5, 'interval_start': 0, 'interval_step': 2}
-            )
+        # Pooled producer: no new broker connection per event (see events.py)
+        events.publish(exchange, routing_key, event_data)
         print(f"Published event: {routing_key} -> {event_data}")
     except Exception as exc:
         # Retry the task if publishing fails (e.g., broker down)
@@ -129,6 +127,22 @@ def publish_BankAccount_created(self, acc_data):
     _publish_event(self, event_data, "account_service.current_account.created")
     
 
+@shared_task(name="publish.account_service.BankAccount.updated", bind=True)
+def publish_BankAccount_updated(self, acc_data):
+    """Consumers holding account lookups (e.g. the payment workers' cache) drop the account on this."""
+    event_data = {
+        "event": "account_service.BankAccount.updated",
+        "data": acc_data,
+    }
+    _publish_event(self, event_data, "account_service.BankAccount.updated")
+
+
+@shared_task(name="publish.account_service.interest.accrued", bind=True)
+def publish_interest_accrued(self, event_data):
+    """One committed interest accrual chunk (see interest.py): its total and per-account rows, for the ledger."""
+    _publish_event(self, event_data, "account_service.interest.accrued")
+
+
 @shared_task(name="publish.account_service.loan.updated", bind=True)
 def publish_loan_updated(self, loan_data):
     """
@@ -150,3 +164,33 @@ def publish_loan_updated(self, loan_data):
     _publish_event(self, event_data, "account_service.loan.updated")
     
    
+
+
+#SCHEDULED TASKS
+@shared_task(name="account.bankpool.compact", bind=True, ignore_result=True)
+def compact_bank_pool(self):
+    """Periodic (celery beat): spreads the pool evenly over its slots so debits rarely need a rebalance."""
+    from . import bank_pool
+    summary = bank_pool.compact()
+    print(f"[🏦] BankPool compacted: {summary}")
+    return summary
+
+
+@shared_task(name="account.grants.purge", bind=True, ignore_result=True)
+def purge_transfer_grants(self):
+    """Periodic (celery beat): deletes expired and used-up transfer grants."""
+    from . import grants
+    purged = grants.purge_expired()
+    print(f"[🔑] Purged {purged} transfer grants")
+    return purged
+
+
+@shared_task(name="account.interest.accrue", bind=True, ignore_result=True)
+def accrue_daily_interest(self, run_date=None):
+    """Daily (celery beat): accrues interest on every account, resuming today's run if it stopped."""
+    from datetime import date
+    from . import interest
+    run = interest.start_run(date.fromisoformat(run_date) if run_date else None)
+    run = interest.run_accrual(run)
+    print(f"[💰] Interest accrual {run.run_date}: {run.total_accrued} on {run.accounts_accrued} accounts")
+    return str(run.total_accrued)
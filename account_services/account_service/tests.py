@@ -4,7 +4,9 @@ from rest_framework.test import APITestCase
 from unittest.mock import patch
 from decimal import Decimal
 from django.contrib.auth import get_user_model
-from .models import SavingsAccount, Loan, Card
+from django.test import SimpleTestCase, override_settings
+from .models import SavingsAccount, Loan, Card, BankAccount, BankPool, TransferRecord
+from datetime import date
 
 User = get_user_model()
 
@@ -83,4 +85,456 @@ class AccountServiceTests(APITestCase):
         # Balance should be 1000 (initial) + 5000 (loan) = 6000
         self.assertEqual(self.account.balance, Decimal('6000.00'))
         self.assertEqual(loan.loan_status, 'approved')
-        self.assertIsNotNone(loan.start_date)
\ No newline at end of file
+        self.assertIsNotNone(loan.start_date)
+
+class TransferFundsTests(APITestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='transfer', email='t@acc.com', password='pw')
+        self.payer = BankAccount.objects.create(user_id=self.user.id, account_number="2000000001",
+                                                balance=Decimal('500.00'), PIN='x')
+        self.payee = BankAccount.objects.create(user_id=self.user.id + 1000, account_number="2000000002",
+                                                balance=Decimal('100.00'), PIN='x')
+        self.client.force_authenticate(user=self.user)
+
+    def test_transfer_moves_funds_atomically(self):
+        url = reverse('account_service_api:transfer')
+        data = {"payer_account_number": "2000000001", "payee_account_number": "2000000002", "amount": "200.00"}
+
+        response = self.client.post(url, data, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.payer.refresh_from_db()
+        self.payee.refresh_from_db()
+        self.assertEqual(self.payer.balance, Decimal('300.00'))
+        self.assertEqual(self.payee.balance, Decimal('300.00'))
+
+    def test_transfer_insufficient_funds_leaves_both_balances(self):
+        url = reverse('account_service_api:transfer')
+        data = {"payer_account_number": "2000000001", "payee_account_number": "2000000002", "amount": "900.00"}
+
+        response = self.client.post(url, data, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.payer.refresh_from_db()
+        self.payee.refresh_from_db()
+        self.assertEqual(self.payer.balance, Decimal('500.00'))
+        self.assertEqual(self.payee.balance, Decimal('100.00'))
+
+    def test_retried_reference_is_applied_once(self):
+        url = reverse('account_service_api:transfer')
+        data = {"payer_account_number": "2000000001", "payee_account_number": "2000000002",
+                "amount": "200.00", "reference": "pay-1"}
+
+        self.client.post(url, data, format='json')
+        response = self.client.post(url, data, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.data["duplicate"])
+        self.payer.refresh_from_db()
+        self.assertEqual(self.payer.balance, Decimal('300.00'))
+
+    def test_reverse_before_transfer_blocks_the_late_transfer(self):
+        data = {"payer_account_number": "2000000001", "payee_account_number": "2000000002",
+                "amount": "200.00", "reference": "pay-2"}
+
+        reverse_response = self.client.post(reverse('account_service_api:reverse_transfer'), data, format='json')
+        late_response = self.client.post(reverse('account_service_api:transfer'), data, format='json')
+
+        self.assertFalse(reverse_response.data["reversed"])
+        self.assertEqual(late_response.status_code, status.HTTP_409_CONFLICT)
+        self.payer.refresh_from_db()
+        self.assertEqual(self.payer.balance, Decimal('500.00'))
+
+    def test_retried_batch_pays_each_reference_once(self):
+        url = reverse('account_service_api:transfer_batch')
+        data = {"payer_account_number": "2000000001", "transfers": [
+            {"reference": "row-1", "payee_account_number": "2000000002", "amount": "100.00"},
+            {"reference": "row-2", "payee_account_number": "2000000002", "amount": "50.00"},
+        ]}
+
+        self.client.post(url, data, format='json')
+        response = self.client.post(url, data, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(all(row["duplicate"] for row in response.data["results"]))
+        self.payer.refresh_from_db()
+        self.assertEqual(self.payer.balance, Decimal('350.00'))
+        self.assertEqual(TransferRecord.objects.filter(reference__in=["row-1", "row-2"]).count(), 2)
+
+    def test_batch_row_after_single_transfer_is_a_duplicate(self):
+        self.client.post(reverse('account_service_api:transfer'),
+                         {"payer_account_number": "2000000001", "payee_account_number": "2000000002",
+                          "amount": "100.00", "reference": "row-3"}, format='json')
+
+        response = self.client.post(reverse('account_service_api:transfer_batch'), {
+            "payer_account_number": "2000000001", "transfers": [
+                {"reference": "row-3", "payee_account_number": "2000000002", "amount": "100.00"},
+                {"reference": "row-3", "payee_account_number": "2000000002", "amount": "100.00"},
+            ]}, format='json')
+
+        self.assertEqual([row["status"] for row in response.data["results"]], ["success", "success"])
+        self.payer.refresh_from_db()
+        self.assertEqual(self.payer.balance, Decimal('400.00'))
+
+
+class LoanRepaymentRunTests(APITestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='loanrun', email='l@acc.com', password='pw')
+        self.pool = BankPool.objects.create(total_funds=Decimal('0.00'))
+        self.funded = BankAccount.objects.create(user_id=1, account_number="3000000001", balance=Decimal('500.00'), PIN='x')
+        self.broke = BankAccount.objects.create(user_id=2, account_number="3000000002", balance=Decimal('10.00'), PIN='x')
+        for account in (self.funded, self.broke):
+            Loan.objects.create(user_id=account.user_id, account_number=account.account_number, amount=Decimal('300.00'),
+                                interest_rate=Decimal('0'), duration='3 Months', loan_status='approved')
+        Loan.objects.update(next_repayment_date=date(2026, 1, 1))
+        self.client.force_authenticate(user=self.user)
+        # The run is started by the payment service's loan engine identity
+        service_user = override_settings(LOAN_ENGINE_SERVICE_USER_ID=self.user.id)
+        service_user.enable()
+        self.addCleanup(service_user.disable)
+
+    def test_customers_cannot_start_a_run(self):
+        customer = User.objects.create_user(username='borrower', email='b@acc.com', password='pw')
+        self.client.force_authenticate(user=customer)
+
+        response = self.client.post(reverse('account_service_api:settle_loan_repayments'),
+                                    {"run_date": "2026-01-01"}, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+        self.funded.refresh_from_db()
+        self.assertEqual(self.funded.balance, Decimal('500.00'))
+
+    def test_due_instalments_are_collected_once(self):
+        url = reverse('account_service_api:settle_loan_repayments')
+
+        first = self.client.post(url, {"run_date": "2026-01-01"}, format='json')
+        second = self.client.post(url, {"run_date": "2026-01-01"}, format='json')
+
+        statuses = {row["account_number"]: row["status"] for row in first.data["results"]}
+        self.assertEqual(statuses, {"3000000001": "success", "3000000002": "failed"})
+        # The paid loan moved to next month; only the unpaid one is still due
+        self.assertEqual([row["account_number"] for row in second.data["results"]], ["3000000002"])
+
+        from . import bank_pool
+
+        self.funded.refresh_from_db()
+        self.assertEqual(self.funded.balance, Decimal('400.00'))
+        self.assertEqual(bank_pool.total(), Decimal('100.00'))
+        loan = Loan.objects.get(account_number="3000000001")
+        self.assertEqual(loan.amount_repaid, Decimal('100.00'))
+        self.assertEqual(loan.next_repayment_date, date(2026, 2, 1))
+
+    def test_retried_run_replays_instalments_it_already_collected(self):
+        from datetime import timedelta
+        from django.utils import timezone
+
+        url = reverse('account_service_api:settle_loan_repayments')
+        started = timezone.now() - timedelta(minutes=1)
+        self.client.post(url, {"run_date": "2026-01-01"}, format='json')      # Response "lost"
+
+        retry = self.client.post(url, {"run_date": "2026-01-01", "settled_since": started.isoformat()}, format='json')
+
+        replayed = [row for row in retry.data["results"] if row.get("replayed")]
+        self.assertEqual([row["account_number"] for row in replayed], ["3000000001"])
+        self.assertEqual(replayed[0]["user_id"], 1)
+        self.funded.refresh_from_db()
+        self.assertEqual(self.funded.balance, Decimal('400.00'))
+
+
+class CardFingerprintTests(APITestCase):
+
+    def setUp(self):
+        from django.contrib.auth.hashers import make_password
+        from .utils import encrypt_data, fingerprint
+
+        self.user = User.objects.create_user(username='cardholder', email='c@acc.com', password='pw')
+        account = BankAccount.objects.create(user_id=self.user.id, account_number="4000000001", PIN='x')
+        self.card = Card.objects.create(user_id=self.user.id, card_number=encrypt_data("4111111111111111"),
+                                        cvv=encrypt_data("123"), card_fingerprint=fingerprint("4111111111111111"),
+                                        cvv_fingerprint=fingerprint("123"), PIN=make_password("1234"),
+                                        bank_account=account)
+        self.client.force_authenticate(user=self.user)
+
+    @patch('account_service.api.views.decrypt_data')
+    def test_card_is_verified_without_decryption(self, mock_decrypt):
+        url = reverse('account_service_api:verify_card')
+
+        valid = self.client.post(url, {"PIN": "1234", "card_number": "4111111111111111", "cvv": "123"}, format='json')
+        wrong_cvv = self.client.post(url, {"PIN": "1234", "card_number": "4111111111111111", "cvv": "124"}, format='json')
+
+        self.assertEqual(valid.status_code, status.HTTP_200_OK)
+        self.assertEqual(wrong_cvv.status_code, status.HTTP_403_FORBIDDEN)
+        mock_decrypt.assert_not_called()
+
+    def test_backfill_command_fingerprints_legacy_cards(self):
+        from io import StringIO
+        from django.core.management import call_command
+        from .utils import fingerprint
+
+        Card.objects.filter(pk=self.card.pk).update(card_fingerprint=None, cvv_fingerprint='')
+
+        call_command('backfill_card_fingerprints', stdout=StringIO())
+
+        self.card.refresh_from_db()
+        self.assertEqual(self.card.card_fingerprint, fingerprint("4111111111111111"))
+        self.assertEqual(self.card.cvv_fingerprint, fingerprint("123"))
+
+
+class ConditionalBalanceUpdateTests(APITestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='balances', email='b@acc.com', password='pw')
+        self.account = BankAccount.objects.create(user_id=self.user.id, account_number="5000000001",
+                                                  balance=Decimal('100.00'), PIN='x')
+        self.client.force_authenticate(user=self.user)
+
+    def test_debit_returns_the_new_balance(self):
+        response = self.client.post(reverse('account_service_api:debit'),
+                                    {"account_number": "5000000001", "amount": "40.00"}, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(Decimal(response.data["new_balance"]), Decimal('60.00'))
+        self.account.refresh_from_db()
+        self.assertEqual(self.account.balance, Decimal('60.00'))
+
+    def test_failed_conditions_leave_the_balance_untouched(self):
+        from . import balances
+
+        self.assertEqual(balances.debit("5000000001", Decimal('100.01')), (None, balances.INSUFFICIENT_FUNDS))
+        self.assertEqual(balances.credit("5999999999", Decimal('1.00')), (None, balances.NOT_FOUND))
+        BankAccount.objects.filter(pk=self.account.pk).update(active=False)
+        self.assertEqual(balances.credit("5000000001", Decimal('1.00')), (None, balances.BLOCKED))
+
+        self.account.refresh_from_db()
+        self.assertEqual(self.account.balance, Decimal('100.00'))
+
+
+class BankPoolSlotTests(APITestCase):
+
+    def setUp(self):
+        from . import bank_pool
+
+        self.user = User.objects.create_user(username='pool', email='p@acc.com', password='pw')
+        bank_pool.ensure_slots()
+        BankPool.objects.filter(slot=0).update(total_funds=Decimal('100.00'))
+        self.client.force_authenticate(user=self.user)
+
+    def test_pool_total_is_the_sum_of_the_slots(self):
+        for _ in range(5):
+            self.client.post(reverse('account_service_api:credit_bank'), {"amount": "10.00"}, format='json')
+        self.client.post(reverse('account_service_api:debit_bank'), {"amount": "25.00"}, format='json')
+
+        response = self.client.get(reverse('account_service_api:bankpool_details'))
+
+        self.assertEqual(Decimal(response.data["total_funds"]), Decimal('125.00'))
+        self.assertEqual(response.data["slots"], BankPool.objects.count())
+
+    def test_low_slot_is_rebalanced_before_a_debit(self):
+        from . import bank_pool
+
+        key = next(key for key in range(100) if bank_pool.slot_for(key) != 0)
+        slot = bank_pool.debit(Decimal('30.00'), key=key)
+
+        self.assertEqual(bank_pool.total(), Decimal('70.00'))
+        self.assertFalse(BankPool.objects.filter(total_funds__lt=0).exists())
+        self.assertGreaterEqual(BankPool.objects.get(slot=slot).total_funds, Decimal('0.00'))
+
+    def test_compaction_spreads_funds_and_folds_extra_slots(self):
+        from . import bank_pool
+
+        BankPool.objects.create(slot=bank_pool.BANK_POOL_SLOTS, total_funds=Decimal('0.01'))
+
+        summary = bank_pool.compact()
+
+        self.assertEqual(summary["folded"], 1)
+        self.assertEqual(BankPool.objects.count(), bank_pool.BANK_POOL_SLOTS)
+        self.assertEqual(bank_pool.total(), Decimal('100.01'))
+        funds = sorted(BankPool.objects.values_list('total_funds', flat=True))
+        self.assertLess(funds[-1] - funds[0], Decimal('1.00'))
+
+
+class TransferGrantTests(APITestCase):
+
+    def setUp(self):
+        from django.contrib.auth.hashers import make_password
+
+        self.user = User.objects.create_user(username='granted', email='g@acc.com', password='pw')
+        BankAccount.objects.create(user_id=self.user.id, account_number="6000000001", PIN=make_password("1234"))
+        self.subject = "account:6000000001"
+        self.client.force_authenticate(user=self.user)
+
+    def test_grant_skips_the_pin_hash_on_the_next_check(self):
+        from . import grants
+        from .models import TransferGrant
+        url = reverse('account_service_api:verify_AccountPin')
+
+        first = self.client.post(url, {"pin": 1234, "amount": "50.00"}, format='json')
+        with patch('account_service.api.views.check_password') as mock_check:
+            second = self.client.post(url, {"pin": 1234, "amount": "50.00", "grant": first.data["data"]["grant"]},
+                                      format='json')
+
+        mock_check.assert_not_called()
+        self.assertTrue(second.data["data"]["validity"])
+        grant = TransferGrant.objects.get()
+        self.assertEqual(grant.uses_left, grants.TRANSFER_GRANT_USES - 2)
+        self.assertEqual(grant.amount_left, grants.TRANSFER_GRANT_AMOUNT_CEILING - Decimal('100.00'))
+
+    def test_grant_is_only_redeemed_within_its_bounds(self):
+        from . import grants
+        from .models import TransferGrant
+
+        token = grants.issue(self.subject, self.user.id, "1234", Decimal('10.00'))
+
+        self.assertFalse(grants.redeem(token, self.subject, self.user.id, "9999"))
+        self.assertFalse(grants.redeem(token, "account:6000000002", self.user.id, "1234"))
+        self.assertFalse(grants.redeem(token[:-1], self.subject, self.user.id, "1234"))
+        self.assertFalse(grants.redeem(token, self.subject, self.user.id, "1234", grants.TRANSFER_GRANT_AMOUNT_CEILING))
+        self.assertTrue(grants.redeem(token, self.subject, self.user.id, "1234", Decimal('10.00')))
+
+        TransferGrant.objects.update(uses_left=0)
+        self.assertFalse(grants.redeem(token, self.subject, self.user.id, "1234"))
+        self.assertEqual(grants.purge_expired(), 1)
+
+    def test_grant_pin_is_fingerprinted_under_its_own_key(self):
+        from . import grants
+        from .models import TransferGrant
+        from .utils import fingerprint, pin_fingerprint
+
+        grants.issue(self.subject, self.user.id, "1234", Decimal('10.00'))
+
+        stored = TransferGrant.objects.get().pin_fingerprint
+        self.assertEqual(stored, pin_fingerprint("1234"))
+        self.assertNotEqual(stored, fingerprint("1234"))
+
+
+class AccountLookupTests(APITestCase):
+
+    def setUp(self):
+        from .models import Account
+
+        self.staff = User.objects.create_user(username='staffer', email='s@acc.com', password='pw', is_staff=True)
+        self.customer = User.objects.create_user(username='customer', email='cu@acc.com', password='pw')
+        Account.objects.create(user_id=self.staff.id, role='staff')
+        Account.objects.create(user_id=self.customer.id, role='customer')
+        BankAccount.objects.create(user_id=self.customer.id, account_number="7000000001",
+                                   balance=Decimal('250.00'), PIN='x')
+        BankAccount.objects.create(user_id=9001, account_number="7000000002", balance=Decimal('80.00'),
+                                   PIN='x', active=False)
+        self.url = reverse('account_service_api:account_lookup')
+
+    def test_staff_get_many_accounts_in_one_call(self):
+        self.client.force_authenticate(user=self.staff)
+
+        response = self.client.post(self.url, {"account_numbers": ["7000000001", "7999999999"], "user_ids": [9001]},
+                                    format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        accounts = {row["account_number"]: row for row in response.data["accounts"]}
+        self.assertEqual(accounts["7000000001"]["balance"], "250.00")
+        self.assertEqual(accounts["7000000002"]["status"], "blocked")
+        self.assertEqual(response.data["missing"], {"account_numbers": ["7999999999"], "user_ids": []})
+
+    def test_customers_only_see_their_own_account(self):
+        self.client.force_authenticate(user=self.customer)
+
+        response = self.client.post(self.url, {"account_numbers": ["7000000001", "7000000002"]}, format='json')
+
+        self.assertEqual([row["account_number"] for row in response.data["accounts"]], ["7000000001"])
+
+    @override_settings(RECONCILIATION_SERVICE_USER_ID=None)
+    def test_balance_snapshot_is_staff_only(self):
+        url = reverse('account_service_api:balance_snapshot')
+        data = {"account_numbers": ["7000000001"]}
+
+        self.client.force_authenticate(user=self.customer)
+        refused = self.client.post(url, data, format='json')
+        self.client.force_authenticate(user=self.staff)
+        allowed = self.client.post(url, data, format='json')
+
+        self.assertEqual(refused.status_code, status.HTTP_403_FORBIDDEN)
+        self.assertEqual(allowed.data["balances"], {"7000000001": "250.00"})
+
+    def test_balance_snapshot_allows_the_configured_service_user(self):
+        url = reverse('account_service_api:balance_snapshot')
+        self.client.force_authenticate(user=self.customer)
+
+        with override_settings(RECONCILIATION_SERVICE_USER_ID=self.customer.id):
+            allowed = self.client.post(url, {"account_numbers": ["7000000001"]}, format='json')
+
+        self.assertEqual(allowed.status_code, status.HTTP_200_OK)
+
+
+class InterestAccrualTests(APITestCase):
+
+    def setUp(self):
+        from . import bank_pool
+
+        bank_pool.ensure_slots()
+        BankPool.objects.filter(slot=0).update(total_funds=Decimal('1000000.00'))
+        BankAccount.objects.create(user_id=11, account_number="8000000001", balance=Decimal('1000.00'),
+                                   interest_rate=Decimal('12.00'), PIN='x')
+        BankAccount.objects.create(user_id=12, account_number="8000000002", balance=Decimal('1000.00'),
+                                   interest_rate=Decimal('1.00'), PIN='x')
+        BankAccount.objects.create(user_id=13, account_number="8000000003", balance=Decimal('0.00'), PIN='x')
+
+    def test_interest_is_computed_in_minor_units(self):
+        from .interest import daily_interest_minor
+
+        # 1000.00 at 12% and 1%, 365-day year: 32.88 and 2.74 kobo, rounded half to even
+        self.assertEqual(daily_interest_minor([100000, 100000], [1200, 100], 365), [33, 3])
+        self.assertEqual(daily_interest_minor([365], [5000], 365), [0])          # 0.5 rounds to even
+        self.assertEqual(daily_interest_minor([1095], [5000], 365), [2])         # 1.5 rounds to even
+
+    @patch('account_service.tasks.publish_interest_accrued.apply_async')
+    def test_run_credits_each_account_once_per_day(self, mock_publish):
+        from datetime import date
+        from . import bank_pool, interest
+        from .models import InterestAccrual
+
+        run = interest.run_accrual(interest.start_run(date(2026, 1, 1)), chunk_size=1)
+        interest.run_accrual(interest.start_run(date(2026, 1, 1)), chunk_size=1)
+
+        balances = dict(BankAccount.objects.values_list('account_number', 'balance'))
+        self.assertEqual(balances["8000000001"], Decimal('1000.33'))
+        self.assertEqual(balances["8000000002"], Decimal('1000.03'))
+        self.assertEqual(balances["8000000003"], Decimal('0.00'))
+        self.assertEqual(run.status, "COMPLETED")
+        self.assertEqual(run.total_accrued, Decimal('0.36'))
+        self.assertEqual(InterestAccrual.objects.count(), 2)
+        self.assertEqual(bank_pool.total(), Decimal('999999.64'))
+
+    @patch('account_service.tasks.publish_interest_accrued.apply_async')
+    def test_stopped_run_resumes_from_its_checkpoint(self, mock_publish):
+        from datetime import date
+        from . import interest
+
+        run = interest.start_run(date(2026, 1, 2))
+        interest.accrue_chunk(run.pk, 1)
+        run.refresh_from_db()
+        run.status = "FAILED"
+        run.save()
+
+        run = interest.run_accrual(interest.start_run(date(2026, 1, 2)), chunk_size=1)
+
+        self.assertEqual(run.accounts_accrued, 2)
+        self.assertEqual(BankAccount.objects.get(account_number="8000000001").balance, Decimal('1000.33'))
+
+
+class EventPublishingTests(SimpleTestCase):
+
+    @patch('account_service.events.current_app')
+    def test_publish_borrows_a_pooled_producer(self, app):
+        from kombu import Exchange
+        from . import events
+
+        producer = app.producer_pool.acquire.return_value.__enter__.return_value
+        exchange = Exchange("account_service", type="topic")
+
+        events.publish(exchange, "account_service.account.created", {"id": 1})
+
+        producer.maybe_declare.assert_called_once_with(exchange, retry=True, **events.RETRY_POLICY)
+        producer.publish.assert_called_once()
+        self.assertEqual(producer.publish.call_args.kwargs["routing_key"], "account_service.account.created")
+        self.assertEqual(producer.publish.call_args.args[0], {"id": 1})
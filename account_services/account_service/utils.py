@@ -1,8 +1,13 @@
+import hashlib
+import hmac
+
 from cryptography.fernet import Fernet
 from django.conf import settings
 
 # Load the key ONCE from settings
 cipher = Fernet(settings.ENCRYPTION_KEY.encode())
+fingerprint_key = settings.CARD_FINGERPRINT_KEY.encode()
+pin_fingerprint_key = settings.PIN_FINGERPRINT_KEY.encode()
 
 def encrypt_data(data: str) -> str:
     """
@@ -25,3 +30,21 @@ def decrypt_data(encrypted_data: str) -> str:
     # 2. Decrypt
     # 3. Convert decrypted bytes back to string
     return cipher.decrypt(encrypted_data.encode()).decode()
+
+def fingerprint(data: str) -> str:
+    """
+    Keyed HMAC-SHA256 of a card number or CVV. Deterministic, so it can be indexed and
+    compared, but useless without CARD_FINGERPRINT_KEY (unlike a plain hash of 16 digits).
+    """
+    return hmac.new(fingerprint_key, str(data).strip().encode(), hashlib.sha256).hexdigest()
+
+def fingerprints_match(data: str, expected: str) -> bool:
+    """Constant-time comparison of `data`'s fingerprint with a stored one."""
+    return bool(expected) and hmac.compare_digest(fingerprint(data), expected)
+
+def pin_fingerprint(pin) -> str:
+    """
+    Keyed HMAC-SHA256 of a PIN, under PIN_FINGERPRINT_KEY so that the card fingerprint key
+    alone cannot recover PINs from stored transfer grants.
+    """
+    return hmac.new(pin_fingerprint_key, str(pin).strip().encode(), hashlib.sha256).hexdigest()
@@ -1,7 +1,9 @@
 import os
 
 from celery import Celery, bootsteps
-from .settings import CELERY_BROKER_URL
+from celery.schedules import crontab
+from celery.signals import worker_ready
+from .settings import CELERY_BROKER_URL, BANK_POOL_COMPACT_SECONDS, INTEREST_ACCRUAL_HOUR
 from kombu import Exchange, Queue, Consumer
 
 from celery import current_app
@@ -53,8 +55,10 @@ app.conf.task_queues = [
     #OUTBOUND EVENTS
     Queue('account_service.account.created',account_exchange,  routing_key='account_service.account.created'),
     Queue('account_service.BankAccount.created',account_exchange, routing_key='account_service.BankAccount.created'),
+    Queue('account_service.BankAccount.updated',account_exchange, routing_key='account_service.BankAccount.updated'),
     Queue('account_service.card.created',account_exchange,  routing_key='account_service.card.created'),
     Queue('account_service.loan.updated',account_exchange,  routing_key='account_service.loan.updated'),
+    Queue('account_service.interest.accrued',account_exchange,  routing_key='account_service.interest.accrued'),
 ]
 
 
@@ -67,8 +71,12 @@ app.conf.task_routes = {
                                                 'routing_key': 'account_service.account.created'},
     'publish.account_service.BankAccount.created': {'queue': 'account_service.BankAccount.created',
                                                        'routing_key': 'account_service.BankAccount.created'},
+    'publish.account_service.BankAccount.updated': {'queue': 'account_service.BankAccount.updated',
+                                                       'routing_key': 'account_service.BankAccount.updated'},
     'publish.account_service.loan.updated': {'queue': 'account_service.loan.updated',
                                                        'routing_key': 'account_service.loan.updated'},
+    'publish.account_service.interest.accrued': {'queue': 'account_service.interest.accrued',
+                                                       'routing_key': 'account_service.interest.accrued'},
 
     
     #Inbound Consumer Tasks
@@ -94,6 +102,23 @@ app.conf.task_routes = {
 }
 
 
+# Scheduled jobs (celery -A account_services beat, see docker-compose account_beat)
+app.conf.beat_schedule = {
+    'bank-pool-compaction': {
+        'task': 'account.bankpool.compact',
+        'schedule': BANK_POOL_COMPACT_SECONDS,
+    },
+    'transfer-grant-purge': {
+        'task': 'account.grants.purge',
+        'schedule': crontab(minute=0),
+    },
+    'daily-interest-accrual': {
+        'task': 'account.interest.accrue',
+        'schedule': crontab(hour=INTEREST_ACCRUAL_HOUR, minute=30),
+    },
+}
+
+
 # B. The "Catch-All" Event Queue
 # Listens to "Identity_service.#" -> Everything starting with Identity_service.
 event_router_queue = Queue(
@@ -175,4 +200,14 @@ app.steps['consumer'].add(EventRouter)
 
 @app.task(bind=True, ignore_result=True)
 def debug_task(self):
-    print(f'Request: {self.request!r}')
\ No newline at end of file
+    print(f'Request: {self.request!r}')
+
+
+# Worker metrics (Prometheus): served by the main worker process on METRICS_PORT,
+# aggregated over all pool processes through PROMETHEUS_MULTIPROC_DIR
+@worker_ready.connect
+def start_metrics_server(**kwargs):
+    port = os.environ.get('METRICS_PORT')
+    if port:
+        from account_services.metrics import start_worker_metrics_server
+        start_worker_metrics_server(int(port))
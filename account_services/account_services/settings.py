@@ -8,6 +8,7 @@ from dotenv import load_dotenv
 import dj_database_url
 from datetime import timedelta
 from pathlib import Path
+from django.core.exceptions import ImproperlyConfigured
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 # Updated to use Pathlib for consistency
@@ -36,6 +37,25 @@ ENCRYPTION_KEY = os.environ.get('ENCRYPTION_KEY', 'tjQfTI3CV0cGn1WRyJtijKujr9Kny
 if not ENCRYPTION_KEY and not DEBUG:
     print("WARNING: ENCRYPTION_KEY is missing. Card operations will fail.")
 
+# Keyed HMAC for card number / CVV fingerprints (lookups without decryption). Rotating it
+# means re-running manage.py backfill_card_fingerprints --all. A known key lets anyone with a
+# DB dump brute-force the fingerprints, so only DEBUG runs get a fallback
+CARD_FINGERPRINT_KEY = os.environ.get('CARD_FINGERPRINT_KEY')
+if not CARD_FINGERPRINT_KEY:
+    if not DEBUG:
+        raise ImproperlyConfigured("CARD_FINGERPRINT_KEY must be set when DEBUG is off")
+    CARD_FINGERPRINT_KEY = 'dev-card-fingerprint-key-change-me'
+
+# Keyed HMAC of the PIN stored on transfer grants. A 4-digit PIN falls to 10^4 guesses with the
+# key, so it has its own key (never the card one) and the same DEBUG-only fallback
+PIN_FINGERPRINT_KEY = os.environ.get('PIN_FINGERPRINT_KEY')
+if not PIN_FINGERPRINT_KEY:
+    if not DEBUG:
+        raise ImproperlyConfigured("PIN_FINGERPRINT_KEY must be set when DEBUG is off")
+    PIN_FINGERPRINT_KEY = 'dev-pin-fingerprint-key-change-me'
+if PIN_FINGERPRINT_KEY == CARD_FINGERPRINT_KEY:
+    raise ImproperlyConfigured("PIN_FINGERPRINT_KEY must differ from CARD_FINGERPRINT_KEY")
+
 ALLOWED_HOSTS = os.getenv("ALLOWED_HOSTS", "94.130.183.1,94.130.183.1.nip.io,arhan-financial.duckdns.org,localhost,identity,account,payments,ledger,frontend,gateway").split(",")
 SECURE_PROXY_SSL_HEADER = ('HTTP_X_FORWARDED_PROTO', 'https')
 
@@ -85,6 +105,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'account_services.metrics.MetricsMiddleware',   # first, so it times the whole stack
     'django.middleware.security.SecurityMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware', 
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -150,6 +171,32 @@ CELERY_TASK_REJECT_ON_WORKER_LOST = True
 CELERY_TASK_TRACK_STARTED = True
 CELERY_TASK_DEFAULT_QUEUE = 'account_service.internal'
 
+# BankPool is split into this many slot rows (see account_service/bank_pool.py); the
+# compaction job re-spreads the funds evenly every BANK_POOL_COMPACT_SECONDS
+BANK_POOL_SLOTS = int(os.environ.get('BANK_POOL_SLOTS', 16))
+BANK_POOL_COMPACT_SECONDS = int(os.environ.get('BANK_POOL_COMPACT_SECONDS', 600))
+
+# Transfer grants (account_service/grants.py): issued after a successful PIN check so the
+# next checks with the same PIN skip PBKDF2. Lifetime, uses (including the issuing check)
+# and cumulative amount ceiling
+TRANSFER_GRANT_TTL_SECONDS = int(os.environ.get('TRANSFER_GRANT_TTL_SECONDS', 300))
+TRANSFER_GRANT_USES = int(os.environ.get('TRANSFER_GRANT_USES', 5))
+TRANSFER_GRANT_AMOUNT_CEILING = os.environ.get('TRANSFER_GRANT_AMOUNT_CEILING', '500000.00')
+
+# Daily interest accrual (account_service/interest.py): hour of day it is scheduled (UTC) and
+# accounts per checkpointed chunk
+INTEREST_ACCRUAL_HOUR = int(os.environ.get('INTEREST_ACCRUAL_HOUR', 1))
+INTEREST_CHUNK_SIZE = int(os.environ.get('INTEREST_CHUNK_SIZE', 2000))
+
+# Identity user the ledger's reconciliation job signs its service tokens for; allowed on the
+# staff-only reconciliation endpoints. No default: while unset, only staff get in
+RECONCILIATION_SERVICE_USER_ID = (int(os.environ['RECONCILIATION_SERVICE_USER_ID'])
+                                  if os.environ.get('RECONCILIATION_SERVICE_USER_ID') else None)
+# Identity user the payment service's loan repayment run signs its service tokens for; the only
+# non-staff caller allowed to start a collection run. No default, like the one above
+LOAN_ENGINE_SERVICE_USER_ID = (int(os.environ['LOAN_ENGINE_SERVICE_USER_ID'])
+                               if os.environ.get('LOAN_ENGINE_SERVICE_USER_ID') else None)
+
 
 # ==========================================
 # 5. REST FRAMEWORK
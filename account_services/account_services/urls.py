@@ -16,9 +16,11 @@ Including another URLconf
 """
 from django.contrib import admin
 from django.urls import path, include
+from .metrics import metrics_view
 
 urlpatterns = [
     path('admin/', admin.site.urls),
+    path('metrics', metrics_view, name='metrics'),      # Prometheus scrape target
     path('account_service/', include('account_service.urls')),
     path('account_service_api/', include('account_service.api.urls', namespace='account_service_api')),
 ]
@@ -13,6 +13,7 @@ headers = {
 
 # Define exchanges for outbound events
 from celery import current_app
+from . import events
 
 # Define exchanges for outbound events
 identity_exchange = Exchange("Identity_service", type="topic", durable=True)
@@ -25,15 +26,8 @@ def _publish_event(task_self, event_data, routing_key):
     exchange = identity_exchange
     
     try:
-        with current_app.connection() as conn:
-            producer = conn.Producer(serializer='json')
-            producer.publish(
-                event_data,
-                exchange=identity_exchange,
-                routing_key=routing_key,
-                retry=True,
-                retry_policy={'max_retries': 5, 'interval_start': 0, 'interval_step': 2}
-            )
+        # Pooled producer: no new broker connection per event (see events.py)
+        events.publish(identity_exchange, routing_key, event_data)
         print(f"Published event: {routing_key} -> {event_data}")
     except Exception as exc:
         # Retry the task if publishing fails (e.g., broker down)
@@ -1,9 +1,22 @@
+import time
+
 from fastapi import FastAPI, HTTPException, status
+from prometheus_client import Histogram, make_asgi_app
 from .schemas import TransactionData, FraudCheckResponse
 from .model import detector
 
 app = FastAPI(title="Arhan Fraud Detection Service")
 
+# Prometheus scrape target
+app.mount("/metrics", make_asgi_app())
+
+INFERENCE_SECONDS = Histogram(
+    "fraud_inference_seconds",
+    "Model inference time per fraud check",
+    ["verdict"],
+    buckets=(.0005, .001, .0025, .005, .01, .025, .05, .1, .25, .5, 1),
+)
+
 @app.get("/")
 def health_check():
     return {"status": "active", "service": "fraud-detection"}
@@ -13,7 +26,9 @@ def check_transaction(data: TransactionData):
     print(f"Analyzing Transaction: {data.amount} for User {data.user_id}")
     
     # Run inference
+    start = time.perf_counter()
     is_fraud, score, reason = detector.predict(data.dict())
+    INFERENCE_SECONDS.labels("fraud" if is_fraud else "safe").observe(time.perf_counter() - start)
     
     if is_fraud:
         print(f"FRAUD DETECTED: {reason}")
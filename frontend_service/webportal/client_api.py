@@ -47,6 +47,12 @@ class AccountClient:
         url = f"{ACCOUNT_URL}/account_service_api/get_balance/"
         return requests.get(url, headers=self.headers)
 
+    def lookup_accounts(self, account_numbers=None, user_ids=None):
+        """Balances, status and currency of many accounts in one call (instead of one per row)"""
+        url = f"{ACCOUNT_URL}/account_service_api/accounts/lookup/"
+        payload = {"account_numbers": list(account_numbers or []), "user_ids": list(user_ids or [])}
+        return requests.post(url, json=payload, headers=self.headers)
+
     def create_bank_account(self, data):
         url = f"{ACCOUNT_URL}/account_service_api/create_BankAccount/"
         return requests.post(url, json=data, headers=self.headers)
@@ -141,9 +147,11 @@ class PaymentClient:
         url = f"{PAYMENT_URL}/payment_api/card_payment/"
         return requests.post(url, json=data, headers=self.headers)
     
-    def transfer_history(self):
+    def transfer_history(self, cursor=None, limit=None):
+        """Newest first; pass the returned `next_cursor` back in to fetch the next page"""
         url = f"{PAYMENT_URL}/payment_api/transfer_history/"
-        return requests.get(url, headers=self.headers)
+        params = {k: v for k, v in {"cursor": cursor, "limit": limit}.items() if v}
+        return requests.get(url, params=params, headers=self.headers)
     
     def general_history(self):
         url = f"{PAYMENT_URL}/payment_api/general_history/"
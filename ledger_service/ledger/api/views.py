@@ -9,6 +9,13 @@ from rest_framework import status
 from ..tasks import *
 from rest_framework.permissions import IsAuthenticated
 from rest_framework_simplejwt.authentication import JWTAuthentication
+from django.http import StreamingHttpResponse
+from django.core.serializers.json import DjangoJSONEncoder
+from datetime import date, datetime, timedelta
+from django.utils import timezone
+import csv
+import json
+import itertools
 
 
 """
@@ -117,16 +124,84 @@ class create_transaction(APIView):
         return Response(TransactionSerializer(txn).data, status=201)
     
 
+EXPORT_CHUNK_SIZE = 2000
+EXPORT_FIELDS = ['transaction_id', 'entry_type', 'amount', 'currency', 'user_id', 'created_at']
+
+
+class _Echo:
+    """File-like object for csv.writer: hands each formatted line straight back."""
+    def write(self, value):
+        return value
+
+
+def _day_start(day):
+    return timezone.make_aware(datetime.combine(day, datetime.min.time()))
+
+
+def _parse_date_range(request):
+    """
+    ?start=YYYY-MM-DD&end=YYYY-MM-DD (both optional, end is inclusive) as the datetime bounds
+    [start, end + 1 day), so filtering is a plain range on the created_at index. Raises ValueError.
+    """
+    start = request.query_params.get('start')
+    end = request.query_params.get('end')
+    return (_day_start(date.fromisoformat(start)) if start else None,
+            _day_start(date.fromisoformat(end) + timedelta(days=1)) if end else None)
+
+
+def _stream_export(queryset, fields, export_format, filename):
+    """
+    Streams `queryset` as CSV or NDJSON without ever holding the table in memory:
+    rows come off the DB cursor in chunks of EXPORT_CHUNK_SIZE and are written out one by one.
+    """
+    rows = queryset.values_list(*fields).iterator(chunk_size=EXPORT_CHUNK_SIZE)
+
+    if export_format == 'csv':
+        writer = csv.writer(_Echo())
+        lines = itertools.chain([writer.writerow(fields)], (writer.writerow(row) for row in rows))
+        content_type = 'text/csv'
+    else:
+        lines = (json.dumps(dict(zip(fields, row)), cls=DjangoJSONEncoder) + '\n' for row in rows)
+        content_type = 'application/x-ndjson'
+
+    response = StreamingHttpResponse(lines, content_type=content_type)
+    response['Content-Disposition'] = f'attachment; filename="{filename}.{export_format}"'
+    return response
+
+
 class BankLogs(APIView):
+    """
+    Ledger credit/debit history (staff reports).
+    ?export=csv|ndjson streams every entry (one row per entry, with its entry_type)
+    instead of building the credit/debit lists in memory,
+    ?start=YYYY-MM-DD&end=YYYY-MM-DD limits it to a date range.
+    """
     authentication_classes = [JWTAuthentication]
     permission_classes = [IsAuthenticated]
     
     def get(self, request):
+        try:
+            start, end = _parse_date_range(request)
+        except ValueError:
+            return Response({"message": "Dates must be in YYYY-MM-DD format"}, status=400)
+
+        entries = LedgerEntry.objects.all()
+        if start:
+            entries = entries.filter(created_at__gte=start)
+        if end:
+            entries = entries.filter(created_at__lt=end)
+
+        export_format = request.query_params.get('export')
+        if export_format in ('csv', 'ndjson'):
+            return _stream_export(entries.order_by('created_at'), EXPORT_FIELDS, export_format, 'ledger_logs')
+        if export_format:
+            return Response({"message": "export must be 'csv' or 'ndjson'"}, status=400)
+
         credit_history = []
         debit_history = []
         
-        credits = LedgerEntry.objects.filter(entry_type='CREDIT').all()
-        debits = LedgerEntry.objects.filter(entry_type='DEBIT').all()
+        credits = entries.filter(entry_type='CREDIT')
+        debits = entries.filter(entry_type='DEBIT')
         
         for credit in credits:
             credit_data = {
@@ -0,0 +1,26 @@
+# ledger/instrumentation.py
+"""
+End-to-end payment latency as seen by the ledger, exported through /metrics
+(see ledger_service/metrics.py):
+
+    ledger_end_to_end_seconds{event="payment.completed|card.charge|bulk"}
+    API accepted the payment (initiated_at_ts) -> ledger entries committed
+"""
+import time
+
+from ledger_service import metrics  # noqa: F401  sets up PROMETHEUS_MULTIPROC_DIR before prometheus_client loads
+from prometheus_client import Histogram
+
+END_TO_END_SECONDS = Histogram(
+    "ledger_end_to_end_seconds",
+    "Time from the payment API accepting a payment to its ledger entries being recorded",
+    ["event"],
+    buckets=(.01, .025, .05, .1, .25, .5, 1, 2.5, 5, 10, 30, 60, 120, 300),
+)
+
+
+def observe_end_to_end(event, initiated_at_ts):
+    if not initiated_at_ts:
+        print("[⚠️] No timestamp found in event data")
+        return
+    END_TO_END_SECONDS.labels(event).observe(max(0.0, time.time() - float(initiated_at_ts)))
@@ -0,0 +1,47 @@
+# Generated by Django 4.2.25 on 2026-10-18 16:05
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ledger', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(fields=['is_reconciled', 'id'], name='txn_reconciled_id_idx'),
+        ),
+        migrations.CreateModel(
+            name='ReconciliationRun',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('started_at', models.DateTimeField(auto_now_add=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+                ('status', models.CharField(choices=[('RUNNING', 'Running'), ('COMPLETED', 'Completed'), ('FAILED', 'Failed')], default='RUNNING', max_length=10)),
+                ('phase', models.CharField(choices=[('PAYMENTS', 'Payments vs ledger transactions'), ('LEDGER', 'Ledger transactions without a payment'), ('BALANCES', 'Net ledger movement vs account balances'), ('DONE', 'Done')], default='PAYMENTS', max_length=10)),
+                ('cursor', models.CharField(blank=True, max_length=100)),
+                ('payments_checked', models.PositiveIntegerField(default=0)),
+                ('transactions_reconciled', models.PositiveIntegerField(default=0)),
+                ('accounts_checked', models.PositiveIntegerField(default=0)),
+                ('discrepancy_count', models.PositiveIntegerField(default=0)),
+                ('last_error', models.TextField(blank=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='ReconciliationDiscrepancy',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('MISSING_IN_LEDGER', 'Completed payment with no ledger transaction'), ('AMOUNT_MISMATCH', 'Ledger amount differs from the payment'), ('FAILED_BUT_POSTED', 'Failed payment that was posted to the ledger'), ('MISSING_PAYMENT', 'Ledger transaction with no payment'), ('BALANCE_MISMATCH', 'Account balance differs from net ledger movement'), ('MISSING_ACCOUNT', 'Ledger account unknown to the account service')], max_length=20)),
+                ('reference', models.CharField(blank=True, max_length=100)),
+                ('account_number', models.CharField(blank=True, max_length=20)),
+                ('expected', models.DecimalField(blank=True, decimal_places=2, max_digits=18, null=True)),
+                ('actual', models.DecimalField(blank=True, decimal_places=2, max_digits=18, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('run', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='discrepancies', to='ledger.reconciliationrun')),
+            ],
+        ),
+    ]
@@ -31,6 +31,12 @@ class Transaction(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     is_reconciled = models.BooleanField(default=False)
 
+    class Meta:
+        indexes = [
+            # Reconciliation job: unreconciled transactions in primary key order
+            models.Index(fields=['is_reconciled', 'id'], name='txn_reconciled_id_idx'),
+        ]
+
     def __str__(self):
         return f"Txn {self.reference} for {self.user_id}"
 
@@ -62,9 +68,10 @@ class LedgerEntry(models.Model):
             )
         ]
 
-    def save(self, *args, **kwargs):
+    def seal(self):
         """
         Generate a hash signature (immutable fingerprint) so entries cannot be tampered with.
+        Called by save(); entries written with bulk_create must be sealed first.
         """
         import hashlib, json
         raw = json.dumps({
@@ -75,7 +82,61 @@ class LedgerEntry(models.Model):
             "created_at": self.created_at.isoformat() if self.created_at else "",
         }, sort_keys=True)
         self.immutable_hash = hashlib.sha256(raw.encode()).hexdigest()
+
+    def save(self, *args, **kwargs):
+        self.seal()
         super().save(*args, **kwargs)
 
     def __str__(self):
         return f"{self.entry_type} {self.amount} {self.currency} -> {self.user_id}"
+
+
+class ReconciliationRun(models.Model):
+    """
+    One pass of the three-way reconciliation job (manage.py reconcile, see ledger/reconciliation.py).
+    The phase and cursor are saved after every chunk, so an interrupted run resumes where it stopped.
+    """
+    PHASES = [
+        ("PAYMENTS", "Payments vs ledger transactions"),
+        ("LEDGER", "Ledger transactions without a payment"),
+        ("BALANCES", "Net ledger movement vs account balances"),
+        ("DONE", "Done"),
+    ]
+    STATUSES = [("RUNNING", "Running"), ("COMPLETED", "Completed"), ("FAILED", "Failed")]
+
+    started_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    status = models.CharField(max_length=10, choices=STATUSES, default="RUNNING")
+    phase = models.CharField(max_length=10, choices=PHASES, default="PAYMENTS")
+    cursor = models.CharField(max_length=100, blank=True)
+    payments_checked = models.PositiveIntegerField(default=0)
+    transactions_reconciled = models.PositiveIntegerField(default=0)
+    accounts_checked = models.PositiveIntegerField(default=0)
+    discrepancy_count = models.PositiveIntegerField(default=0)
+    last_error = models.TextField(blank=True)
+
+    def __str__(self):
+        return f"Reconciliation {self.id} - {self.status} at {self.phase} ({self.discrepancy_count} discrepancies)"
+
+
+class ReconciliationDiscrepancy(models.Model):
+    """One line of a reconciliation run's discrepancy report."""
+    KINDS = [
+        ("MISSING_IN_LEDGER", "Completed payment with no ledger transaction"),
+        ("AMOUNT_MISMATCH", "Ledger amount differs from the payment"),
+        ("FAILED_BUT_POSTED", "Failed payment that was posted to the ledger"),
+        ("MISSING_PAYMENT", "Ledger transaction with no payment"),
+        ("BALANCE_MISMATCH", "Account balance differs from net ledger movement"),
+        ("MISSING_ACCOUNT", "Ledger account unknown to the account service"),
+    ]
+
+    run = models.ForeignKey(ReconciliationRun, on_delete=models.CASCADE, related_name="discrepancies")
+    kind = models.CharField(max_length=20, choices=KINDS)
+    reference = models.CharField(max_length=100, blank=True)
+    account_number = models.CharField(max_length=20, blank=True)
+    expected = models.DecimalField(max_digits=18, decimal_places=2, null=True, blank=True)
+    actual = models.DecimalField(max_digits=18, decimal_places=2, null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.kind} {self.reference or self.account_number}: expected {self.expected}, got {self.actual}"
@@ -0,0 +1,161 @@
+# ledger/reconciliation.py
+"""
+Three-way reconciliation: payment service vs ledger vs account-service balances.
+
+    PAYMENTS  stream PaymentRequest rows (keyset pages from the payment service) and match
+              each one against Transaction.reference. Matches are marked is_reconciled.
+    LEDGER    stream the ledger transactions that are still unreconciled: no payment owns them.
+    BALANCES  stream ledger accounts, compute each one's net movement (credits - debits) with
+              one aggregate per chunk and compare opening balance + net movement with the
+              balance the account service holds.
+
+Only one chunk is ever in memory. After every chunk the is_reconciled updates, the new
+discrepancy rows and the run's phase/cursor commit together, so a run that dies (or is
+stopped) resumes from its last committed chunk with manage.py reconcile --resume.
+
+Payments that are still in flight show up as balance mismatches until they settle, so
+the BALANCES phase is best run off-peak.
+"""
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Case, F, Q, Sum, When
+from django.utils import timezone
+
+from ledger.models import LedgerAccount, LedgerEntry, ReconciliationDiscrepancy, ReconciliationRun, Transaction
+from .service_clients import fetch_balances, fetch_payments_page
+
+RECONCILIATION_CHUNK_SIZE = getattr(settings, 'RECONCILIATION_CHUNK_SIZE', 1000)
+OPENING_BALANCE = Decimal(str(getattr(settings, 'RECONCILIATION_OPENING_BALANCE', '1000.00')))
+
+
+def start_run(resume=False):
+    """The unfinished run to resume (if asked for and there is one), otherwise a new run."""
+    run = None
+    if resume:
+        run = ReconciliationRun.objects.filter(status__in=["RUNNING", "FAILED"]).order_by('-id').first()
+    if run is None:
+        return ReconciliationRun.objects.create()
+    run.status = "RUNNING"
+    run.save(update_fields=['status'])
+    return run
+
+
+def _commit_chunk(run, next_phase, cursor, discrepancies, reconciled_refs=(), **counters):
+    with transaction.atomic():
+        if reconciled_refs:
+            run.transactions_reconciled += Transaction.objects.filter(
+                reference__in=reconciled_refs, is_reconciled=False).update(is_reconciled=True)
+        ReconciliationDiscrepancy.objects.bulk_create(discrepancies, batch_size=500)
+        for field, increment in counters.items():
+            setattr(run, field, getattr(run, field) + increment)
+        run.discrepancy_count += len(discrepancies)
+        run.phase = next_phase if not cursor else run.phase
+        run.cursor = cursor or ""
+        run.save()
+
+
+def _debit_totals(transactions):
+    # A transaction's amount is the sum of its DEBIT legs
+    return transactions.annotate(debit_total=Sum('entries__amount', filter=Q(entries__entry_type="DEBIT")))
+
+
+def reconcile_payments_chunk(run, chunk_size):
+    page = fetch_payments_page(after=run.cursor or None, limit=chunk_size)
+    rows = page["data"]
+    posted = dict(_debit_totals(Transaction.objects.filter(reference__in=[row["reference"] for row in rows]))
+                  .values_list('reference', 'debit_total'))
+
+    matched, discrepancies = [], []
+    for row in rows:
+        reference = row["reference"]
+        amount = Decimal(str(row["amount"]))
+        ledger_amount = posted.get(reference)
+
+        if row["status"] == "COMPLETED":
+            if reference not in posted:
+                discrepancies.append(ReconciliationDiscrepancy(run=run, kind="MISSING_IN_LEDGER", reference=reference,
+                                                               expected=amount))
+            elif ledger_amount != amount:
+                discrepancies.append(ReconciliationDiscrepancy(run=run, kind="AMOUNT_MISMATCH", reference=reference,
+                                                               expected=amount, actual=ledger_amount))
+            else:
+                matched.append(reference)
+        elif row["status"] == "FAILED" and reference in posted:
+            discrepancies.append(ReconciliationDiscrepancy(run=run, kind="FAILED_BUT_POSTED", reference=reference,
+                                                           expected=Decimal('0.00'), actual=ledger_amount))
+        # PENDING: still in flight, neither a match nor a discrepancy yet
+
+    _commit_chunk(run, "LEDGER", page.get("next_cursor"), discrepancies, matched, payments_checked=len(rows))
+
+
+def reconcile_ledger_chunk(run, chunk_size):
+    # Only transactions that existed when the run started; the ones already reported in the
+    # PAYMENTS phase (amount mismatch, failed payment) are not reported twice
+    # Interest accruals are posted by the account service, no payment owns them
+    transactions = (Transaction.objects.filter(is_reconciled=False, created_at__lt=run.started_at)
+                    .exclude(reference__startswith="interest:")
+                    .exclude(reference__in=run.discrepancies.values('reference'))
+                    .order_by('id'))
+    if run.cursor:
+        transactions = transactions.filter(id__gt=run.cursor)
+    rows = list(_debit_totals(transactions).values_list('id', 'reference', 'debit_total')[:chunk_size])
+
+    discrepancies = [ReconciliationDiscrepancy(run=run, kind="MISSING_PAYMENT", reference=reference, actual=amount)
+                     for _, reference, amount in rows]
+    cursor = str(rows[-1][0]) if len(rows) == chunk_size else None
+    _commit_chunk(run, "BALANCES", cursor, discrepancies)
+
+
+def reconcile_balances_chunk(run, chunk_size):
+    accounts = list(LedgerAccount.objects.filter(account_number__gt=run.cursor)
+                    .order_by('account_number').values_list('id', 'account_number')[:chunk_size])
+
+    net_movement = dict(
+        LedgerEntry.objects.filter(ledger_account_id__in=[account_id for account_id, _ in accounts])
+        .values('ledger_account_id')
+        .annotate(net=Sum(Case(When(entry_type="CREDIT", then=F('amount')), default=-F('amount'))))
+        .values_list('ledger_account_id', 'net')
+    )
+    balances = fetch_balances([number for _, number in accounts]) if accounts else {}
+
+    discrepancies = []
+    for account_id, number in accounts:
+        expected = OPENING_BALANCE + (net_movement.get(account_id) or Decimal('0.00'))
+        if number not in balances:
+            discrepancies.append(ReconciliationDiscrepancy(run=run, kind="MISSING_ACCOUNT", account_number=number,
+                                                           expected=expected))
+            continue
+        actual = Decimal(balances[number])
+        if actual != expected:
+            discrepancies.append(ReconciliationDiscrepancy(run=run, kind="BALANCE_MISMATCH", account_number=number,
+                                                           expected=expected, actual=actual))
+
+    cursor = accounts[-1][1] if len(accounts) == chunk_size else None
+    _commit_chunk(run, "DONE", cursor, discrepancies, accounts_checked=len(accounts))
+
+
+PHASES = {
+    "PAYMENTS": reconcile_payments_chunk,
+    "LEDGER": reconcile_ledger_chunk,
+    "BALANCES": reconcile_balances_chunk,
+}
+
+
+def run_reconciliation(run, chunk_size=None):
+    """Drives `run` chunk by chunk to the end. On error the run is marked FAILED and can be resumed."""
+    chunk_size = chunk_size or RECONCILIATION_CHUNK_SIZE
+    try:
+        while run.phase != "DONE":
+            PHASES[run.phase](run, chunk_size)
+    except Exception as exc:
+        run.status = "FAILED"
+        run.last_error = str(exc)
+        run.save(update_fields=['status', 'last_error'])
+        raise
+
+    run.status = "COMPLETED"
+    run.finished_at = timezone.now()
+    run.save(update_fields=['status', 'finished_at'])
+    return run
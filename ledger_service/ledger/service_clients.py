@@ -0,0 +1,67 @@
+# ledger/service_clients.py
+"""
+Read-only calls the reconciliation job makes to the payment and account services.
+One pooled session per process; every call is signed with a short-lived service token.
+"""
+import datetime
+
+import jwt
+import requests
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+PAYMENT_SERVICE_BASE_URL = getattr(settings, 'PAYMENT_SERVICE_BASE_URL', 'http://payments:8004')
+ACCOUNT_SERVICE_BASE_URL = getattr(settings, 'ACCOUNT_SERVICE_BASE_URL', 'http://account:8002')
+SERVICE_TIMEOUT = (1, 30)       # (connect, read): a page can carry thousands of rows
+
+
+def get_session():
+    session = requests.Session()
+    # Every call here is a read, so retrying 5xx with backoff is safe
+    retries = Retry(total=3, backoff_factor=0.5, status_forcelist=[502, 503, 504], allowed_methods=None)
+    adapter = HTTPAdapter(max_retries=retries)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
+
+service_session = get_session()
+
+
+def _headers():
+    service_user_id = getattr(settings, 'RECONCILIATION_SERVICE_USER_ID', None)
+    if service_user_id is None:
+        raise ImproperlyConfigured("RECONCILIATION_SERVICE_USER_ID must be set to run reconciliation")
+    now = datetime.datetime.now(datetime.timezone.utc)
+    token = jwt.encode({
+        'token_type': 'access',
+        'user_id': str(service_user_id),
+        'exp': now + datetime.timedelta(seconds=60),
+        'iat': now,
+        'jti': 'service-call-' + str(now.timestamp()),
+    }, settings.JWT_SHARED_SECRET, algorithm='HS256')
+    if isinstance(token, bytes):
+        token = token.decode('utf-8')
+    return {"Authorization": f"Bearer {token}", "Content-Type": "application/json"}
+
+
+def fetch_payments_page(after=None, limit=1000):
+    """One keyset page of the payment service's reconciliation feed: {"data": [...], "next_cursor": ...}."""
+    params = {"limit": limit}
+    if after:
+        params["after"] = after
+    response = service_session.get(f"{PAYMENT_SERVICE_BASE_URL}/payment_api/reconciliation_feed/",
+                                   params=params, headers=_headers(), timeout=SERVICE_TIMEOUT)
+    response.raise_for_status()
+    return response.json()
+
+
+def fetch_balances(account_numbers):
+    """{account_number: "balance"} for the given accounts; unknown accounts are left out."""
+    response = service_session.post(f"{ACCOUNT_SERVICE_BASE_URL}/account_service_api/reconciliation/balances/",
+                                    json={"account_numbers": list(account_numbers)},
+                                    headers=_headers(), timeout=SERVICE_TIMEOUT)
+    response.raise_for_status()
+    return response.json()["balances"]
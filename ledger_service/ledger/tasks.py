@@ -19,6 +19,8 @@ headers = {
 
 # Define exchanges for outbound events
 from celery import current_app
+from . import events
+from .instrumentation import observe_end_to_end
 ledger_exchange = Exchange("ledger", type="topic")
 
 
@@ -172,12 +174,62 @@ def consume_loan_updated(self, data):
     print(f"[loan_updated] Ledger transaction {txn_ref} recorded successfully.")
 
 
+def _post_payment_entries(data):
+    """
+    Records ONE completed payment as a double-entry transaction.
+    Returns False when the reference was already posted (idempotent skip).
+    """
+    ref = data.get("reference")
+    payer_user_id = data.get("payer_user_id")
+    payee_user_id = data.get("payee_user_id")
+    amount = decimal.Decimal(data.get("amount"))
+    currency = data.get("currency")
+
+    txn, created = Transaction.objects.get_or_create(
+        reference=ref,
+        user_id = payer_user_id,
+        description="Payment completed via event"
+    )
+    if not created:
+        print(f"[idempotent-skip] Transaction {ref} already exists.")
+        return False
+
+    payer = LedgerAccount.objects.get(user_id=payer_user_id)
+    payee = LedgerAccount.objects.get(user_id=payee_user_id)
+
+    LedgerEntry.objects.create(
+        user_id = payer_user_id,
+        transaction=txn,
+        ledger_account=payer,
+        entry_type="DEBIT",
+        amount=amount,
+        currency=currency,
+    )
+    LedgerEntry.objects.create(
+        transaction=txn,
+        user_id=payee_user_id,
+        ledger_account=payee,
+        entry_type="CREDIT",
+        amount=amount,
+        currency=currency,
+    )
+    return True
+
+
 @shared_task(name="consume.ledger.payment.completed", bind=True, acks_late=True)
 def consume_payment_completed(self, data):
     """
     Consumer task: handles payment.completed events.
+    Bulk/payroll runs publish ONE event carrying a "batch" list of payments.
     """
 
+    if "batch" in data:
+        with transaction.atomic():
+            posted = sum(1 for item in data["batch"] if _post_payment_entries(item))
+        observe_end_to_end("bulk", data.get("initiated_at_ts"))
+        print(f"Recorded {posted} ledger transactions for batch {data.get('batch_id')}.")
+        return
+
     ref = data.get("reference")
     payer_user_id = data.get("payer_user_id")
     payee_user_id = data.get("payee_user_id")
@@ -215,24 +267,8 @@ def consume_payment_completed(self, data):
             amount=amount,
             currency=currency,
         )
-        # 2. STOP THE CLOCK
-        end_time = time.time()
-        
-        # 3. CALCULATE DURATION
-        start_time = data.get("initiated_at_ts")
-        
-        if start_time:
-            # Calculate difference
-            duration = end_time - float(start_time)
-            
-            # Convert to milliseconds for easier reading
-            duration_ms = duration * 1000
-            
-            print(f"==========================================")
-            print(f"[⏱️] END-TO-END TRANSACTION TIME: {duration_ms:.2f} ms")
-            print(f"==========================================")
-        else:
-            print("[⚠️] No timestamp found in event data")
+        # 2. END-TO-END LATENCY (histogram, see ledger/instrumentation.py)
+        observe_end_to_end("payment.completed", data.get("initiated_at_ts"))
 
         print(f"Recorded ledger transaction {ref} successfully.")
 
@@ -280,30 +316,60 @@ def consume_card_charge(self, data):
             currency=currency,
         )
         
-        # 2. STOP THE CLOCK
-        end_time = time.time()
-        
-        # 3. CALCULATE DURATION
-        start_time = data.get("initiated_at_ts")
-        
-        if start_time:
-            # Calculate difference
-            duration = end_time - float(start_time)
-            
-            # Convert to milliseconds for easier reading
-            duration_ms = duration * 1000
-            
-            print(f"==========================================")
-            print(f"[⏱️] END-TO-END TRANSACTION TIME: {duration_ms:.2f} ms")
-            print(f"==========================================")
-        else:
-            print("[⚠️] No timestamp found in event data")
+        # 2. END-TO-END LATENCY (histogram, see ledger/instrumentation.py)
+        observe_end_to_end("card.charge", data.get("initiated_at_ts"))
 
     print(f"Recorded ledger transaction {ref} successfully.")
 
 
 
 
+@shared_task(name="consume.ledger.interest.accrued", bind=True, acks_late=True)
+def consume_interest_accrued(self, data):
+    """
+    Consumer task: one chunk of the account service's daily interest accrual.
+    Posted as ONE transaction: the bank's account is debited with the chunk total and every
+    account is credited, all entries written with bulk_create.
+    """
+    from django.conf import settings
+
+    ref = data["reference"]
+    currency = data.get("currency", "NGN")
+    payer_user_id = getattr(settings, 'INTEREST_PAYER_USER_ID', 1)
+
+    with transaction.atomic():
+        txn, created = Transaction.objects.get_or_create(
+            reference=ref,
+            defaults={"user_id": payer_user_id, "description": f"Interest accrual {data.get('run_date')}"}
+        )
+        if not created:
+            print(f"[idempotent-skip] Transaction {ref} already exists.")
+            return
+
+        bank = LedgerAccount.objects.get(user_id=payer_user_id)
+        accounts = dict(LedgerAccount.objects.filter(user_id__in=[row["user_id"] for row in data["batch"]])
+                        .values_list('user_id', 'id'))
+
+        entries = []
+        for row in data["batch"]:
+            if row["user_id"] not in accounts:
+                print(f"[interest_accrued] LedgerAccount missing for user_id={row['user_id']}")
+                continue
+            entries.append(LedgerEntry(transaction=txn, user_id=row["user_id"], ledger_account_id=accounts[row["user_id"]],
+                                       entry_type="CREDIT", amount=decimal.Decimal(row["amount"]), currency=currency))
+
+        # The debit covers exactly what was credited, so the transaction always balances
+        total = sum((entry.amount for entry in entries), decimal.Decimal("0.00"))
+        if total:
+            entries.append(LedgerEntry(transaction=txn, user_id=payer_user_id, ledger_account=bank,
+                                       entry_type="DEBIT", amount=total, currency=currency))
+        for entry in entries:
+            entry.seal()
+        LedgerEntry.objects.bulk_create(entries, batch_size=1000)
+
+    print(f"Recorded interest accrual {ref}: {len(entries) - 1 if total else 0} accounts, {total} {currency}.")
+
+
 #PRODUCERS
 def _publish_event(task_self, event_data, routing_key):
     """Internal helper to encapsulate the publishing logic and error handling."""
@@ -312,15 +378,8 @@ def _publish_event(task_self, event_data, routing_key):
     exchange = ledger_exchange
     
     try:
-        with current_app.connection() as conn:
-            producer = conn.Producer(serializer='json')
-            producer.publish(
-                event_data,
-                exchange=exchange,
-                routing_key=routing_key,
-                retry=True,
-                retry_policy={'max_retries': 5, 'interval_start': 0, 'interval_step': 2}
-            )
+        # Pooled producer: no new broker connection per event (see events.py)
+        events.publish(exchange, routing_key, event_data)
         print(f"Published event: {routing_key} -> {event_data}")
     except Exception as exc:
         # Retry the task if publishing fails (e.g., broker down)
@@ -1,3 +1,109 @@
-from django.test import TestCase
+from django.test import SimpleTestCase, TestCase
+from unittest.mock import patch
+from decimal import Decimal
+
+from .models import LedgerAccount, LedgerEntry, Transaction
 
 # Create your tests here.
+
+
+class ReconciliationTests(TestCase):
+
+    def setUp(self):
+        payer = LedgerAccount.objects.create(user_id=1, account_number="1000000001")
+        payee = LedgerAccount.objects.create(user_id=2, account_number="1000000002")
+        txn = Transaction.objects.create(user_id=1, reference="pay-1")
+        LedgerEntry.objects.create(user_id=1, transaction=txn, ledger_account=payer, entry_type="DEBIT", amount=Decimal('50.00'))
+        LedgerEntry.objects.create(user_id=2, transaction=txn, ledger_account=payee, entry_type="CREDIT", amount=Decimal('50.00'))
+
+    @patch('ledger.reconciliation.fetch_balances', return_value={"1000000001": "950.00", "1000000002": "1000.00"})
+    @patch('ledger.reconciliation.fetch_payments_page', return_value={"data": [
+        {"reference": "pay-1", "amount": "50.00", "status": "COMPLETED"},
+        {"reference": "pay-2", "amount": "20.00", "status": "COMPLETED"},
+    ], "next_cursor": None})
+    def test_three_way_run_reconciles_matches_and_reports_the_rest(self, _payments, _balances):
+        from .reconciliation import run_reconciliation, start_run
+
+        run = run_reconciliation(start_run())
+
+        self.assertEqual(run.status, "COMPLETED")
+        self.assertTrue(Transaction.objects.get(reference="pay-1").is_reconciled)
+        report = set(run.discrepancies.values_list('kind', 'reference', 'account_number'))
+        self.assertEqual(report, {("MISSING_IN_LEDGER", "pay-2", ""), ("BALANCE_MISMATCH", "", "1000000002")})
+
+    @patch('ledger.reconciliation.fetch_payments_page', side_effect=ConnectionError("payments down"))
+    def test_failed_run_is_resumed_from_its_checkpoint(self, _payments):
+        from .reconciliation import run_reconciliation, start_run
+
+        with self.assertRaises(ConnectionError):
+            run_reconciliation(start_run())
+
+        resumed = start_run(resume=True)
+        self.assertEqual((resumed.status, resumed.phase), ("RUNNING", "PAYMENTS"))
+
+
+class BankLogsExportTests(TestCase):
+
+    def test_export_streams_the_inclusive_date_range(self):
+        import datetime
+        from django.urls import reverse
+        from rest_framework.test import APIClient
+
+        account = LedgerAccount.objects.create(user_id=1, account_number="1000000001")
+        for reference, created_at in (("a", "2026-01-01T00:00:00"), ("b", "2026-01-01T23:59:59"),
+                                      ("c", "2026-01-02T00:00:00")):
+            txn = Transaction.objects.create(user_id=1, reference=reference)
+            entry = LedgerEntry.objects.create(user_id=1, transaction=txn, ledger_account=account,
+                                               entry_type="CREDIT", amount=Decimal('5.00'))
+            LedgerEntry.objects.filter(pk=entry.pk).update(
+                created_at=datetime.datetime.fromisoformat(created_at).replace(tzinfo=datetime.timezone.utc))
+        client = APIClient()
+        from django.contrib.auth import get_user_model
+        client.force_authenticate(user=get_user_model().objects.create_user(username='reports', password='pw'))
+
+        response = client.get(reverse('ledger_api:ledger_logs'),
+                              {"export": "csv", "start": "2026-01-01", "end": "2026-01-01"})
+
+        lines = b"".join(response.streaming_content).decode().splitlines()
+        self.assertEqual(lines[0].split(","), ["transaction_id", "entry_type", "amount", "currency", "user_id",
+                                               "created_at"])
+        self.assertEqual(len(lines), 3)
+
+
+class InterestAccrualPostingTests(TestCase):
+
+    def test_chunk_is_posted_once_as_a_balanced_transaction(self):
+        from .tasks import consume_interest_accrued
+
+        LedgerAccount.objects.create(user_id=1, account_number="0000000001")
+        LedgerAccount.objects.create(user_id=11, account_number="8000000001")
+        LedgerAccount.objects.create(user_id=12, account_number="8000000002")
+        data = {"reference": "interest:2026-01-01:1-2", "run_date": "2026-01-01", "total": "0.36", "currency": "NGN",
+                "batch": [{"user_id": 11, "account_number": "8000000001", "amount": "0.33"},
+                          {"user_id": 12, "account_number": "8000000002", "amount": "0.03"}]}
+
+        consume_interest_accrued(data)
+        consume_interest_accrued(data)
+
+        entries = LedgerEntry.objects.filter(transaction__reference="interest:2026-01-01:1-2")
+        self.assertEqual(entries.count(), 3)
+        self.assertEqual(entries.get(entry_type="DEBIT").amount, Decimal('0.36'))
+        self.assertTrue(all(entry.immutable_hash for entry in entries))
+
+
+class EventPublishingTests(SimpleTestCase):
+
+    @patch('ledger.events.current_app')
+    def test_publish_borrows_a_pooled_producer(self, app):
+        from kombu import Exchange
+        from . import events
+
+        producer = app.producer_pool.acquire.return_value.__enter__.return_value
+        exchange = Exchange("ledger", type="topic")
+
+        events.publish(exchange, "ledger.entry.created", {"id": 1})
+
+        producer.maybe_declare.assert_called_once_with(exchange, retry=True, **events.RETRY_POLICY)
+        producer.publish.assert_called_once()
+        self.assertEqual(producer.publish.call_args.kwargs["routing_key"], "ledger.entry.created")
+        self.assertEqual(producer.publish.call_args.args[0], {"id": 1})
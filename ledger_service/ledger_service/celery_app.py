@@ -1,6 +1,7 @@
 import os
 
 from celery import Celery, bootsteps
+from celery.signals import worker_ready
 from .settings import CELERY_BROKER_URL
 from kombu import Exchange, Queue, Consumer
 
@@ -164,6 +165,7 @@ class EventRouter(bootsteps.ConsumerStep):
                 'payment.card.charge': 'consume.ledger.card.charge',
                 'payment.loan.updated': 'consume.ledger.loan.updated',
                 'payment.loan.repayment': 'consume.ledger.loan.repayment',
+                'account_service.interest.accrued': 'consume.ledger.interest.accrued',
             }
 
             if routing_key in event_map:
@@ -189,4 +191,14 @@ app.steps['consumer'].add(EventRouter)
 
 @app.task(bind=True, ignore_result=True)
 def debug_task(self):
-    print(f'Request: {self.request!r}')
\ No newline at end of file
+    print(f'Request: {self.request!r}')
+
+
+# Worker metrics (Prometheus): served by the main worker process on METRICS_PORT,
+# aggregated over all pool processes through PROMETHEUS_MULTIPROC_DIR
+@worker_ready.connect
+def start_metrics_server(**kwargs):
+    port = os.environ.get('METRICS_PORT')
+    if port:
+        from ledger_service.metrics import start_worker_metrics_server
+        start_worker_metrics_server(int(port))
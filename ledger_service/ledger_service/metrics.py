@@ -0,0 +1,59 @@
+# ledger_service/metrics.py
+"""
+Prometheus metrics for this service.
+
+GET /metrics serves the web process's metrics (request latency per route plus anything
+the app records). Celery workers serve theirs on METRICS_PORT, started from celery_app.py.
+Prefork workers must set PROMETHEUS_MULTIPROC_DIR so every child process's samples are
+aggregated into the one endpoint.
+"""
+import os
+import time
+
+# Must exist before prometheus_client is imported in multiprocess mode
+_multiproc_dir = os.environ.get("PROMETHEUS_MULTIPROC_DIR")
+if _multiproc_dir:
+    os.makedirs(_multiproc_dir, exist_ok=True)
+
+from django.http import HttpResponse
+from prometheus_client import (CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Histogram,
+                               generate_latest, multiprocess, start_http_server)
+
+REQUEST_LATENCY = Histogram(
+    "http_request_duration_seconds",
+    "HTTP request latency by route template",
+    ["method", "route", "status"],
+)
+
+
+def _registry():
+    if _multiproc_dir:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return registry
+    return REGISTRY
+
+
+class MetricsMiddleware:
+    """Times every request. Labels use the URL pattern, not the raw path, to keep cardinality bounded."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        start = time.perf_counter()
+        response = self.get_response(request)
+
+        match = getattr(request, "resolver_match", None)
+        route = match.route if match else "unmatched"
+        REQUEST_LATENCY.labels(request.method, route, response.status_code).observe(time.perf_counter() - start)
+        return response
+
+
+def metrics_view(request):
+    return HttpResponse(generate_latest(_registry()), content_type=CONTENT_TYPE_LATEST)
+
+
+def start_worker_metrics_server(port):
+    start_http_server(port, registry=_registry())
+    print(f"Metrics server listening on :{port}")
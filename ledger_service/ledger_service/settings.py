@@ -80,6 +80,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'ledger_service.metrics.MetricsMiddleware',   # first, so it times the whole stack
     'django.middleware.security.SecurityMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware', 
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -145,6 +146,20 @@ CELERY_TASK_REJECT_ON_WORKER_LOST = True
 CELERY_TASK_TRACK_STARTED = True
 CELERY_TASK_DEFAULT_QUEUE = 'ledger.internal'
 
+# Three-way reconciliation (manage.py reconcile): the services it reads from, rows per chunk,
+# the balance every account opens with (not posted to the ledger) and the Identity user the
+# service token is signed for (no default: it must be the dedicated service user the account
+# and payment services allow on their reconciliation endpoints)
+PAYMENT_SERVICE_BASE_URL = os.environ.get('PAYMENT_SERVICE_BASE_URL', 'http://payments:8004')
+ACCOUNT_SERVICE_BASE_URL = os.environ.get('ACCOUNT_SERVICE_BASE_URL', 'http://account:8002')
+RECONCILIATION_CHUNK_SIZE = int(os.environ.get('RECONCILIATION_CHUNK_SIZE', 1000))
+RECONCILIATION_OPENING_BALANCE = os.environ.get('RECONCILIATION_OPENING_BALANCE', '1000.00')
+RECONCILIATION_SERVICE_USER_ID = (int(os.environ['RECONCILIATION_SERVICE_USER_ID'])
+                                  if os.environ.get('RECONCILIATION_SERVICE_USER_ID') else None)
+
+# Ledger account (by Identity user id) that pays the daily interest accruals: the bank's
+INTEREST_PAYER_USER_ID = int(os.environ.get('INTEREST_PAYER_USER_ID', 1))
+
 
 # ==========================================
 # 5. REST FRAMEWORK
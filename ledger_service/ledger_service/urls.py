@@ -16,9 +16,11 @@ Including another URLconf
 """
 from django.contrib import admin
 from django.urls import path, include
+from .metrics import metrics_view
 
 urlpatterns = [
     path('admin/', admin.site.urls),
+    path('metrics', metrics_view, name='metrics'),      # Prometheus scrape target
     path('ledger/', include('ledger.urls')),
     path('ledger_api/', include('ledger.api.urls', namespace='api')),
 ]
\ No newline at end of file
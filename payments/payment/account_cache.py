@@ -0,0 +1,94 @@
+# payment/account_cache.py
+"""
+Worker-local account_number -> user_id cache for PaymentAccount.
+
+Every completed payment needs the payer's and payee's user ids for its event. The mapping
+practically never changes, so each worker process keeps a bounded LRU of it:
+
+  * filled by consume.payment.BankAccount.created and by bulk warm-up at worker start,
+  * invalidated by consume.payment.BankAccount.updated,
+  * on a miss, one `account_number__in` query for all the missing numbers.
+
+The cache is per process, so an update event only reaches the process that consumes it.
+ACCOUNT_CACHE_TTL_SECONDS bounds how long any other process can serve an old entry.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+
+from payment.models import PaymentAccount
+
+ACCOUNT_CACHE_SIZE = getattr(settings, 'ACCOUNT_CACHE_SIZE', 100000)
+ACCOUNT_CACHE_TTL_SECONDS = getattr(settings, 'ACCOUNT_CACHE_TTL_SECONDS', 3600)
+
+# account_number -> (user_id, expires_at)
+_account_cache = OrderedDict()
+_account_cache_lock = threading.Lock()
+_account_cache_stats = {"hits": 0, "misses": 0}
+
+
+def remember(account_number, user_id, now=None):
+    expires_at = (now or time.monotonic()) + ACCOUNT_CACHE_TTL_SECONDS
+    with _account_cache_lock:
+        _account_cache[str(account_number)] = (user_id, expires_at)
+        _account_cache.move_to_end(str(account_number))
+        while len(_account_cache) > ACCOUNT_CACHE_SIZE:
+            _account_cache.popitem(last=False)   # Evict least recently used
+
+
+def forget(account_number):
+    with _account_cache_lock:
+        _account_cache.pop(str(account_number), None)
+
+
+def user_ids_for(account_numbers):
+    """{account_number: user_id} for the given numbers; unknown accounts are left out."""
+    now = time.monotonic()
+    found, missing = {}, []
+
+    with _account_cache_lock:
+        for number in {str(number) for number in account_numbers}:
+            cached = _account_cache.get(number)
+            if cached and cached[1] > now:
+                _account_cache.move_to_end(number)
+                found[number] = cached[0]
+            else:
+                missing.append(number)
+        _account_cache_stats["hits"] += len(found)
+        _account_cache_stats["misses"] += len(missing)
+
+    if missing:
+        for number, user_id in PaymentAccount.objects.filter(account_number__in=missing).values_list('account_number', 'user_id'):
+            remember(number, user_id, now)
+            found[number] = user_id
+    return found
+
+
+def user_id_for(account_number):
+    """user_id for one account number; raises PaymentAccount.DoesNotExist like .get() would."""
+    user_id = user_ids_for([account_number]).get(str(account_number))
+    if user_id is None:
+        raise PaymentAccount.DoesNotExist(f"No PaymentAccount {account_number}")
+    return user_id
+
+
+def warm_up(limit=None):
+    """Loads the most recently created accounts (up to the cache size) in one streamed query."""
+    limit = min(limit or ACCOUNT_CACHE_SIZE, ACCOUNT_CACHE_SIZE)
+    rows = (PaymentAccount.objects.order_by('-id')
+            .values_list('account_number', 'user_id')[:limit]
+            .iterator(chunk_size=5000))
+    now = time.monotonic()
+    loaded = 0
+    for number, user_id in rows:
+        remember(number, user_id, now)
+        loaded += 1
+    return loaded
+
+
+def account_cache_stats():
+    """Hit/miss counters and current size of this worker's account cache."""
+    with _account_cache_lock:
+        return {**_account_cache_stats, "size": len(_account_cache)}
@@ -5,93 +5,62 @@ import datetime
 from requests.adapters import HTTPAdapter
 from urllib3.util.retry import Retry
 from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
 import time
+import threading
+from collections import OrderedDict
+
+from .fraud_client import check_for_fraud, fraud_latency_stats
+from .circuit_breaker import CircuitBreakerAdapter, account_batch_breaker, account_breaker, circuit_breaker_states
 
 ACCOUNT_SERVICE_BASE_URL = 'http://account:8002'   # Docker internal
-FRAUD_SERVICE_BASE_URL = 'http://fraud:8006'    #Docker internal
 
 
 # 1. SETUP PERSISTENT SESSION 
 # This opens a connection pool. The first call takes 100ms, but the next calls (Debit/Credit) take ~10ms.
 
-def get_session():
+def get_session(breaker=account_breaker):
     session = requests.Session()
     
-    # Optional: Add automatic retries for network blips
-    retries = Retry(total=3, backoff_factor=0.1, status_forcelist=[500, 502, 503, 504])
-    session.mount('http://', HTTPAdapter(max_retries=retries))
-    session.mount('https://', HTTPAdapter(max_retries=retries))
+    # Only retry a failed CONNECT. Retrying slow reads / 5xx with backoff is what used to
+    # hold a worker for ~15s per call; a degraded account service now trips the breaker instead.
+    retries = Retry(total=1, connect=1, read=0, status=0, backoff_factor=0)
+    adapter = CircuitBreakerAdapter(breaker, max_retries=retries)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
     
     return session
 
 
 # Initialize it once when the worker starts (Each Celery worker process will have its own session)
 account_service_session = get_session()
+# Batch calls get their own session and breaker, so their 30-60s latencies never count
+# as slow calls against account_breaker (and a tripped batch breaker never blocks payments)
+account_batch_session = get_session(account_batch_breaker)
 
-fraud_service_session = get_session()
+# Default timeout budget: (connect, read) in seconds
+ACCOUNT_TIMEOUT = (getattr(settings, 'ACCOUNT_CONNECT_TIMEOUT', 0.5), getattr(settings, 'ACCOUNT_READ_TIMEOUT', 3))
 
+# The fraud service has its own pooled session, see fraud_client.py
 
-def check_for_fraud(transaction_data):
-    """
-    Calls the FastAPI Fraud Microservice synchronously.
-    
-    Args:
-        transaction_data (dict): Dictionary containing:
-            - transaction_id (str)
-            - user_id (str)
-            - amount (float/str)
-            - account_type (str)
-            - currency (str)
-            - timestamp (float, optional)
-
-    Returns:
-        dict: {
-            "is_fraud": bool, 
-            "risk_score": float, 
-            "reason": str
-        }
-    """
-    url = f"{FRAUD_SERVICE_BASE_URL}/check/"
-    
-    # Prepare payload conformant to FastAPI schema
-    payload = {
-        "transaction_id": str(transaction_data.get("transaction_id", "unknown")),
-        "user_id": str(transaction_data.get("user_id", "unknown")),
-        "amount": float(transaction_data.get("amount", 0.0)),
-        "currency": str(transaction_data.get("currency", "NGN")),
-        "timestamp": float(transaction_data.get("timestamp", time.time()))
-    }
-    
-    try:
-        # Short timeout because we don't want to block the payment flow for long
-        response = requests.post(url, json=payload, timeout=2) 
-        
-        if response.status_code == 200:
-            return response.json() 
-        
-        print(f"Fraud Service Error {response.status_code}: {response.text}")
-        # Fail Open: If service errors, we assume it's NOT fraud to avoid blocking legitimate users
-        return {"is_fraud": False, "risk_score": 0.0, "reason": "Service Error (Fail Open)"}
-        
-    except requests.exceptions.ConnectionError:
-        print(f"Fraud Service Unreachable at {url}")
-        return {"is_fraud": False, "risk_score": 0.0, "reason": "Service Unreachable"}
-        
-    except Exception as e:
-        print(f"Fraud Check Failed: {e}")
-        return {"is_fraud": False, "risk_score": 0.0, "reason": f"Client Error: {str(e)}"}
 
+SERVICE_TOKEN_LIFETIME = 60          # seconds, matches the 'exp' claim below
+SERVICE_TOKEN_REFRESH_MARGIN = 10    # re-sign this many seconds before expiry
+SERVICE_TOKEN_CACHE_SIZE = getattr(settings, 'SERVICE_TOKEN_CACHE_SIZE', 1024)
 
-def generate_service_token(user_id):
-    """
-    Generates a valid, short-lived JWT for internal service calls.
-    """
+# Per-worker LRU cache: user_id -> (token, expires_at). Each Celery process has its own copy.
+_service_token_cache = OrderedDict()
+_service_token_lock = threading.Lock()
+_service_token_stats = {"hits": 0, "misses": 0}
+
+
+def _sign_service_token(user_id, now):
     payload = {
         'token_type': 'access',
         'user_id': str(user_id), # Impersonate the user involved in the tx
-        'exp': datetime.datetime.utcnow() + datetime.timedelta(seconds=60), # Expire in 60s
-        'iat': datetime.datetime.utcnow(),
-        'jti': 'service-call-' + str(datetime.datetime.utcnow().timestamp())
+        'exp': now + datetime.timedelta(seconds=SERVICE_TOKEN_LIFETIME), # Expire in 60s
+        'iat': now,
+        'jti': 'service-call-' + str(now.timestamp())
     }
     
     # Sign it with the Shared Secret
@@ -105,14 +74,86 @@ def generate_service_token(user_id):
     return token
 
 
-def verify_card(user_id, card_number, cvv, PIN):
+def generate_service_token(user_id):
+    """
+    Returns a valid, short-lived JWT for internal service calls.
+    Tokens are cached per user and reused until shortly before they expire,
+    so every hop of one payment (PIN check, transfer, ...) shares one signed token.
+    """
+    key = str(user_id)
+    now_ts = time.time()
+
+    with _service_token_lock:
+        cached = _service_token_cache.get(key)
+        if cached and cached[1] - SERVICE_TOKEN_REFRESH_MARGIN > now_ts:
+            _service_token_cache.move_to_end(key)
+            _service_token_stats["hits"] += 1
+            return cached[0]
+        _service_token_stats["misses"] += 1
+
+    now = datetime.datetime.utcnow()
+    token = _sign_service_token(user_id, now)
+
+    with _service_token_lock:
+        _service_token_cache[key] = (token, now_ts + SERVICE_TOKEN_LIFETIME)
+        _service_token_cache.move_to_end(key)
+        while len(_service_token_cache) > SERVICE_TOKEN_CACHE_SIZE:
+            _service_token_cache.popitem(last=False)   # Evict least recently used
+
+    return token
+
+
+def service_token_cache_stats():
+    """Hit/miss counters and current size of this worker's token cache."""
+    with _service_token_lock:
+        return {**_service_token_stats, "size": len(_service_token_cache)}
+
+
+TRANSFER_GRANT_CACHE_SIZE = getattr(settings, 'TRANSFER_GRANT_CACHE_SIZE', 10000)
+TRANSFER_GRANT_REFRESH_MARGIN = 5    # stop presenting a grant this many seconds before it expires
+
+# Per-worker LRU of transfer grants: (kind, user_id) -> (grant, expires_at). A grant lets the
+# account service skip PBKDF2 on the next PIN check for the same account/card and PIN.
+_transfer_grants = OrderedDict()
+_transfer_grants_lock = threading.Lock()
+
+
+def _cached_grant(key):
+    with _transfer_grants_lock:
+        cached = _transfer_grants.get(key)
+        if cached and cached[1] - TRANSFER_GRANT_REFRESH_MARGIN > time.time():
+            _transfer_grants.move_to_end(key)
+            return cached[0]
+    return None
+
+
+def _keep_grant(key, result):
+    """Stores a newly issued grant from a verify response; drops ours when the check failed."""
+    data = result.get("data", {}) if isinstance(result, dict) else {}
+    with _transfer_grants_lock:
+        if not data.get("validity"):
+            _transfer_grants.pop(key, None)
+        elif data.get("grant") and data.get("grant_expires_in"):
+            _transfer_grants[key] = (data["grant"], time.time() + data["grant_expires_in"])
+            _transfer_grants.move_to_end(key)
+            while len(_transfer_grants) > TRANSFER_GRANT_CACHE_SIZE:
+                _transfer_grants.popitem(last=False)   # Evict least recently used
+
+
+def verify_card(user_id, card_number, cvv, PIN, amount=None):
     url = f"{ACCOUNT_SERVICE_BASE_URL}/account_service_api/verify_card/"
+    grant_key = ("card", str(user_id))
     payload = {
         "user_id": user_id,
         "card_number": card_number,
         "cvv": cvv,
         "PIN": PIN,
     }
+    if amount is not None:
+        payload["amount"] = str(amount)
+    grant = _cached_grant(grant_key)
+    if grant:
+        payload["grant"] = grant
     # 1. Generate a real token
     token = generate_service_token(user_id)
     
@@ -121,27 +162,41 @@ def verify_card(user_id, card_number, cvv, PIN):
         "Content-Type": "application/json"
     }
     try:
-        response = account_service_session.post(url, json=payload, headers=headers, timeout=5)
+        response = account_service_session.post(url, json=payload, headers=headers, timeout=ACCOUNT_TIMEOUT)
         response.raise_for_status()
-        return response.json()
+        result = response.json()
+        _keep_grant(grant_key, result)
+        return result
     except Exception as e:
+        # A rejected check comes back as a non-2xx: our grant must not outlive it
+        _keep_grant(grant_key, {})
         print(f"Verify Card Error: {e}")
         return {"validity": False, "error": str(e)}
 
 
-def verify_pin(user_id, account_number, pin):
+def verify_pin(user_id, account_number, pin, amount=None):
     url = f"{ACCOUNT_SERVICE_BASE_URL}/account_service_api/verify_AccountPin/"
     token = generate_service_token(user_id)
+    grant_key = ("account", str(user_id))
     
     headers = {"Authorization": f"Bearer {token}", "Content-Type": "application/json"}
     payload = {"account_number": account_number, "pin": pin,}
+    if amount is not None:
+        payload["amount"] = str(amount)
+    grant = _cached_grant(grant_key)
+    if grant:
+        payload["grant"] = grant        # Lets the account service skip PBKDF2 (same PIN required)
 
     try:
         # USE THE SESSION OBJECT INSTEAD OF 'requests'
-        response = account_service_session.post(url, json=payload, headers=headers, timeout=5)
+        response = account_service_session.post(url, json=payload, headers=headers, timeout=ACCOUNT_TIMEOUT)
         response.raise_for_status()
-        return response.json()
+        result = response.json()
+        _keep_grant(grant_key, result)
+        return result
     except Exception as e:
+        # A rejected check comes back as a non-2xx: our grant must not outlive it
+        _keep_grant(grant_key, {})
         print(f"Verify Pin Error: {e}")
         return {"validity": False, "error": str(e)}
     
@@ -158,7 +213,7 @@ def debit_bank(user_id, amount):
         "Content-Type": "application/json"
     }
     try:
-        response = account_service_session.post(url, json=payload, headers=headers, timeout=5)
+        response = account_service_session.post(url, json=payload, headers=headers, timeout=ACCOUNT_TIMEOUT)
         if response.status_code == 200:
             return {"status": "success"}
         return {"status": "failed", "message": response.text}
@@ -179,7 +234,7 @@ def credit_bank(user_id, amount):
         "Content-Type": "application/json"
     }
     try:
-        response = account_service_session.post(url, json=payload, headers=headers, timeout=5)
+        response = account_service_session.post(url, json=payload, headers=headers, timeout=ACCOUNT_TIMEOUT)
         if response.status_code == 200:
             return {"status": "success"}
         return {"status": "failed", "message": response.text}
@@ -201,7 +256,7 @@ def debit_account(user_id, account_id, amount):
         "Content-Type": "application/json"
     }
     try:
-        response = account_service_session.post(url, json=payload, headers=headers, timeout=5)
+        response = account_service_session.post(url, json=payload, headers=headers, timeout=ACCOUNT_TIMEOUT)
         if response.status_code == 200:
             return {"status": "success"}
         return {"status": "failed", "message": response.text}
@@ -226,9 +281,138 @@ def credit_account(user_id, account_id, amount):
         "Content-Type": "application/json"
     }
     try:
-        response = account_service_session.post(url, json=payload, headers=headers, timeout=5)
+        response = account_service_session.post(url, json=payload, headers=headers, timeout=ACCOUNT_TIMEOUT)
+        if response.status_code == 200:
+            return {"status": "success"}
+        return {"status": "failed", "message": response.text}
+    except Exception as e:
+        return {"status": "failed", "message": str(e)}
+
+
+def transfer_funds(user_id, payer_account_id, payee_account_id, amount, reference=None):
+    """
+    Moves money from payer to payee in ONE call. The account service debits and
+    credits inside a single DB transaction, so there is no refund step on failure.
+    With a `reference` the call is idempotent: a retry never moves the money twice.
+
+    A failed result carries "retryable": True when the outcome is UNKNOWN (timeout,
+    network error, 5xx, open circuit) and the transfer may or may not have happened.
+    """
+    url = f"{ACCOUNT_SERVICE_BASE_URL}/account_service_api/transfer/"
+    payload = {
+        "amount": str(amount),
+        "payer_account_number": payer_account_id,
+        "payee_account_number": payee_account_id,
+    }
+    if reference:
+        payload["reference"] = str(reference)
+    token = generate_service_token(user_id)
+    
+    headers = {
+        "Authorization": f"Bearer {token}",
+        "Content-Type": "application/json"
+    }
+    try:
+        response = account_service_session.post(url, json=payload, headers=headers, timeout=ACCOUNT_TIMEOUT)
         if response.status_code == 200:
             return {"status": "success"}
+        return {"status": "failed", "message": response.text, "retryable": response.status_code >= 500}
+    except Exception as e:
+        return {"status": "failed", "message": str(e), "retryable": True}
+
+
+def reverse_transfer(user_id, payer_account_id, payee_account_id, amount, reference):
+    """
+    Compensation: undoes the transfer made with `reference` (idempotent). If that transfer
+    never landed, the account service records the reversal so it can't land later.
+    """
+    url = f"{ACCOUNT_SERVICE_BASE_URL}/account_service_api/transfer/reverse/"
+    payload = {
+        "amount": str(amount),
+        "payer_account_number": payer_account_id,
+        "payee_account_number": payee_account_id,
+        "reference": str(reference),
+    }
+    token = generate_service_token(user_id)
+    
+    headers = {
+        "Authorization": f"Bearer {token}",
+        "Content-Type": "application/json"
+    }
+    try:
+        response = account_service_session.post(url, json=payload, headers=headers, timeout=ACCOUNT_TIMEOUT)
+        if response.status_code == 200:
+            return {"status": "success", "reversed": response.json().get("reversed")}
+        return {"status": "failed", "message": response.text}
+    except Exception as e:
+        return {"status": "failed", "message": str(e)}
+
+
+def transfer_funds_batch(user_id, payer_account_id, transfers):
+    """
+    Settles a whole batch of transfers from one payer in ONE call.
+    `transfers` is a list of {"reference", "payee_account_number", "amount"} dicts.
+    Returns {"status": "success", "results": [...per-row status...]} or {"status": "failed", ...}.
+    Rows are keyed by reference, so re-sending a batch never pays a row twice; a failed result
+    carries "retryable": True when the outcome is UNKNOWN (as in transfer_funds).
+    """
+    url = f"{ACCOUNT_SERVICE_BASE_URL}/account_service_api/transfer_batch/"
+    payload = {
+        "payer_account_number": payer_account_id,
+        "transfers": [
+            {
+                "reference": str(row["reference"]),
+                "payee_account_number": str(row["payee_account_number"]),
+                "amount": str(row["amount"]),
+            }
+            for row in transfers
+        ],
+    }
+    token = generate_service_token(user_id)
+    
+    headers = {
+        "Authorization": f"Bearer {token}",
+        "Content-Type": "application/json"
+    }
+    try:
+        # Longer timeout: one call now carries the whole batch
+        response = account_batch_session.post(url, json=payload, headers=headers, timeout=30)
+        if response.status_code == 200:
+            return {"status": "success", "results": response.json().get("results", [])}
+        return {"status": "failed", "message": response.text, "retryable": response.status_code >= 500}
+    except Exception as e:
+        return {"status": "failed", "message": str(e), "retryable": True}
+
+
+def settle_due_loan_repayments(run_date, after=None, limit=500, settled_since=None):
+    """
+    Runs ONE chunk of the daily loan repayment run in the account service (where the loans
+    live): every instalment due on or before run_date, after the `after` loan id cursor.
+    With `settled_since` (a retried run) the first chunk also returns the instalments already
+    collected since then, marked "replayed".
+    Returns {"status": "success", "results": [...], "next_cursor": ...} or {"status": "failed", ...}.
+    """
+    url = f"{ACCOUNT_SERVICE_BASE_URL}/account_service_api/loan_repayments/settle/"
+    payload = {"run_date": str(run_date), "limit": limit}
+    if after:
+        payload["after"] = str(after)
+    if settled_since:
+        payload["settled_since"] = str(settled_since)
+    service_user_id = getattr(settings, 'LOAN_ENGINE_SERVICE_USER_ID', None)
+    if service_user_id is None:
+        raise ImproperlyConfigured("LOAN_ENGINE_SERVICE_USER_ID must be set to run loan repayments")
+    token = generate_service_token(service_user_id)
+
+    headers = {
+        "Authorization": f"Bearer {token}",
+        "Content-Type": "application/json"
+    }
+    try:
+        # Longer timeout: one call settles a whole chunk of loans
+        response = account_batch_session.post(url, json=payload, headers=headers, timeout=60)
+        if response.status_code == 200:
+            body = response.json()
+            return {"status": "success", "results": body.get("results", []), "next_cursor": body.get("next_cursor")}
         return {"status": "failed", "message": response.text}
     except Exception as e:
-        return {"status": "failed", "message": str(e)}
\ No newline at end of file
+        return {"status": "failed", "message": str(e)}
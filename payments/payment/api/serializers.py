@@ -1,4 +1,5 @@
 from rest_framework import serializers
+from django.conf import settings
 from ..models import PaymentRequest
 
 
@@ -13,4 +14,20 @@ class CardPaymentSerializer(serializers.Serializer):
     amount = serializers.DecimalField(max_digits=12, decimal_places=2, required=True)
     card_number = serializers.CharField(required=True)
     cvv = serializers.IntegerField(required=True)
-    pin = serializers.IntegerField(required=True)
\ No newline at end of file
+    pin = serializers.IntegerField(required=True)
+
+
+class BulkTransferRowSerializer(serializers.Serializer):
+    payee_account_id = serializers.CharField(required=True)
+    amount = serializers.DecimalField(max_digits=12, decimal_places=2, required=True)
+
+    def validate_amount(self, value):
+        if value <= 0:
+            raise serializers.ValidationError("Transfer amount must be positive.")
+        return value
+
+
+class BulkTransferSerializer(serializers.Serializer):
+    pin = serializers.IntegerField(required=True)
+    transfers = serializers.ListField(child=BulkTransferRowSerializer(), min_length=1,
+                                      max_length=settings.BULK_TRANSFER_MAX_ROWS)
@@ -10,9 +10,11 @@ urlpatterns = [
     
     path('internal_transfer/', views.InternalTransferAPIView.as_view(), name='internal_transfer'),      #Good
     path('card_payment/', views.CardPaymentAPIView.as_view(), name='card_payment'),               #Goo
+    path('bulk_transfer/', views.BulkTransferAPIView.as_view(), name='bulk_transfer'),
     path('external_bank_transfer/', views.ExternalBankTransferAPIView.as_view()),    #Good
     path('transfer_history/', views.TransferHistory.as_view(), name='transfer_history'),
     path('general_history/', views.GeneralTransferHistory.as_view(), name='general_history'),
+    path('reconciliation_feed/', views.ReconciliationFeed.as_view(), name='reconciliation_feed'),
 #    path('debit_account/', views.debit_account),                   #Good    
 #    path('credit_account/', views.credit_account),                 #Good
     #path('internal_transfer/', views.internal_transfer),           #Good
@@ -3,13 +3,25 @@ from rest_framework.response import Response
 from rest_framework_simplejwt.tokens import RefreshToken
 from ..models import *
 from .serializers import *
-from django.db import transaction 
+from django.db import transaction, IntegrityError
+from django.conf import settings
 from ..tasks import *
+from ..idempotency import IDEMPOTENCY_HEADER, get_stored_response, store_response
+from ..sharding import transfer_queue
 from rest_framework.permissions import IsAuthenticated
 from rest_framework_simplejwt.authentication import JWTAuthentication
 from django.db.models import Q
 
 import time # <--- Import this
+import uuid
+import base64
+from datetime import datetime, date, timedelta
+from django.utils import timezone
+import csv
+import json
+import itertools
+from django.http import StreamingHttpResponse
+from django.core.serializers.json import DjangoJSONEncoder
 
 class InternalTransferAPIView(APIView):
     authentication_classes = [JWTAuthentication]
@@ -23,7 +35,17 @@ class InternalTransferAPIView(APIView):
         # 1. START THE CLOCK
         start_time = time.time() 
         
-        if serializer.is_valid():
+        # Retried request? Replay the original response: no new payment, no new task
+        idempotency_key = request.headers.get(IDEMPOTENCY_HEADER)
+        if idempotency_key:
+            replay = get_stored_response(user_id, idempotency_key, request.data)
+            if replay is not None:
+                return replay
+        
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=400)
+
+        try:
             with transaction.atomic():
                 # Construct a clean dictionary to send to Celery
                 payment_req = PaymentRequest.objects.create(
@@ -47,12 +69,20 @@ class InternalTransferAPIView(APIView):
                     "initiated_at_ts": start_time
                 }
                 
-                # Fire and forget
-                transaction.on_commit(lambda: process_internal_transfer.apply_async(args=[data]))
+                body = {"status": "Processing",}
+                if idempotency_key:
+                    store_response(user_id, idempotency_key, request.data, body)
+                
+                # Fire and forget, onto the payer's shard: one account's transfers never race each other
+                transaction.on_commit(lambda: process_internal_transfer.apply_async(args=[data], queue=transfer_queue(payer_account_id)))
+        except IntegrityError:
+            # A concurrent retry with the same key committed first: replay its response
+            if not idempotency_key:
+                raise
+            return get_stored_response(user_id, idempotency_key, request.data)
+
+        return Response(body, status=200)
 
-                return Response({"status": "Processing",}, status=200)
-        else:
-            return Response(serializer.errors, status=400)
 
 class CardPaymentAPIView(APIView):
     authentication_classes = [JWTAuthentication]
@@ -66,7 +96,17 @@ class CardPaymentAPIView(APIView):
          # 1. START THE CLOCK
         start_time = time.time() 
         
-        if serializer.is_valid():
+        # Retried request? Replay the original response: no new payment, no new task
+        idempotency_key = request.headers.get(IDEMPOTENCY_HEADER)
+        if idempotency_key:
+            replay = get_stored_response(user_id, idempotency_key, request.data)
+            if replay is not None:
+                return replay
+        
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=400)
+
+        try:
             with transaction.atomic():
                 
                 # Create the Pending Transaction Record HERE (Before Celery)
@@ -93,14 +133,132 @@ class CardPaymentAPIView(APIView):
                     "initiated_at_ts": start_time
                 }
                 
-                transaction.on_commit(lambda: initiate_card_payment.apply_async(args=[data], queue='payment.internal'))
-        
-                return Response({"status": "Processing"}, status=200)
-        else:
+                body = {"status": "Processing"}
+                if idempotency_key:
+                    store_response(user_id, idempotency_key, request.data, body)
+                
+                transaction.on_commit(lambda: initiate_card_payment.apply_async(args=[data], queue=transfer_queue(payer_account_id)))
+        except IntegrityError:
+            # A concurrent retry with the same key committed first: replay its response
+            if not idempotency_key:
+                raise
+            return get_stored_response(user_id, idempotency_key, request.data)
+
+        return Response(body, status=200)
+
+
+class BulkTransferAPIView(APIView):
+    """
+    Bulk / payroll transfers: one payer, up to BULK_TRANSFER_MAX_ROWS payees in one request.
+    POST creates every PaymentRequest in one bulk insert and enqueues ONE task for the batch.
+    GET ?batch_id=... reports the per-row status of a batch.
+    """
+    authentication_classes = [JWTAuthentication]
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request):
+        user_id = request.user.id
+        acc = get_object_or_404(PaymentAccount, user_id=user_id)
+        payer_account_id = acc.account_number
+        serializer = BulkTransferSerializer(data=request.data)
+        start_time = time.time()
+
+        idempotency_key = request.headers.get(IDEMPOTENCY_HEADER)
+        if idempotency_key:
+            replay = get_stored_response(user_id, idempotency_key, request.data)
+            if replay is not None:
+                return replay
+
+        if not serializer.is_valid():
             return Response(serializer.errors, status=400)
 
+        batch_id = uuid.uuid4().hex
+        rows = serializer.validated_data['transfers']
+
+        try:
+            with transaction.atomic():
+                payments = PaymentRequest.objects.bulk_create([
+                    PaymentRequest(
+                        payer_account_id=payer_account_id,
+                        payee_account_id=row['payee_account_id'],
+                        amount=row['amount'],
+                        status="PENDING",
+                        currency="NGN",
+                        payment_type="INTERNAL_TRANSFER",
+                        metadata={'TYPE': 'BULK TRANSFER', 'BATCH': batch_id},
+                    )
+                    for row in rows
+                ], batch_size=500)
+
+                data = {
+                    "batch_id": batch_id,
+                    "payment_ids": [str(payment.id) for payment in payments],
+                    "user_id": str(user_id),
+                    "payer_account_id": payer_account_id,
+                    "pin": str(serializer.validated_data['pin']),
+                    "initiated_at_ts": start_time
+                }
+
+                body = {"status": "Processing", "batch_id": batch_id, "references": data["payment_ids"]}
+                if idempotency_key:
+                    store_response(user_id, idempotency_key, request.data, body)
+
+                transaction.on_commit(lambda: process_bulk_transfer.apply_async(args=[data], queue=transfer_queue(payer_account_id)))
+        except IntegrityError:
+            if not idempotency_key:
+                raise
+            return get_stored_response(user_id, idempotency_key, request.data)
+
+        return Response(body, status=200)
+
+    def get(self, request):
+        user_id = request.user.id
+        acc = get_object_or_404(PaymentAccount, user_id=user_id)
+        batch_id = request.query_params.get('batch_id')
+
+        if not batch_id:
+            return Response({"batch_id": ["This field is required."]}, status=400)
+
+        rows = list(PaymentRequest.objects.filter(payer_account_id=acc.account_number,
+                                                  metadata__BATCH=batch_id)
+                                          .values('id', 'payee_account_id', 'amount', 'status', 'metadata'))
+        if not rows:
+            return Response({"message": "Batch not found"}, status=404)
+
+        data = [
+            {
+                'reference': str(row['id']),
+                'recipient': row['payee_account_id'],
+                'amount': row['amount'],
+                'status': row['status'],
+                'reason': (row['metadata'] or {}).get('REASON'),
+            }
+            for row in rows
+        ]
+        return Response({"message": "Bulk transfer status", "batch_id": batch_id, "data": data}, status=200)
+
+
+HISTORY_PAGE_SIZE = 50
+HISTORY_MAX_PAGE_SIZE = 500
+
+
+def _encode_cursor(row):
+    raw = f"{row['created_at'].isoformat()}|{row['id']}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def _decode_cursor(cursor):
+    created_at, payment_id = base64.urlsafe_b64decode(cursor.encode()).decode().split('|', 1)
+    return datetime.fromisoformat(created_at), uuid.UUID(payment_id)
+
 
 class TransferHistory(APIView):
+    """
+    The caller's own transfers (as payer OR payee), newest first.
+    Keyset/cursor paginated: pass back `next_cursor` as ?cursor=... to get the next page.
+    Uses the (payer_account_id, created_at) / (payee_account_id, created_at) indexes,
+    so response time depends on the page size, not on the size of the whole table.
+    """
     authentication_classes = [JWTAuthentication]
     permission_classes = [IsAuthenticated]
     
@@ -108,32 +266,120 @@ class TransferHistory(APIView):
         user_id = request.user.id 
         acc = get_object_or_404(PaymentAccount, user_id=user_id)
         number = acc.account_number
-        payments = PaymentRequest.objects.order_by('-created_at')
 
-        history_data = [] 
+        try:
+            limit = max(1, min(int(request.query_params.get('limit', HISTORY_PAGE_SIZE)), HISTORY_MAX_PAGE_SIZE))
+        except ValueError:
+            return Response({"limit": ["A valid integer is required."]}, status=400)
 
-        for payment in payments:
-            data = {
-                'sender': payment.payer_account_id,
-                'recipient': payment.payee_account_id,
-                'amount': payment.amount,
-                'currency': payment.currency,
-                'payment_type': payment.payment_type,
-                'date': payment.created_at,
-                'status': payment.status,
-            }
+        payments = PaymentRequest.objects.filter(Q(payer_account_id=number) | Q(payee_account_id=number))
 
-            history_data.append(data)
+        cursor = request.query_params.get('cursor')
+        if cursor:
+            try:
+                created_at, payment_id = _decode_cursor(cursor)
+            except (ValueError, UnicodeDecodeError):
+                return Response({"cursor": ["Invalid cursor."]}, status=400)
+            payments = payments.filter(Q(created_at__lt=created_at) |
+                                       Q(created_at=created_at, id__lt=payment_id))
+
+        # .values() projection: plain dicts straight from the cursor, no model instances
+        rows = list(payments.order_by('-created_at', '-id')
+                            .values('id', 'payer_account_id', 'payee_account_id', 'amount', 'currency',
+                                    'payment_type', 'created_at', 'status')[:limit + 1])
+
+        next_cursor = _encode_cursor(rows[limit - 1]) if len(rows) > limit else None
+
+        history_data = [
+            {
+                'sender': row['payer_account_id'],
+                'recipient': row['payee_account_id'],
+                'amount': row['amount'],
+                'currency': row['currency'],
+                'payment_type': row['payment_type'],
+                'date': row['created_at'],
+                'status': row['status'],
+            }
+            for row in rows[:limit]
+        ]
         
-        return Response({"message": "Your transfer History", "data": history_data}, 
+        return Response({"message": "Your transfer History", "data": history_data,
+                         "next_cursor": next_cursor}, 
                         status=200)
 
+
+EXPORT_CHUNK_SIZE = 2000
+EXPORT_FIELDS = ['id', 'payer_account_id', 'payee_account_id', 'amount', 'currency',
+                 'payment_type', 'status', 'created_at', 'processed_at']
+
+
+class _Echo:
+    """File-like object for csv.writer: hands each formatted line straight back."""
+    def write(self, value):
+        return value
+
+
+def _day_start(day):
+    return timezone.make_aware(datetime.combine(day, datetime.min.time()))
+
+
+def _parse_date_range(request):
+    """
+    ?start=YYYY-MM-DD&end=YYYY-MM-DD (both optional, end is inclusive) as the datetime bounds
+    [start, end + 1 day), so filtering is a plain range on the created_at index. Raises ValueError.
+    """
+    start = request.query_params.get('start')
+    end = request.query_params.get('end')
+    return (_day_start(date.fromisoformat(start)) if start else None,
+            _day_start(date.fromisoformat(end) + timedelta(days=1)) if end else None)
+
+
+def _stream_export(queryset, fields, export_format, filename):
+    """
+    Streams `queryset` as CSV or NDJSON without ever holding the table in memory:
+    rows come off the DB cursor in chunks of EXPORT_CHUNK_SIZE and are written out one by one.
+    """
+    rows = queryset.values_list(*fields).iterator(chunk_size=EXPORT_CHUNK_SIZE)
+
+    if export_format == 'csv':
+        writer = csv.writer(_Echo())
+        lines = itertools.chain([writer.writerow(fields)], (writer.writerow(row) for row in rows))
+        content_type = 'text/csv'
+    else:
+        lines = (json.dumps(dict(zip(fields, row)), cls=DjangoJSONEncoder) + '\n' for row in rows)
+        content_type = 'application/x-ndjson'
+
+    response = StreamingHttpResponse(lines, content_type=content_type)
+    response['Content-Disposition'] = f'attachment; filename="{filename}.{export_format}"'
+    return response
+
+
 class GeneralTransferHistory(APIView):
+    """
+    All bank transactions (staff reports).
+    ?export=csv|ndjson streams the result instead of building one big JSON list,
+    ?start=YYYY-MM-DD&end=YYYY-MM-DD limits it to a date range.
+    """
     authentication_classes = [JWTAuthentication]
     permission_classes = [IsAuthenticated]
     
     def get(self, request):
+        try:
+            start, end = _parse_date_range(request)
+        except ValueError:
+            return Response({"message": "Dates must be in YYYY-MM-DD format"}, status=400)
+
         payments = PaymentRequest.objects.order_by('-created_at')
+        if start:
+            payments = payments.filter(created_at__gte=start)
+        if end:
+            payments = payments.filter(created_at__lt=end)
+
+        export_format = request.query_params.get('export')
+        if export_format in ('csv', 'ndjson'):
+            return _stream_export(payments, EXPORT_FIELDS, export_format, 'bank_transactions')
+        if export_format:
+            return Response({"message": "export must be 'csv' or 'ndjson'"}, status=400)
     
         history_data = [] 
 
@@ -153,6 +399,53 @@ class GeneralTransferHistory(APIView):
         return Response({"message": "Your Bank Transactions History", "data": history_data}, status=200)
     
     
+RECONCILIATION_PAGE_SIZE = 1000
+RECONCILIATION_MAX_PAGE_SIZE = 5000
+
+
+class ReconciliationFeed(APIView):
+    """
+    Every payment in primary key order, one page at a time, for the ledger's reconciliation job
+    (or staff). Keyset paginated on the primary key (?after=<last id>), so each page is one index
+    range scan however deep the job is into the table.
+    """
+    authentication_classes = [JWTAuthentication]
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        service_user_id = getattr(settings, 'RECONCILIATION_SERVICE_USER_ID', None)
+        if not (request.user.is_staff or (service_user_id is not None and request.user.id == service_user_id)):
+            return Response({"message": "Staff only"}, status=403)
+
+        try:
+            limit = max(1, min(int(request.query_params.get('limit', RECONCILIATION_PAGE_SIZE)),
+                               RECONCILIATION_MAX_PAGE_SIZE))
+            after = request.query_params.get('after')
+            after = uuid.UUID(after) if after else None
+        except ValueError:
+            return Response({"message": "limit must be an integer and after a payment id"}, status=400)
+
+        payments = PaymentRequest.objects.order_by('id')
+        if after:
+            payments = payments.filter(id__gt=after)
+
+        rows = list(payments.values('id', 'payer_account_id', 'payee_account_id', 'amount',
+                                    'status', 'metadata')[:limit])
+        data = [
+            {
+                # Loan repayments are posted under the account service's reference, not the payment id
+                'reference': (row['metadata'] or {}).get('REFERENCE') or str(row['id']),
+                'payer_account_id': row['payer_account_id'],
+                'payee_account_id': row['payee_account_id'],
+                'amount': row['amount'],
+                'status': row['status'],
+            }
+            for row in rows
+        ]
+        next_cursor = str(rows[-1]['id']) if len(rows) == limit else None
+        return Response({"data": data, "next_cursor": next_cursor}, status=200)
+
+
 class ExternalBankTransferAPIView(APIView):
     authentication_classes = [JWTAuthentication]
     permission_classes = [IsAuthenticated]
@@ -0,0 +1,203 @@
+# payment/benchmark.py
+"""
+End-to-end throughput benchmark for the payment pipeline (manage.py bench_payments).
+
+Runs the REAL tasks (checks, saga, transfer call, outbox write) inside an in-process
+Celery worker on the in-memory broker. The account and fraud services are replaced by
+local HTTP stand-ins with configurable latency. The account stand-in holds a lock per
+account for the length of a transfer, like select_for_update does, and reports how long
+transfers waited for those locks.
+"""
+import json
+import random
+import subprocess
+import threading
+import time
+from decimal import Decimal
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+def percentile(samples, p):
+    if not samples:
+        return 0.0
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(len(samples) * p))]
+
+
+def summarize_ms(samples):
+    """p50/p95/p99/max/mean of a list of seconds, in milliseconds."""
+    return {
+        "p50": round(percentile(samples, 0.50) * 1000, 2),
+        "p95": round(percentile(samples, 0.95) * 1000, 2),
+        "p99": round(percentile(samples, 0.99) * 1000, 2),
+        "max": round(max(samples) * 1000, 2) if samples else 0.0,
+        "mean": round(sum(samples) / len(samples) * 1000, 2) if samples else 0.0,
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'],
+                                       stderr=subprocess.DEVNULL, text=True).strip()
+    except Exception:
+        return "unknown"
+
+
+# --- STAND-IN SERVICES ---
+
+class StandInServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, handler, latency_ms=0, jitter_ms=0):
+        super().__init__(("127.0.0.1", 0), handler)
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server_port}"
+
+    def simulate_latency(self):
+        delay = self.latency_ms + random.uniform(0, self.jitter_ms)
+        if delay:
+            time.sleep(delay / 1000)
+
+    def start(self):
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+
+class _JSONHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"      # keep-alive, like the real services behind the pooled sessions
+
+    def log_message(self, *args):
+        pass
+
+    def read_json(self):
+        length = int(self.headers.get('Content-Length', 0))
+        return json.loads(self.rfile.read(length) or b'{}')
+
+    def send_json(self, body, status=200):
+        raw = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(raw)))
+        self.end_headers()
+        self.wfile.write(raw)
+
+
+class AccountStandIn(StandInServer):
+    """PIN/card checks, transfer/, transfer_batch/ and transfer/reverse/ with in-memory balances."""
+
+    def __init__(self, latency_ms=0, jitter_ms=0, opening_balance=Decimal('1000000')):
+        super().__init__(_AccountHandler, latency_ms, jitter_ms)
+        self.opening_balance = opening_balance
+        self.balances = {}
+        self.references = set()
+        self._locks = {}
+        self._locks_guard = threading.Lock()
+        self.lock_waits = []            # seconds each transfer waited for its account locks
+        self._waits_guard = threading.Lock()
+
+    def _lock_for(self, account_number):
+        with self._locks_guard:
+            return self._locks.setdefault(account_number, threading.Lock())
+
+    def transfer(self, reference, payer, payee, amount):
+        # Same lock order as the real TransferFunds view
+        locks = [self._lock_for(number) for number in sorted({payer, payee})]
+        start = time.perf_counter()
+        for lock in locks:
+            lock.acquire()
+        with self._waits_guard:
+            self.lock_waits.append(time.perf_counter() - start)
+        try:
+            # The real service does its work while holding the row locks
+            self.simulate_latency()
+            if reference and reference in self.references:
+                return {"status": "success", "duplicate": True}, 200
+            balance = self.balances.get(payer, self.opening_balance)
+            if balance < amount:
+                return {"status": "failed", "message": "Insufficient funds"}, 400
+            self.balances[payer] = balance - amount
+            self.balances[payee] = self.balances.get(payee, self.opening_balance) + amount
+            if reference:
+                self.references.add(reference)
+            return {"status": "success"}, 200
+        finally:
+            for lock in reversed(locks):
+                lock.release()
+
+
+class _AccountHandler(_JSONHandler):
+
+    def do_POST(self):
+        server = self.server
+        data = self.read_json()
+        path = self.path.rstrip('/').rsplit('/account_service_api/', 1)[-1]
+
+        if path in ('verify_AccountPin', 'verify_card'):
+            server.simulate_latency()
+            return self.send_json({"data": {"validity": True}})
+
+        if path == 'transfer':
+            body, status = server.transfer(data.get("reference"), data["payer_account_number"],
+                                           data["payee_account_number"], Decimal(data["amount"]))
+            return self.send_json(body, status)
+
+        if path == 'transfer_batch':
+            results = []
+            for row in data["transfers"]:
+                body, _ = server.transfer(row["reference"], data["payer_account_number"],
+                                          row["payee_account_number"], Decimal(row["amount"]))
+                results.append({"reference": row["reference"], **body})
+            return self.send_json({"status": "success", "results": results})
+
+        if path == 'transfer/reverse':
+            server.simulate_latency()
+            return self.send_json({"status": "success", "reversed": True})
+
+        self.send_json({"message": f"unknown path {self.path}"}, 404)
+
+
+class FraudStandIn(StandInServer):
+
+    def __init__(self, latency_ms=0, jitter_ms=0):
+        super().__init__(_FraudHandler, latency_ms, jitter_ms)
+
+
+class _FraudHandler(_JSONHandler):
+
+    def do_POST(self):
+        self.read_json()
+        self.server.simulate_latency()
+        self.send_json({"is_fraud": False, "risk_score": 0.01, "reason": "stand-in"})
+
+
+# --- REPORTING ---
+
+def stage_breakdown_ms(flow="internal"):
+    """Mean time per pipeline stage from payment_stage_seconds (this process only)."""
+    from prometheus_client import REGISTRY
+    stages = {}
+    for stage in ("queue_wait", "pin_check", "fraud_check", "transfer", "db_update"):
+        labels = {"flow": flow, "stage": stage}
+        count = REGISTRY.get_sample_value("payment_stage_seconds_count", labels) or 0
+        total = REGISTRY.get_sample_value("payment_stage_seconds_sum", labels) or 0
+        stages[stage] = round(total / count * 1000, 2) if count else None
+    return stages
+
+
+def compare(result, baseline, tolerance):
+    """
+    Returns a list of regressions beyond `tolerance` (e.g. 0.10 = 10%) versus a previous run:
+    lower throughput, or higher p95 / p99 latency.
+    """
+    regressions = []
+    if result["throughput_tps"] < baseline["throughput_tps"] * (1 - tolerance):
+        regressions.append(f"throughput {baseline['throughput_tps']} -> {result['throughput_tps']} tps")
+    for key in ("p95", "p99"):
+        old, new = baseline["latency_ms"][key], result["latency_ms"][key]
+        if old and new > old * (1 + tolerance):
+            regressions.append(f"latency {key} {old} -> {new} ms")
+    return regressions
@@ -0,0 +1,193 @@
+# payment/circuit_breaker.py
+"""
+Per-dependency circuit breakers for the account and fraud service clients.
+
+Each breaker watches a rolling window of recent calls. When the error rate OR the p95
+latency crosses its threshold it trips OPEN and every call fails immediately (a few
+microseconds) instead of tying a Celery worker up in timeouts and retries. After
+`open_seconds` it goes HALF_OPEN and lets a single probe through: success closes it,
+failure re-opens it. allow() hands every call a ticket and only the probe's ticket can
+settle the half-open state, so a call that started while CLOSED and finishes late cannot.
+
+State is per worker process, like the session pools and the service token cache.
+"""
+import itertools
+import time
+import threading
+from collections import deque
+
+import requests
+from requests.adapters import HTTPAdapter
+from django.conf import settings
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitOpenError(requests.exceptions.ConnectionError):
+    """Raised instead of making a call while the breaker is open.
+    Subclasses ConnectionError so the clients' existing 'unreachable' handling applies."""
+
+
+class CircuitBreaker:
+
+    def __init__(self, name, error_rate=0.5, slow_call_ms=1000, min_calls=20,
+                 window_seconds=30, open_seconds=10):
+        self.name = name
+        self.error_rate = error_rate
+        self.slow_call_ms = slow_call_ms
+        self.min_calls = min_calls
+        self.window_seconds = window_seconds
+        self.open_seconds = open_seconds
+
+        self._lock = threading.Lock()
+        self._calls = deque()           # (finished_at, duration_ms, ok)
+        self._state = CLOSED
+        self._opened_at = 0.0
+        self._tickets = itertools.count(1)
+        self._probe = None              # Ticket of the half-open probe in flight
+        self._trips = 0
+        self._rejected = 0
+
+    # --- Window maths (call with the lock held) ---
+
+    def _trim(self, now):
+        while self._calls and self._calls[0][0] < now - self.window_seconds:
+            self._calls.popleft()
+
+    def _window_stats(self):
+        calls = len(self._calls)
+        if not calls:
+            return 0, 0.0, 0.0
+        errors = sum(1 for _, _, ok in self._calls if not ok)
+        durations = sorted(duration for _, duration, _ in self._calls)
+        p95 = durations[min(calls - 1, int(calls * 0.95))]
+        return calls, errors / calls, p95
+
+    def _trip(self, now, reason):
+        self._state = OPEN
+        self._opened_at = now
+        self._probe = None
+        self._trips += 1
+        print(f"Circuit '{self.name}' OPEN: {reason}")
+
+    # --- Public API ---
+
+    def allow(self):
+        """
+        A ticket (truthy) if a call may go out now, else False. While open, only one half-open
+        probe is let through. Pass the ticket back to record().
+        """
+        now = time.monotonic()
+        with self._lock:
+            if self._state == OPEN and now - self._opened_at >= self.open_seconds:
+                self._state = HALF_OPEN
+                self._probe = None
+
+            if self._state == CLOSED:
+                return next(self._tickets)
+            if self._state == HALF_OPEN and self._probe is None:
+                self._probe = next(self._tickets)
+                return self._probe
+
+            self._rejected += 1
+            return False
+
+    def record(self, duration_ms, ok, ticket=None):
+        """Report the outcome of the call allow() handed `ticket` to."""
+        now = time.monotonic()
+        with self._lock:
+            if self._state == HALF_OPEN:
+                if ticket is None or ticket != self._probe:
+                    return              # Let through before the trip; only the probe decides
+                if ok and duration_ms < self.slow_call_ms:
+                    self._state = CLOSED
+                    self._calls.clear()
+                    print(f"Circuit '{self.name}' CLOSED: probe succeeded in {duration_ms:.0f}ms")
+                else:
+                    self._trip(now, f"half-open probe failed ({duration_ms:.0f}ms)")
+                return
+
+            self._calls.append((now, duration_ms, ok))
+            self._trim(now)
+
+            if self._state != CLOSED:
+                return
+
+            calls, error_rate, p95 = self._window_stats()
+            if calls < self.min_calls:
+                return
+            if error_rate >= self.error_rate:
+                self._trip(now, f"error rate {error_rate:.0%} over {calls} calls")
+            elif p95 >= self.slow_call_ms:
+                self._trip(now, f"p95 latency {p95:.0f}ms over {calls} calls")
+
+    def state(self):
+        """Snapshot for monitoring."""
+        now = time.monotonic()
+        with self._lock:
+            self._trim(now)
+            calls, error_rate, p95 = self._window_stats()
+            state = self._state
+            if state == OPEN and now - self._opened_at >= self.open_seconds:
+                state = HALF_OPEN
+            return {
+                "name": self.name,
+                "state": state,
+                "window_calls": calls,
+                "error_rate": round(error_rate, 4),
+                "p95_ms": round(p95, 1),
+                "trips": self._trips,
+                "rejected": self._rejected,
+            }
+
+
+class CircuitBreakerAdapter(HTTPAdapter):
+    """
+    HTTPAdapter that routes every request through a breaker: rejected up front while
+    open, and timed afterwards. 5xx responses and network errors count as failures.
+    """
+
+    def __init__(self, breaker, *args, **kwargs):
+        self.breaker = breaker
+        super().__init__(*args, **kwargs)
+
+    def send(self, request, **kwargs):
+        ticket = self.breaker.allow()
+        if not ticket:
+            raise CircuitOpenError(f"Circuit '{self.breaker.name}' is open", request=request)
+
+        start = time.perf_counter()
+        try:
+            response = super().send(request, **kwargs)
+        except Exception:
+            self.breaker.record((time.perf_counter() - start) * 1000, ok=False, ticket=ticket)
+            raise
+
+        self.breaker.record((time.perf_counter() - start) * 1000, ok=response.status_code < 500, ticket=ticket)
+        return response
+
+
+def _breaker_from_settings(name, slow_call_ms=1000, min_calls=20, window_seconds=30, open_seconds=10):
+    prefix = f"{name.upper()}_BREAKER_"
+    return CircuitBreaker(
+        name,
+        error_rate=getattr(settings, prefix + 'ERROR_RATE', 0.5),
+        slow_call_ms=getattr(settings, prefix + 'SLOW_CALL_MS', slow_call_ms),
+        min_calls=getattr(settings, prefix + 'MIN_CALLS', min_calls),
+        window_seconds=getattr(settings, prefix + 'WINDOW_SECONDS', window_seconds),
+        open_seconds=getattr(settings, prefix + 'OPEN_SECONDS', open_seconds),
+    )
+
+
+account_breaker = _breaker_from_settings("account")
+# Long batch calls to the same service (bulk transfers, loan repayment chunks)
+account_batch_breaker = _breaker_from_settings("account_batch", slow_call_ms=30000, min_calls=5,
+                                               window_seconds=600, open_seconds=60)
+fraud_breaker = _breaker_from_settings("fraud")
+
+
+def circuit_breaker_states():
+    """State of every downstream breaker in this worker process."""
+    return {breaker.name: breaker.state() for breaker in (account_breaker, account_batch_breaker, fraud_breaker)}
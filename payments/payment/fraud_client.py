@@ -0,0 +1,137 @@
+import time
+import threading
+from collections import deque
+
+import requests
+from urllib3.util.retry import Retry
+from django.conf import settings
+
+from .circuit_breaker import CircuitBreakerAdapter, CircuitOpenError, fraud_breaker
+
+FRAUD_SERVICE_BASE_URL = getattr(settings, 'FRAUD_SERVICE_URL', 'http://fraud:8006')    #Docker internal
+
+# Default timeout budget: (connect, read) in seconds
+FRAUD_TIMEOUT = (getattr(settings, 'FRAUD_CONNECT_TIMEOUT', 0.5), getattr(settings, 'FRAUD_READ_TIMEOUT', 2))
+
+
+# 1. POOLED KEEP-ALIVE SESSION
+# One session per Celery worker process. Connections to the fraud service are kept open
+# and reused, so only the first check on each connection pays for the TCP handshake.
+
+def get_fraud_session():
+    session = requests.Session()
+
+    # Only retry a failed CONNECT (e.g. a keep-alive socket the server already closed).
+    # Never retry reads: a slow fraud service must not double our latency.
+    retries = Retry(total=1, connect=1, read=0, status=0, backoff_factor=0)
+    pool_size = getattr(settings, 'FRAUD_POOL_SIZE', 10)
+    # The breaker fails calls fast while the fraud service is erroring or slow
+    adapter = CircuitBreakerAdapter(fraud_breaker, pool_connections=1, pool_maxsize=pool_size, max_retries=retries)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    session.headers.update({"Connection": "keep-alive"})
+
+    return session
+
+
+fraud_service_session = get_fraud_session()
+
+
+# 2. LATENCY INSTRUMENTATION (per worker process)
+_latency_lock = threading.Lock()
+_latency_samples = deque(maxlen=1000)     # last N call durations in ms
+_latency_stats = {"calls": 0, "errors": 0, "total_ms": 0.0, "max_ms": 0.0}
+
+
+def _record_latency(duration_ms, error=False):
+    with _latency_lock:
+        _latency_samples.append(duration_ms)
+        _latency_stats["calls"] += 1
+        _latency_stats["total_ms"] += duration_ms
+        _latency_stats["max_ms"] = max(_latency_stats["max_ms"], duration_ms)
+        if error:
+            _latency_stats["errors"] += 1
+
+
+def fraud_latency_stats():
+    """
+    Returns call/error counts and latency (ms) for this worker's fraud checks.
+    Percentiles are computed over the most recent 1000 calls.
+    """
+    with _latency_lock:
+        samples = sorted(_latency_samples)
+        stats = dict(_latency_stats)
+
+    def percentile(p):
+        if not samples:
+            return 0.0
+        return samples[min(len(samples) - 1, int(len(samples) * p))]
+
+    stats["avg_ms"] = stats["total_ms"] / stats["calls"] if stats["calls"] else 0.0
+    stats["p50_ms"] = percentile(0.50)
+    stats["p95_ms"] = percentile(0.95)
+    stats["p99_ms"] = percentile(0.99)
+    return stats
+
+
+# 3. THE CLIENT CALL
+def check_for_fraud(transaction_data, timeout=None):
+    """
+    Calls the FastAPI Fraud Microservice synchronously over the pooled session.
+
+    Args:
+        transaction_data (dict): Dictionary containing:
+            - transaction_id (str)
+            - user_id (str)
+            - amount (float/str)
+            - account_type (str)
+            - currency (str)
+            - timestamp (float, optional)
+        timeout (float or (connect, read) tuple, optional): per-request budget,
+            defaults to FRAUD_CONNECT_TIMEOUT / FRAUD_READ_TIMEOUT.
+
+    Returns:
+        dict: {
+            "is_fraud": bool,
+            "risk_score": float,
+            "reason": str
+        }
+    """
+    url = f"{FRAUD_SERVICE_BASE_URL}/check/"
+
+    # Prepare payload conformant to FastAPI schema
+    payload = {
+        "transaction_id": str(transaction_data.get("transaction_id", "unknown")),
+        "user_id": str(transaction_data.get("user_id", "unknown")),
+        "amount": float(transaction_data.get("amount", 0.0)),
+        "currency": str(transaction_data.get("currency", "NGN")),
+        "timestamp": float(transaction_data.get("timestamp", time.time()))
+    }
+
+    start = time.perf_counter()
+    try:
+        # Short timeout because we don't want to block the payment flow for long
+        response = fraud_service_session.post(url, json=payload, timeout=timeout or FRAUD_TIMEOUT)
+
+        if response.status_code == 200:
+            _record_latency((time.perf_counter() - start) * 1000)
+            return response.json()
+
+        _record_latency((time.perf_counter() - start) * 1000, error=True)
+        print(f"Fraud Service Error {response.status_code}: {response.text}")
+        # Fail Open: If service errors, we assume it's NOT fraud to avoid blocking legitimate users
+        return {"is_fraud": False, "risk_score": 0.0, "reason": "Service Error (Fail Open)"}
+
+    except CircuitOpenError:
+        # Rejected without a network call: don't pollute the latency samples
+        return {"is_fraud": False, "risk_score": 0.0, "reason": "Circuit Open (Fail Open)"}
+
+    except requests.exceptions.ConnectionError:
+        _record_latency((time.perf_counter() - start) * 1000, error=True)
+        print(f"Fraud Service Unreachable at {url}")
+        return {"is_fraud": False, "risk_score": 0.0, "reason": "Service Unreachable"}
+
+    except Exception as e:
+        _record_latency((time.perf_counter() - start) * 1000, error=True)
+        print(f"Fraud Check Failed: {e}")
+        return {"is_fraud": False, "risk_score": 0.0, "reason": f"Client Error: {str(e)}"}
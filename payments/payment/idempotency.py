@@ -0,0 +1,79 @@
+# payment/idempotency.py
+"""
+`Idempotency-Key` support for the payment initiation endpoints.
+
+A client that retries a POST (e.g. after a gateway timeout) with the same key gets the
+ORIGINAL response back: no new PaymentRequest, no new Celery task. The stored response
+is written in the same transaction as the PaymentRequest, so it exists exactly when the
+payment does. Keys live for IDEMPOTENCY_KEY_TTL_HOURS.
+"""
+import hashlib
+import hmac
+import json
+from datetime import timedelta
+
+from django.conf import settings
+from django.utils import timezone
+from rest_framework.response import Response
+
+from payment.models import IdempotencyKey
+
+IDEMPOTENCY_HEADER = 'Idempotency-Key'
+
+
+# Credentials never go into the stored hash: a 4-digit PIN or 3-digit CVV could be recovered
+# from it offline in a few thousand guesses
+SECRET_FIELDS = {'pin', 'PIN', 'cvv', 'card_number'}
+
+
+def request_fingerprint(data):
+    """
+    Keyed hash of the request body without its credentials, so a key cannot be reused for
+    a DIFFERENT payment.
+    """
+    payload = {field: value for field, value in dict(data).items() if field not in SECRET_FIELDS}
+    raw = json.dumps(payload, sort_keys=True, default=str)
+    return hmac.new(settings.SECRET_KEY.encode(), raw.encode(), hashlib.sha256).hexdigest()
+
+
+def get_stored_response(user_id, key, data):
+    """
+    Returns the stored Response for (user_id, key), a 422 Response if the key was used
+    with a different body, or None if the key is new (or expired).
+    """
+    stored = IdempotencyKey.objects.filter(user_id=user_id, key=key).first()
+    if stored is None:
+        return None
+
+    if stored.expires_at <= timezone.now():
+        stored.delete()
+        return None
+
+    if stored.request_hash != request_fingerprint(data):
+        return Response({"message": f"{IDEMPOTENCY_HEADER} was already used for a different request"},
+                        status=422)
+
+    response = Response(stored.response_body, status=stored.status_code)
+    response['Idempotent-Replayed'] = 'true'
+    return response
+
+
+def store_response(user_id, key, data, body, status_code=200):
+    """
+    Saves the response for (user_id, key). Call it INSIDE the transaction that creates the
+    payment; a concurrent duplicate then fails with IntegrityError and rolls back cleanly.
+    """
+    ttl = timedelta(hours=getattr(settings, 'IDEMPOTENCY_KEY_TTL_HOURS', 24))
+    IdempotencyKey.objects.create(
+        user_id=user_id,
+        key=key,
+        request_hash=request_fingerprint(data),
+        response_body=body,
+        status_code=status_code,
+        expires_at=timezone.now() + ttl,
+    )
+
+
+def purge_expired_keys():
+    deleted, _ = IdempotencyKey.objects.filter(expires_at__lte=timezone.now()).delete()
+    return deleted
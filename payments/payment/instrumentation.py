@@ -0,0 +1,52 @@
+# payment/instrumentation.py
+"""
+Per-stage latency of the payment pipeline, exported through /metrics (see payments/metrics.py).
+
+    payment_stage_seconds{flow="internal|card|bulk", stage="queue_wait|pin_check|fraud_check|transfer|db_update"}
+    payment_outbox_publish_lag_seconds{routing_key=...}   commit of the event -> broker confirm
+"""
+import time
+from contextlib import contextmanager
+
+from payments import metrics  # noqa: F401  sets up PROMETHEUS_MULTIPROC_DIR before prometheus_client loads
+from prometheus_client import Histogram
+
+# Sub-millisecond DB work up to multi-second queue backlogs
+STAGE_BUCKETS = (.001, .0025, .005, .01, .025, .05, .1, .25, .5, 1, 2.5, 5, 10, 30, 60)
+
+PAYMENT_STAGE_SECONDS = Histogram(
+    "payment_stage_seconds",
+    "Time spent in each stage of the payment pipeline",
+    ["flow", "stage"],
+    buckets=STAGE_BUCKETS,
+)
+
+OUTBOX_PUBLISH_LAG_SECONDS = Histogram(
+    "payment_outbox_publish_lag_seconds",
+    "Time from an outbox event being committed to the broker confirming it",
+    ["routing_key"],
+    buckets=STAGE_BUCKETS,
+)
+
+
+@contextmanager
+def stage_timer(flow, stage):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        PAYMENT_STAGE_SECONDS.labels(flow, stage).observe(time.perf_counter() - start)
+
+
+def timed(flow, stage, func):
+    """Wraps a zero-argument callable (e.g. an auth check run on the check pool) in a stage timer."""
+    def wrapper():
+        with stage_timer(flow, stage):
+            return func()
+    return wrapper
+
+
+def observe_queue_wait(flow, initiated_at_ts):
+    """Time from the API accepting the payment to a worker picking it up."""
+    if initiated_at_ts:
+        PAYMENT_STAGE_SECONDS.labels(flow, "queue_wait").observe(max(0.0, time.time() - float(initiated_at_ts)))
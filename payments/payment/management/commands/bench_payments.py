@@ -0,0 +1,151 @@
+import json
+import threading
+import time
+from datetime import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Count
+
+from payment import account_service_client, fraud_client
+from payment.benchmark import (AccountStandIn, FraudStandIn, compare, git_commit,
+                               stage_breakdown_ms, summarize_ms)
+from payment.models import PaymentAccount, PaymentRequest
+from payment.sharding import shard_queue_name, transfer_queue
+
+
+class Command(BaseCommand):
+    help = ("Drives N concurrent transfers through an in-process worker (memory:// broker) against "
+            "local account/fraud stand-ins and reports throughput, p50/p95/p99 and lock-wait time. "
+            "Runs in a throwaway test database.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--transfers', type=int, default=500)
+        parser.add_argument('--concurrency', type=int, default=16,
+                            help="Worker threads.")
+        parser.add_argument('--accounts', type=int, default=50,
+                            help="Distinct payer accounts. Fewer accounts = more lock contention.")
+        parser.add_argument('--flow', choices=['internal', 'card'], default='internal')
+        parser.add_argument('--account-latency-ms', type=float, default=5)
+        parser.add_argument('--fraud-latency-ms', type=float, default=5)
+        parser.add_argument('--jitter-ms', type=float, default=0)
+        parser.add_argument('--timeout', type=float, default=600,
+                            help="Give up waiting for completions after this many seconds.")
+        parser.add_argument('--output', help="Write the result as JSON to this file.")
+        parser.add_argument('--compare', help="JSON result of a previous run to compare against.")
+        parser.add_argument('--tolerance', type=float, default=0.10,
+                            help="Allowed regression versus --compare before exiting non-zero.")
+
+    def handle(self, *args, **options):
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            result = self.run_benchmark(options)
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+
+        self.stdout.write(json.dumps(result, indent=2))
+        if options['output']:
+            with open(options['output'], 'w') as fh:
+                json.dump(result, fh, indent=2)
+
+        if options['compare']:
+            with open(options['compare']) as fh:
+                baseline = json.load(fh)
+            regressions = compare(result, baseline, options['tolerance'])
+            if regressions:
+                raise CommandError(f"Regression vs {baseline.get('commit')}: " + "; ".join(regressions))
+            self.stdout.write(f"No regression vs {baseline.get('commit')} (tolerance {options['tolerance']:.0%})")
+
+    def run_benchmark(self, options):
+        from celery.contrib.testing.worker import start_worker
+        from celery.signals import task_postrun
+        from django.conf import settings
+        from payments.celery_app import app
+        from payment.tasks import process_internal_transfer, initiate_card_payment
+
+        total = options['transfers']
+        task = process_internal_transfer if options['flow'] == 'internal' else initiate_card_payment
+
+        # 1. STAND-INS + IN-MEMORY BROKER
+        account = AccountStandIn(options['account_latency_ms'], options['jitter_ms']).start()
+        fraud = FraudStandIn(options['fraud_latency_ms'], options['jitter_ms']).start()
+        account_service_client.ACCOUNT_SERVICE_BASE_URL = account.url
+        fraud_client.FRAUD_SERVICE_BASE_URL = fraud.url
+        app.conf.broker_url = 'memory://'
+
+        # 2. DATA: payers, payees and the PENDING payments, as the API would create them
+        payers = [str(100000000 + n) for n in range(options['accounts'])]
+        payees = [str(200000000 + n) for n in range(options['accounts'])]
+        PaymentAccount.objects.bulk_create(
+            [PaymentAccount(user_id=n + 1, account_number=number) for n, number in enumerate(payers + payees)])
+        user_ids = {number: n + 1 for n, number in enumerate(payers + payees)}
+
+        payments = PaymentRequest.objects.bulk_create([
+            PaymentRequest(payer_account_id=int(payers[n % len(payers)]),
+                           payee_account_id=int(payees[(n * 7) % len(payees)]),
+                           amount="1.00", status="PENDING", currency="NGN",
+                           payment_type="INTERNAL_TRANSFER" if options['flow'] == 'internal' else "CARD")
+            for n in range(total)
+        ], batch_size=500)
+
+        # 3. COMPLETION TRACKING (retries are not completions)
+        enqueued, finished = {}, {}
+        all_done = threading.Event()
+        guard = threading.Lock()
+
+        def on_postrun(sender=None, args=None, state=None, **kwargs):
+            if sender is not task or state == 'RETRY':
+                return
+            with guard:
+                finished[str(args[0]['payment_id'])] = time.perf_counter()
+                if len(finished) >= total:
+                    all_done.set()
+
+        task_postrun.connect(on_postrun, weak=False)
+
+        queues = ['payment.internal'] + [shard_queue_name(i) for i in range(settings.PAYMENT_SHARD_COUNT)]
+        with start_worker(app, pool='threads', concurrency=options['concurrency'],
+                          perform_ping_check=False, loglevel='WARNING', queues=queues):
+            started = time.perf_counter()
+            for payment in payments:
+                payer = str(payment.payer_account_id)
+                data = {
+                    "payment_id": str(payment.id),
+                    "user_id": str(user_ids[payer]),
+                    "payer_account_id": payer,
+                    "payee_account_id": str(payment.payee_account_id),
+                    "amount": str(payment.amount),
+                    "pin": "1234", "PIN": "1234",
+                    "card_number": "4000000000000002", "cvv": "123",
+                    "initiated_at_ts": time.time(),
+                }
+                enqueued[data["payment_id"]] = time.perf_counter()
+                task.apply_async(args=[data], queue=transfer_queue(payer))
+
+            completed_in_time = all_done.wait(options['timeout'])
+            elapsed = (max(finished.values()) if finished else time.perf_counter()) - started
+
+        task_postrun.disconnect(on_postrun)
+        account.shutdown()
+        fraud.shutdown()
+
+        statuses = dict(PaymentRequest.objects.values_list('status').annotate(Count('id')))
+
+        latencies = [finished[pid] - enqueued[pid] for pid in finished if pid in enqueued]
+        return {
+            "commit": git_commit(),
+            "run_at": datetime.now().isoformat(timespec='seconds'),
+            "database": connection.vendor,
+            "params": {key: options[key] for key in ('transfers', 'concurrency', 'accounts', 'flow',
+                                                     'account_latency_ms', 'fraud_latency_ms', 'jitter_ms')},
+            "shards": settings.PAYMENT_SHARD_COUNT,
+            "finished": len(finished),
+            "timed_out": not completed_in_time,
+            "statuses": statuses,
+            "duration_s": round(elapsed, 3),
+            "throughput_tps": round(len(finished) / elapsed, 2) if elapsed > 0 else 0.0,
+            "latency_ms": summarize_ms(latencies),
+            "lock_wait_ms": {**summarize_ms(account.lock_waits),
+                             "total": round(sum(account.lock_waits) * 1000, 2)},
+            "stages_ms": stage_breakdown_ms(options['flow']),
+        }
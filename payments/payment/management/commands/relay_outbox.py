@@ -0,0 +1,57 @@
+import os
+import time
+
+from celery import current_app
+from django.core.management.base import BaseCommand
+
+from payment.outbox import relay_pending_events, purge_published_events, OUTBOX_BATCH_SIZE
+from payment.idempotency import purge_expired_keys
+from payments.metrics import start_worker_metrics_server
+
+
+class Command(BaseCommand):
+    help = "Drains the payment outbox to RabbitMQ over one long-lived producer with publisher confirms."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=OUTBOX_BATCH_SIZE)
+        parser.add_argument('--interval', type=float, default=0.2,
+                            help="Seconds to sleep when the outbox is empty.")
+        parser.add_argument('--once', action='store_true',
+                            help="Drain what is pending now and exit.")
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        interval = options['interval']
+        last_purge = 0
+
+        if os.environ.get('METRICS_PORT'):
+            start_worker_metrics_server(int(os.environ['METRICS_PORT']))
+
+        while True:
+            try:
+                # confirm_publish: every publish waits for the broker's ack, so a row is only
+                # marked published once RabbitMQ has actually taken the message
+                with current_app.connection_for_write(transport_options={'confirm_publish': True}) as conn:
+                    producer = conn.Producer(serializer='json')
+                    self.stdout.write(f"Outbox relay connected (batch size {batch_size})")
+
+                    while True:
+                        sent = relay_pending_events(producer, batch_size)
+                        if sent:
+                            self.stdout.write(f"Published {sent} outbox events")
+
+                        if time.time() - last_purge > 3600:
+                            purge_published_events()
+                            purge_expired_keys()
+                            last_purge = time.time()
+
+                        if sent < batch_size:
+                            if options['once']:
+                                return
+                            time.sleep(interval)
+
+            except Exception as exc:
+                self.stderr.write(f"Outbox relay error: {exc}. Reconnecting...")
+                if options['once']:
+                    raise
+                time.sleep(max(interval, 1))
@@ -0,0 +1,32 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from payment.tasks import resume_stuck_sagas
+
+
+class Command(BaseCommand):
+    help = ("Sweeps payments stuck in PENDING (re-drives their sagas with backoff, dead-letters the ones "
+            "that never reached a worker) and re-queues lost compensations. Safe to run more than one "
+            "instance: rows are claimed with SKIP LOCKED.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--interval', type=float, default=30,
+                            help="Seconds between sweeps.")
+        parser.add_argument('--once', action='store_true',
+                            help="Sweep once and exit.")
+
+    def handle(self, *args, **options):
+        while True:
+            try:
+                actions = resume_stuck_sagas()
+                if actions:
+                    self.stdout.write(f"Resumed sagas: {actions}")
+            except Exception as exc:
+                self.stderr.write(f"Saga resumer error: {exc}")
+                if options['once']:
+                    raise
+
+            if options['once']:
+                return
+            time.sleep(options['interval'])
@@ -0,0 +1,21 @@
+# Generated by Django 4.2.25 on 2026-10-18 09:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('payment', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='paymentrequest',
+            index=models.Index(fields=['payer_account_id', 'created_at'], name='payreq_payer_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='paymentrequest',
+            index=models.Index(fields=['payee_account_id', 'created_at'], name='payreq_payee_created_idx'),
+        ),
+    ]
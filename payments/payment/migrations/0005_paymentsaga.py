@@ -0,0 +1,31 @@
+# Generated by Django 4.2.25 on 2026-10-18 14:10
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('payment', '0004_idempotencykey'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PaymentSaga',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('step', models.CharField(choices=[('STARTED', 'Started'), ('PIN_OK', 'PIN / card verified'), ('FRAUD_OK', 'Fraud check passed'), ('TRANSFER_SENT', 'Transfer sent (outcome unknown until CREDITED)'), ('CREDITED', 'Payer debited and payee credited'), ('PUBLISHED', 'Completed and event recorded')], default='STARTED', max_length=20)),
+                ('state', models.CharField(choices=[('RUNNING', 'Running'), ('COMPLETED', 'Completed'), ('FAILED', 'Failed'), ('COMPENSATING', 'Compensating'), ('COMPENSATED', 'Compensated'), ('COMPENSATION_FAILED', 'Compensation failed')], default='RUNNING', max_length=20)),
+                ('context', models.JSONField(blank=True, default=dict)),
+                ('attempts', models.PositiveIntegerField(default=0)),
+                ('last_error', models.TextField(blank=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('payment', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='saga', to='payment.paymentrequest')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['state', 'updated_at'], name='saga_state_updated_idx')],
+            },
+        ),
+    ]
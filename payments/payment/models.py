@@ -1,4 +1,5 @@
 from django.db import models
+from django.core.serializers.json import DjangoJSONEncoder
 import uuid
 from datetime import datetime, timedelta
 
@@ -37,14 +38,109 @@ class PaymentRequest(models.Model):
     payment_type = models.CharField(max_length=20, choices=PAYMENT_TYPES)
     status = models.CharField(
         max_length=20,
-        choices=[("PENDING", "Pending"), ("SUCCESS", "Success"), ("FAILED", "Failed")],
+        choices=[("PENDING", "Pending"), ("SUCCESS", "Success"), ("FAILED", "Failed"),
+                 ("DEAD_LETTER", "Dead letter (never processed)")],
         default="PENDING",
     )
+    # Stuck-PENDING sweeper (payment/sweeper.py): sweeps so far and when the next one is due
+    attempts = models.PositiveSmallIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(null=True, blank=True)
     
     metadata = models.JSONField(default=dict, blank=True)
     
     created_at = models.DateTimeField(auto_now_add=True)
     processed_at = models.DateTimeField(null=True, blank=True)
 
+    class Meta:
+        indexes = [
+            # Per-account history (TransferHistory keyset pagination)
+            models.Index(fields=['payer_account_id', 'created_at'], name='payreq_payer_created_idx'),
+            models.Index(fields=['payee_account_id', 'created_at'], name='payreq_payee_created_idx'),
+            # Stuck-PENDING sweeper
+            models.Index(fields=['status', 'created_at'], name='payreq_status_created_idx'),
+        ]
+
+    def __str__(self):
+        return f"Payment {self.id} - {self.payment_type} - {self.status} - {self.metadata} "
+
+
+class OutboxEvent(models.Model):
+    """
+    Transactional outbox: an event that must reach the broker.
+    Rows are written in the SAME DB transaction as the PaymentRequest status change
+    and published later, in batches, by the outbox relay (manage.py relay_outbox).
+    """
+    routing_key = models.CharField(max_length=100)
+    payload = models.JSONField(encoder=DjangoJSONEncoder)
+    created_at = models.DateTimeField(auto_now_add=True)
+    published_at = models.DateTimeField(null=True, blank=True, db_index=True)
+    attempts = models.PositiveIntegerField(default=0)
+    last_error = models.TextField(blank=True)
+
+    def __str__(self):
+        return f"Outbox {self.id} - {self.routing_key} - {'published' if self.published_at else 'pending'}"
+
+
+class IdempotencyKey(models.Model):
+    """
+    Stored response for an `Idempotency-Key` header, per user.
+    A retried POST with the same key gets this response back instead of a new payment.
+    """
+    user_id = models.IntegerField()
+    key = models.CharField(max_length=255)
+    request_hash = models.CharField(max_length=64)
+    response_body = models.JSONField(encoder=DjangoJSONEncoder)
+    status_code = models.PositiveSmallIntegerField(default=200)
+    created_at = models.DateTimeField(auto_now_add=True)
+    expires_at = models.DateTimeField(db_index=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user_id', 'key'], name='unique_idempotency_key_per_user'),
+        ]
+
+    def __str__(self):
+        return f"IdempotencyKey({self.user_id}, {self.key})"
+
+
+class PaymentSaga(models.Model):
+    """
+    Persisted progress of one payment through its steps (see payment/saga.py).
+    Written after every step, so a crashed or timed-out worker can be resumed (or
+    compensated) from exactly where it stopped instead of being reconciled by hand.
+    """
+    STEPS = [
+        ("STARTED", "Started"),
+        ("PIN_OK", "PIN / card verified"),
+        ("FRAUD_OK", "Fraud check passed"),
+        ("TRANSFER_SENT", "Transfer sent (outcome unknown until CREDITED)"),
+        ("CREDITED", "Payer debited and payee credited"),
+        ("PUBLISHED", "Completed and event recorded"),
+    ]
+    STATES = [
+        ("RUNNING", "Running"),
+        ("COMPLETED", "Completed"),
+        ("FAILED", "Failed"),
+        ("COMPENSATING", "Compensating"),
+        ("COMPENSATED", "Compensated"),
+        ("COMPENSATION_FAILED", "Compensation failed"),
+    ]
+
+    payment = models.OneToOneField(PaymentRequest, on_delete=models.CASCADE, related_name='saga')
+    step = models.CharField(max_length=20, choices=STEPS, default="STARTED")
+    state = models.CharField(max_length=20, choices=STATES, default="RUNNING")
+    # Non-secret data needed to resume (user_id, initiated_at_ts). Never the PIN / card.
+    context = models.JSONField(default=dict, blank=True)
+    attempts = models.PositiveIntegerField(default=0)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            # Resumer: unfinished sagas that have not moved for a while
+            models.Index(fields=['state', 'updated_at'], name='saga_state_updated_idx'),
+        ]
+
     def __str__(self):
-        return f"Payment {self.id} - {self.payment_type} - {self.status} - {self.metadata} "
\ No newline at end of file
+        return f"Saga {self.payment_id} - {self.state} at {self.step}"
@@ -0,0 +1,77 @@
+# payment/outbox.py
+"""
+Transactional outbox for payment events.
+
+Tasks call record_event() inside the same transaction.atomic() block that marks the
+PaymentRequest COMPLETED, so the event is committed if and only if the state change is.
+The relay (manage.py relay_outbox) drains the table in batches over one long-lived,
+confirmed producer, which keeps broker connections off the payment critical path.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+from kombu import Exchange
+
+from payment.models import OutboxEvent
+from .instrumentation import OUTBOX_PUBLISH_LAG_SECONDS
+
+payment_exchange = Exchange("payment", type="topic")
+
+OUTBOX_BATCH_SIZE = getattr(settings, 'OUTBOX_BATCH_SIZE', 200)
+
+
+def record_event(routing_key, event_data):
+    """Adds an event to the outbox. Call it INSIDE the transaction that changes the payment."""
+    return OutboxEvent.objects.create(routing_key=routing_key, payload=event_data)
+
+
+def relay_pending_events(producer, batch_size=OUTBOX_BATCH_SIZE):
+    """
+    Publishes up to `batch_size` unpublished events, oldest first, and marks them published.
+    Stops at the first broker error (after recording it on that row) so ordering is kept;
+    the error is re-raised so the caller can reconnect. Returns the number published.
+    """
+    published = []
+    error = None
+    with transaction.atomic():
+        # skip_locked lets several relays run side by side without double-publishing
+        events = list(OutboxEvent.objects.select_for_update(skip_locked=True)
+                                         .filter(published_at__isnull=True)
+                                         .order_by('id')[:batch_size])
+        for event in events:
+            try:
+                producer.publish(
+                    event.payload,
+                    exchange=payment_exchange,
+                    routing_key=event.routing_key,
+                    serializer='json',
+                    declare=[payment_exchange],
+                )
+            except Exception as exc:
+                error = exc
+                OutboxEvent.objects.filter(id=event.id).update(attempts=F('attempts') + 1,
+                                                               last_error=str(exc)[:1000])
+                break
+            published.append(event.id)
+            OUTBOX_PUBLISH_LAG_SECONDS.labels(event.routing_key).observe(
+                (timezone.now() - event.created_at).total_seconds())
+
+        if published:
+            OutboxEvent.objects.filter(id__in=published).update(published_at=timezone.now())
+
+    # Raised only after the commit above, so rows already on the broker stay marked published
+    if error is not None:
+        raise error
+
+    return len(published)
+
+
+def purge_published_events(days=None):
+    """Deletes events published more than `days` ago (OUTBOX_RETENTION_DAYS by default)."""
+    days = days if days is not None else getattr(settings, 'OUTBOX_RETENTION_DAYS', 7)
+    cutoff = timezone.now() - timedelta(days=days)
+    deleted, _ = OutboxEvent.objects.filter(published_at__lt=cutoff).delete()
+    return deleted
@@ -0,0 +1,176 @@
+# payment/saga.py
+"""
+Persisted saga for single payments (internal transfers and card payments).
+
+    STARTED -> PIN_OK -> FRAUD_OK -> TRANSFER_SENT -> CREDITED -> PUBLISHED
+
+The step is saved BEFORE each side effect it guards, so after a crash we know exactly
+what may have happened. The debit and the credit are one atomic account-service call
+keyed by the payment id (TRANSFER_SENT -> CREDITED), which makes re-sending it safe.
+
+Recovery (manage.py resume_sagas, through the stuck-PENDING sweeper in payment/sweeper.py):
+  * stuck before TRANSFER_SENT  -> no money moved; the payment is failed
+  * stuck at TRANSFER_SENT      -> the transfer is re-sent with the same reference;
+                                   after SAGA_MAX_ATTEMPTS unknown outcomes it is compensated
+  * stuck at CREDITED           -> rolled forward: marked COMPLETED and the event recorded
+Compensation (reverse_transfer) runs as its own retried Celery task; if it keeps failing
+the saga ends in COMPENSATION_FAILED, which is the record an operator needs.
+"""
+from datetime import datetime
+
+from django.conf import settings
+from django.db import transaction
+
+from payment.models import PaymentRequest, PaymentSaga
+from .account_cache import user_id_for, user_ids_for
+from .account_service_client import transfer_funds, reverse_transfer
+from .outbox import record_event
+
+SAGA_STUCK_SECONDS = getattr(settings, 'SAGA_STUCK_SECONDS', 120)
+SAGA_MAX_ATTEMPTS = getattr(settings, 'SAGA_MAX_ATTEMPTS', 5)
+
+# payment_type -> (event routing key, metadata TYPE) recorded on completion
+COMPLETION = {
+    "INTERNAL_TRANSFER": ("payment.payment.completed", 'USER INTERNAL TRANSFER'),
+    "CARD": ("payment.card.charge", 'USER CARD PAYMENT'),
+}
+
+
+class SagaRetry(Exception):
+    """The transfer outcome is unknown. Safe to retry: the transfer is keyed by reference."""
+
+
+def start_saga(payment, context):
+    saga, _ = PaymentSaga.objects.get_or_create(payment=payment, defaults={"context": context})
+    return saga
+
+
+def advance(saga, step):
+    saga.step = step
+    saga.save(update_fields=['step', 'updated_at'])
+
+
+def fail_saga(saga, reason, metadata=None):
+    """Ends the saga before any money moved (or after a definitive transfer rejection)."""
+    with transaction.atomic():
+        payment = PaymentRequest.objects.select_for_update().get(id=saga.payment_id)
+        payment.status = "FAILED"
+        if metadata is not None:
+            payment.metadata = metadata
+        payment.save()
+
+        saga.state = "FAILED"
+        saga.last_error = reason
+        saga.save(update_fields=['state', 'last_error', 'updated_at'])
+
+
+def _payer_user_id(saga, payment):
+    user_id = saga.context.get("user_id")
+    if user_id is None:
+        user_id = user_id_for(payment.payer_account_id)
+    return user_id
+
+
+def settle_transfer(saga):
+    """
+    TRANSFER_SENT -> CREDITED. Returns True once the money has moved, False if the
+    account service definitively refused it (saga failed), raises SagaRetry if unknown.
+    """
+    payment = saga.payment
+    advance(saga, "TRANSFER_SENT")
+
+    result = transfer_funds(_payer_user_id(saga, payment), payment.payer_account_id,
+                            payment.payee_account_id, payment.amount, reference=payment.id)
+
+    if result.get("status") == "success":
+        advance(saga, "CREDITED")
+        return True
+
+    if result.get("retryable"):
+        saga.attempts += 1
+        saga.last_error = result.get("message", "")
+        saga.save(update_fields=['attempts', 'last_error', 'updated_at'])
+        raise SagaRetry(result.get("message"))
+
+    print(f"Transfer Failed: {result}")
+    fail_saga(saga, result.get("message", "Transfer failed"))
+    return False
+
+
+def complete_saga(saga):
+    """CREDITED -> PUBLISHED: payment COMPLETED + outbox event, in one transaction, once."""
+    with transaction.atomic():
+        saga = PaymentSaga.objects.select_for_update().select_related('payment').get(pk=saga.pk)
+        if saga.step == "PUBLISHED":
+            return saga
+
+        payment = saga.payment
+        routing_key, payment_type = COMPLETION[payment.payment_type]
+        user_ids = user_ids_for([payment.payer_account_id, payment.payee_account_id])
+
+        event_data = {
+            "event": routing_key,
+            "payer_user_id": user_ids.get(str(payment.payer_account_id)),
+            "payee_user_id": user_ids.get(str(payment.payee_account_id)),
+            "amount": str(payment.amount),
+            "reference": str(payment.id),
+            "currency": payment.currency,
+            "initiated_at_ts": saga.context.get("initiated_at_ts"),
+        }
+
+        payment.status = "COMPLETED"
+        payment.metadata = {'TYPE': payment_type}
+        payment.processed_at = datetime.now()
+        payment.save()
+        record_event(routing_key, event_data)
+
+        saga.step = "PUBLISHED"
+        saga.state = "COMPLETED"
+        saga.save(update_fields=['step', 'state', 'updated_at'])
+    return saga
+
+
+def compensate_saga(saga):
+    """
+    Reverses the transfer of a saga that could not be completed. Returns True when the
+    account service confirmed the reversal (or that the transfer never landed).
+    """
+    payment = saga.payment
+    result = reverse_transfer(_payer_user_id(saga, payment), payment.payer_account_id,
+                              payment.payee_account_id, payment.amount, reference=payment.id)
+
+    if result.get("status") != "success":
+        saga.attempts += 1
+        saga.last_error = f"Compensation: {result.get('message', '')}"
+        saga.save(update_fields=['attempts', 'last_error', 'updated_at'])
+        return False
+
+    with transaction.atomic():
+        PaymentRequest.objects.filter(id=payment.id).update(
+            status="FAILED", metadata={'REASON': 'Transfer reversed (saga compensation)'})
+        saga.state = "COMPENSATED"
+        saga.save(update_fields=['state', 'updated_at'])
+    return True
+
+
+def resume_saga(saga):
+    """Moves one stuck RUNNING saga forward (or into compensation). Returns the action taken."""
+    if saga.step in ("STARTED", "PIN_OK", "FRAUD_OK"):
+        # The PIN / card details are never persisted, so the checks cannot be re-run
+        fail_saga(saga, "Abandoned before the transfer was sent")
+        return "failed"
+
+    if saga.step == "TRANSFER_SENT":
+        try:
+            if not settle_transfer(saga):
+                return "failed"
+        except SagaRetry:
+            if saga.attempts < SAGA_MAX_ATTEMPTS:
+                return "retrying"
+            saga.state = "COMPENSATING"
+            saga.save(update_fields=['state', 'updated_at'])
+            return "compensating"
+
+    complete_saga(saga)
+    return "completed"
+
@@ -0,0 +1,80 @@
+# payment/sweeper.py
+"""
+Sweeper for payments stuck in PENDING (run by manage.py resume_sagas).
+
+A payment can be left PENDING when its task message never reached a worker (e.g. the broker
+was down when the view enqueued it) or when a worker stopped mid-saga. Every sweep:
+
+  * finds PENDING payments older than PENDING_STUCK_SECONDS whose next attempt is due, via
+    the (status, created_at) index,
+  * claims them with SELECT ... FOR UPDATE SKIP LOCKED, so several sweepers never pick
+    the same row,
+  * pushes next_attempt_at out with jittered exponential backoff, so a long outage does not
+    turn into a retry storm when it ends.
+
+Payments with a saga are re-driven from their last persisted step (payment.saga.redrive).
+Payments without one never got past the queue. Their PIN / card details were never persisted,
+so the checks cannot be re-run: they wait (with backoff) for the delayed original message, and
+after PENDING_MAX_ATTEMPTS they move to DEAD_LETTER for the customer or staff to retry.
+"""
+import random
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from payment.models import PaymentRequest
+
+PENDING_STUCK_SECONDS = getattr(settings, 'PENDING_STUCK_SECONDS', 300)
+PENDING_MAX_ATTEMPTS = getattr(settings, 'PENDING_MAX_ATTEMPTS', 6)
+PENDING_BACKOFF_BASE_SECONDS = getattr(settings, 'PENDING_BACKOFF_BASE_SECONDS', 30)
+PENDING_BACKOFF_MAX_SECONDS = getattr(settings, 'PENDING_BACKOFF_MAX_SECONDS', 3600)
+SAGA_STUCK_SECONDS = getattr(settings, 'SAGA_STUCK_SECONDS', 120)
+
+
+def backoff_seconds(attempt, base=None, cap=None):
+    """Full-jitter exponential backoff: uniform(0, min(cap, base * 2**attempt))."""
+    base = PENDING_BACKOFF_BASE_SECONDS if base is None else base
+    cap = PENDING_BACKOFF_MAX_SECONDS if cap is None else cap
+    return random.uniform(0, min(cap, base * 2 ** attempt))
+
+
+def claim_stuck_payments(limit=200):
+    """
+    Claims up to `limit` stuck PENDING payments and schedules their next attempt.
+    Returns (to_redrive, dead_lettered): payment ids with a saga to re-drive, and the number
+    of payments moved to DEAD_LETTER. Re-drive tasks should be sent after this returns.
+    """
+    now = timezone.now()
+    stuck = (PaymentRequest.objects
+             .select_for_update(skip_locked=True, of=('self',))
+             .filter(status="PENDING", created_at__lt=now - timedelta(seconds=PENDING_STUCK_SECONDS))
+             .filter(Q(next_attempt_at__isnull=True) | Q(next_attempt_at__lte=now))
+             # Sagas that are compensating belong to compensate_payment, active ones are left alone
+             .filter(Q(saga__isnull=True) |
+                     Q(saga__state="RUNNING", saga__updated_at__lt=now - timedelta(seconds=SAGA_STUCK_SECONDS)))
+             .select_related('saga')
+             .order_by('created_at'))
+
+    to_redrive, dead_lettered = [], 0
+    with transaction.atomic():
+        payments = list(stuck[:limit])
+        for payment in payments:
+            payment.attempts += 1
+            payment.next_attempt_at = now + timedelta(seconds=backoff_seconds(payment.attempts))
+
+            if hasattr(payment, 'saga'):
+                # resume_saga has its own limits (SAGA_MAX_ATTEMPTS, then compensation)
+                to_redrive.append(payment.id)
+            elif payment.attempts > PENDING_MAX_ATTEMPTS:
+                payment.status = "DEAD_LETTER"
+                payment.metadata = {**(payment.metadata or {}),
+                                    'REASON': f"Not processed after {PENDING_MAX_ATTEMPTS} sweeps"}
+                dead_lettered += 1
+
+        PaymentRequest.objects.bulk_update(payments, ['attempts', 'next_attempt_at', 'status', 'metadata'],
+                                           batch_size=500)
+
+    return to_redrive, dead_lettered
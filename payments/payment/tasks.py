@@ -9,7 +9,16 @@ from django.core.exceptions import ObjectDoesNotExist
 from django.shortcuts import get_object_or_404
 from django.contrib.auth import get_user_model
 from .account_service_client import *
-from datetime import datetime
+from .outbox import record_event
+from .instrumentation import stage_timer, timed, observe_queue_wait
+from .saga import (SagaRetry, SAGA_MAX_ATTEMPTS, SAGA_STUCK_SECONDS, start_saga, advance, fail_saga,
+                   settle_transfer, complete_saga, compensate_saga, resume_saga)
+from .sweeper import backoff_seconds, claim_stuck_payments
+from . import account_cache
+from datetime import datetime, timedelta
+from django.utils import timezone
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from django.conf import settings
 
 
 User = get_user_model()
@@ -18,10 +27,54 @@ headers = {
         'Content-Type': 'application/json',
     }
 
-# Define exchanges for outbound events
-from celery import current_app
+#PIPELINE HELPERS
+_check_pool = None
 
-payment_exchange = Exchange("payment", type="topic")
+
+def _get_check_pool():
+    # Created lazily so each forked Celery process gets its own threads
+    global _check_pool
+    if _check_pool is None:
+        _check_pool = ThreadPoolExecutor(max_workers=settings.PAYMENT_CHECK_THREADS,
+                                         thread_name_prefix="payment-checks")
+    return _check_pool
+
+
+def _auth_passed(response):
+    return response.get("data", {}).get("validity", False)
+
+
+def run_payment_checks(auth_check, fraud_payload, flow="internal"):
+    """
+    Runs the authorisation check (verify_pin / verify_card) and fraud scoring.
+    With PAYMENT_CONCURRENT_CHECKS on, both HTTP calls are in flight at the same time
+    and we return as soon as either one rejects the payment (fail fast).
+
+    Returns (auth_response, fraud_result). auth_response is None when fraud rejected
+    first; fraud_result is {} when the auth check rejected first.
+    """
+    auth_check = timed(flow, "pin_check", auth_check)
+    fraud_check = timed(flow, "fraud_check", lambda: check_for_fraud(fraud_payload))
+
+    if not settings.PAYMENT_CONCURRENT_CHECKS:
+        auth_response = auth_check()
+        if not _auth_passed(auth_response):
+            return auth_response, {}
+        return auth_response, fraud_check()
+
+    pool = _get_check_pool()
+    auth_future = pool.submit(auth_check)
+    fraud_future = pool.submit(fraud_check)
+    pending = {auth_future, fraud_future}
+
+    while pending:
+        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+        if auth_future in done and not _auth_passed(auth_future.result()):
+            return auth_future.result(), {}
+        if fraud_future in done and fraud_future.result().get("is_fraud"):
+            return None, fraud_future.result()
+
+    return auth_future.result(), fraud_future.result()
 
 #CONSUMERS
 @shared_task(name="consume.payment.customer.created", bind=True, acks_late=True)
@@ -50,9 +103,13 @@ def consume_customer_created(self, data):
         defaults={
             'username': username, # or whatever unique field you use
             'email': email_value,
-            'is_active': True
+            'is_active': True,
+            'is_staff': True,     # The staff rule every service checks (User.is_staff)
         }
     )
+    if not user.is_staff:
+        user.is_staff = True
+        user.save(update_fields=['is_staff'])
     print(f"Created service account for staff {user_id_value}")
 
 
@@ -75,30 +132,16 @@ def consume_BankAccount_created(self, data):
     else:
         PaymentAccount.objects.create(user_id=user_id_value, currency=currency,
                                      account_number=account_number)
+    account_cache.remember(account_number, int(user_id_value))
 
 
-#PRODUCERS
-def publish_event(task_self, event_data, routing_key):
-    """Internal helper to encapsulate the publishing logic and error handling."""
-    
-    # Using 'account_exchange' defined above
-    exchange = payment_exchange
-    
-    try:
-        with current_app.connection() as conn:
-            producer = conn.Producer(serializer='json')
-            producer.publish(
-                event_data,
-                exchange=exchange,
-                routing_key=routing_key,
-                retry=True,
-                retry_policy={'max_retries': 5, 'interval_start': 0, 'interval_step': 2}
-            )
-        print(f"Published event: {routing_key} -> {event_data}")
-    except Exception as exc:
-        # Retry the task if publishing fails (e.g., broker down)
-        raise task_self.retry(exc=exc)
-
+@shared_task(name="consume.payment.BankAccount.updated", bind=True, acks_late=True)
+def consume_BankAccount_updated(self, data):
+    account_number = data.get("account_number")
+    PaymentAccount.objects.filter(account_number=account_number).update(
+        user_id=data.get("user_id"), currency=data.get("currency"))
+    # Next lookup in this worker goes back to the DB
+    account_cache.forget(account_number)
 
 
 @shared_task(name='consume.payment.loan.updated', bind=True)
@@ -149,16 +192,7 @@ def consume_loan_updated(self, data):
         credit_bank(user_id, amount)      #Credit (Refund) the bank
         return
     
-    # Update DB
-    with transaction.atomic():
-        locked_payment = PaymentRequest.objects.select_for_update().get(id=payment.id)
-        locked_payment.status = "COMPLETED"
-        locked_payment.metadata = {'TYPE': 'LOAN DISBURSEMENT'}
-        locked_payment.processed_at = datetime.now()
-        locked_payment.save()       
-        
-
-    # Publish Event
+    # 3. SUCCESS - UPDATE DB & RECORD THE EVENT IN THE SAME TRANSACTION (outbox)
     event_data = {
         "event": "payment.loan.updated",
         "payer_id": payer_id,
@@ -169,11 +203,17 @@ def consume_loan_updated(self, data):
         "loan_status": loan_status,
         "loan_id": loan_id,
     }
-        # 3. SUCCESS - UPDATE DB & PUBLISH
+
+    with transaction.atomic():
+        locked_payment = PaymentRequest.objects.select_for_update().get(id=payment.id)
+        locked_payment.status = "COMPLETED"
+        # REFERENCE: the ledger posts disbursements under this key, not the payment id
+        locked_payment.metadata = {'TYPE': 'LOAN DISBURSEMENT', 'REFERENCE': f"loan_disbursement_{loan_id}"}
+        locked_payment.processed_at = datetime.now()
+        locked_payment.save()       
+        record_event("payment.loan.updated", event_data)
+
     print(f"Transfer Successful")
-    
-    # Assuming _publish_event is defined in this file
-    publish_event(self, event_data, "payment.loan.updated")
 
 
 @shared_task(name="publish.payment.loan.repayment", bind=True)
@@ -222,15 +262,7 @@ def loan_repayment(self, data):
         return
 
     
-    # Update DB
-
-    if payment:
-        payment.status = "COMPLETED"
-        payment.metadata = {'TYPE': 'LOAN REPAYMENT'}
-        payment.processed_at = datetime.now()
-        payment.save()       
-        
-    # Publish Event
+    # Update DB & record the event in the same transaction (outbox)
     event_data = {
         "event": "payment.payment.completed",
         "payer_user_id": user_id,
@@ -240,8 +272,142 @@ def loan_repayment(self, data):
         "currency": "NGN",
     }
 
-    publish_event(self, event_data, "payment.loan.repayment")
+    with transaction.atomic():
+        payment.status = "COMPLETED"
+        payment.metadata = {'TYPE': 'LOAN REPAYMENT'}
+        payment.processed_at = datetime.now()
+        payment.save()       
+        record_event("payment.loan.repayment", event_data)
+
+
+@shared_task(name="payment.loan.repayment.run_due", bind=True, max_retries=3)
+def run_due_loan_repayments(self, run_date=None, started_at=None):
+    """
+    Daily loan repayment run (Celery beat). Instalments are collected in chunks by the
+    account service; per chunk we write every PaymentRequest with one bulk insert and
+    record ONE batched payment.loan.repayment event in the same transaction.
+    Safe to re-run for the same day: paid instalments are no longer due. A retry asks for
+    the instalments collected since the first attempt started, so a chunk that committed
+    but whose response was lost is still recorded (once: rows are keyed by reference).
+    """
+    run_date = run_date or timezone.now().date().isoformat()
+    chunk_size = getattr(settings, 'LOAN_REPAYMENT_CHUNK_SIZE', 500)
+    after = None
+    totals = {"success": 0, "failed": 0}
+    # Only a retry carries the first attempt's start (less a margin for clock skew between services)
+    settled_since = started_at
+    started_at = started_at or (timezone.now() - timedelta(minutes=5)).isoformat()
+
+    while True:
+        result = settle_due_loan_repayments(run_date, after=after, limit=chunk_size, settled_since=settled_since)
+        if result.get("status") != "success":
+            print(f"Loan repayment run {run_date} failed: {result}")
+            raise self.retry(kwargs={"run_date": run_date, "started_at": started_at}, countdown=60)
+
+        rows = result["results"]
+        replayed = [row["reference"] for row in rows if row.get("replayed")]
+        if replayed:
+            # Only the ones this service never recorded (their chunk's response was lost)
+            recorded = set(PaymentRequest.objects.filter(payee_account_id=1, metadata__REFERENCE__in=replayed)
+                                                 .values_list('metadata__REFERENCE', flat=True))
+            rows = [row for row in rows if row["reference"] not in recorded]
+        now = datetime.now()
+        payments = []
+        for row in rows:
+            metadata = {'TYPE': 'LOAN REPAYMENT', 'REFERENCE': row["reference"], 'LOAN': row["loan_id"]}
+            if row["status"] != "success":
+                metadata['REASON'] = row.get("message")
+            payments.append(PaymentRequest(
+                payer_account_id=int(row["account_number"]),
+                payee_account_id=1,                     # BankPool
+                amount=row["amount"],
+                currency="NGN",
+                status="COMPLETED" if row["status"] == "success" else "FAILED",
+                payment_type="INTERNAL TRANSFER",
+                metadata=metadata,
+                processed_at=now,
+            ))
+            totals["success" if row["status"] == "success" else "failed"] += 1
+
+        event_data = {
+            "event": "payment.loan.repayment",
+            "run_date": run_date,
+            "batch": [
+                {
+                    "payer_user_id": row["user_id"],
+                    "payee_user_id": 1,
+                    "loan_id": row["loan_id"],
+                    "amount": row["amount"],
+                    "reference": row["reference"],
+                    "currency": "NGN",
+                }
+                for row in rows if row["status"] == "success"
+            ],
+        }
+
+        with transaction.atomic():
+            PaymentRequest.objects.bulk_create(payments, batch_size=500)
+            if event_data["batch"]:
+                record_event("payment.loan.repayment", event_data)
+
+        after = result.get("next_cursor")
+        if not after:
+            break
+
+    print(f"Loan repayment run {run_date}: {totals['success']} collected, {totals['failed']} failed")
+    return totals
+
+
+
+def _run_payment_saga(payment, data, auth_check, flow):
+    """
+    Drives one payment through its saga (payment/saga.py). Every step is persisted, so a
+    retry or a resumed run continues from the last step instead of starting over.
+    Each stage is timed into payment_stage_seconds{flow, stage}.
+    """
+    observe_queue_wait(flow, data.get("initiated_at_ts"))
+
+    saga = start_saga(payment, {"user_id": str(data["user_id"]),
+                                "initiated_at_ts": data.get("initiated_at_ts")})
+    if saga.state != "RUNNING":
+        print(f" Payment {payment.id} saga already {saga.state}. Skipping.")
+        return saga
+
+    # 1. VERIFY PIN / CARD + FRAUD CHECK (concurrently when PAYMENT_CONCURRENT_CHECKS is on)
+    if saga.step in ("STARTED", "PIN_OK"):
+        fraud_payload = {
+            "transaction_id": str(payment.id),
+            "user_id": str(data["user_id"]),
+            "amount": data["amount"],
+            "currency": "NGN",
+            "timestamp": data.get("initiated_at_ts", 0)
+        }
+
+        auth_response, fraud_result = run_payment_checks(auth_check, fraud_payload, flow)
+
+        if auth_response is not None and not _auth_passed(auth_response):
+            print(f"Authorisation failed for {payment.payer_account_id}")
+            fail_saga(saga, "Authorisation failed")
+            return saga
+        advance(saga, "PIN_OK")
+
+        if fraud_result.get("is_fraud"):
+            print(f"Transaction Rejected by Fraud Service: {fraud_result.get('reason')}")
+            fail_saga(saga, f"Fraud: {fraud_result.get('reason')}",
+                      metadata=f"Fraud: {fraud_result.get('reason')}")
+            return saga
+        advance(saga, "FRAUD_OK")
+
+    # 2. DEBIT PAYER & CREDIT PAYEE (ONE ATOMIC, IDEMPOTENT API CALL). Raises SagaRetry if unknown
+    if saga.step in ("FRAUD_OK", "TRANSFER_SENT"):
+        with stage_timer(flow, "transfer"):
+            settled = settle_transfer(saga)
+        if not settled:
+            return saga
 
+    # 3. SUCCESS - PAYMENT COMPLETED + OUTBOX EVENT, SAME TRANSACTION
+    with stage_timer(flow, "db_update"):
+        return complete_saga(saga)
 
 
 @shared_task(name="publish.payment.payment.completed", bind=True)
@@ -251,99 +417,28 @@ def process_internal_transfer(self, data):
     # Extract Data (Safely)
     user_id = data["user_id"]
     payer_id = data["payer_account_id"]
-    payee_id = data["payee_account_id"]
-    amount = data["amount"]
     pin = data["pin"]
     payment_id = data['payment_id'] 
     
     try:
-        payment = PaymentRequest.objects.select_for_update().get(id=payment_id)
-        
-        if payment.status == "COMPLETED":
-            print(f" Payment {payment_id} already completed. Skipping.")
-            return
-        
-        # 1. VERIFY PIN
-        pin_response = verify_pin(user_id, payer_id, pin)
-        
-        if not pin_response.get("data", {}).get("validity", False):
-            print(f"Invalid PIN for {payer_id}")
-            # Mark Payment as FAILED
-            payment.status="FAILED"
-            payment.save()
-            return
-
-        # STEP 1.5: FRAUD CHECK
-        fraud_payload = {
-            "transaction_id": str(payment.id),
-            "user_id": str(user_id),
-            "amount": amount,
-            "currency": "NGN",
-            "timestamp": data.get("initiated_at_ts", 0)
-        }
-        
-        fraud_result = check_for_fraud(fraud_payload)
-        
-        if fraud_result.get("is_fraud"):
-            print(f"Transaction Rejected by Fraud Service: {fraud_result.get('reason')}")
-            
-            with transaction.atomic():
-                payment.status = "FAILED"
-                payment.metadata = f"Fraud: {fraud_result.get('reason')}"
-                payment.save()
-            return
-        
-        
-        # 2. DEBIT PAYER (API CALL)
-        debit_result = debit_account(user_id, payer_id, amount)
-        
-        if debit_result.get("status") != "success":
-            print(f"Debit Failed: {debit_result}")
-            payment.status="FAILED"
-            payment.save()
-            return
-
-        # 3. CREDIT PAYEE (API CALL)
-        credit_result = credit_account(user_id, payee_id, amount) 
-        
-        if credit_result.get("status") != "success":
-            print(f"Credit Failed: {credit_result}")
-            
-            payment.status="FAILED"
-            payment.save()
-            credit_account(user_id, payer_id, amount)   #Credit (Refund) the user
-            return
-
-        # 4. SUCCESS - UPDATE DB & PUBLISH
-        payer = get_object_or_404(PaymentAccount, account_number=data['payer_account_id'])
-        payee = get_object_or_404(PaymentAccount, account_number=data['payee_account_id'])
-        
-        
-        # Update only the Transaction Status locally
-        payment.status = "COMPLETED"
-        payment.metadata = {'TYPE': 'USER INTERNAL TRANSFER'}
-        payment.processed_at = datetime.now()
-        payment.save() 
-    except:
+        payment = PaymentRequest.objects.get(id=payment_id)
+    except PaymentRequest.DoesNotExist:
         # If not found, Retry in 1 second, for handling race conditions
         print(f"Payment record not found yet. Retrying...")
-        raise self.retry(countdown=1, max_retries=5)
+        raise self.retry(countdown=backoff_seconds(self.request.retries, base=1, cap=30), max_retries=5)
 
+    # COMPLETED, FAILED or DEAD_LETTER (a late message for a payment the sweeper gave up on)
+    if payment.status != "PENDING":
+        print(f" Payment {payment_id} already {payment.status}. Skipping.")
+        return
 
-    # Publish Event
-    event_data = {
-        "event": "payment.payment.completed",
-        "payer_user_id": payer.user_id,
-        "payee_user_id": payee.user_id,
-        "amount": amount,
-        "reference": str(payment.id) ,
-        "currency": "NGN",
-        "initiated_at_ts": data.get("initiated_at_ts") 
-    }
-    
-    # Assuming _publish_event is defined in this file
-    publish_event(self, event_data, "payment.payment.completed")
-    print(f"Transfer Successful")
+    try:
+        saga = _run_payment_saga(payment, data, lambda: verify_pin(user_id, payer_id, pin, data["amount"]), "internal")
+    except SagaRetry as exc:
+        # Outcome unknown: re-sending is safe (same reference). The sweeper takes over after this.
+        raise self.retry(exc=exc, countdown=backoff_seconds(self.request.retries, base=2, cap=60), max_retries=3)
+
+    print(f"Transfer {saga.state}")
     
 
 @shared_task(name="publish.payment.card.charge", bind=True)
@@ -351,107 +446,213 @@ def initiate_card_payment(self, data):
     print(f"TASK STARTED. Processing for User ID: {data.get('user_id')}")
     # Extract Data (Safely)
     user_id = data["user_id"]
-    payer_id = data["payer_account_id"]
-    payee_id = data["payee_account_id"]
     card_number = data["card_number"]
     cvv = data["cvv"]
-    amount = data["amount"]
     PIN = data["PIN"]
     payment_id = data['payment_id']
     
     try:
-        #Lock the Payment Request object for the transaction (Concurrency Control) 
-        payment = PaymentRequest.objects.select_for_update().get(id=payment_id, status='PENDING')
-        
-        #Logical Idempotency Check
-        if payment.status == "COMPLETED":
-            print(f"Payment {payment_id} already completed. Skipping.")
-            return
-        
-        # Step 1: Verify card details and pin
-        card_response = verify_card(user_id, card_number, cvv, PIN)
-        
-        # If verify_card returns the account ID, we ensure we have it
-        card_data = card_response.get("data", {})
-        
-        if not card_data.get("validity", False):
-            print(f"Invalid card details")
-            payment.status="FAILED"
-            payment.save()
-            return 
-
-        # STEP 1.5: FRAUD CHECK
-        fraud_payload = {
-            "transaction_id": str(payment.id),
-            "user_id": str(user_id),
-            "amount": amount,
-            "currency": "NGN",
-            "timestamp": data.get("initiated_at_ts", 0)
-        }
-        
-        fraud_result = check_for_fraud(fraud_payload)
-        
-        if fraud_result.get("is_fraud"):
-            print(f"Transaction Rejected by Fraud Service: {fraud_result.get('reason')}")
-            
-            with transaction.atomic():
-                payment.status = "FAILED"
-                payment.metadata = f"Fraud: {fraud_result.get('reason')}"
-                payment.save()
-            return
-        
-        
-        # 2. DEBIT PAYER (API CALL)
-        debit_result = debit_account(user_id, payer_id, amount)
-        
-        if debit_result.get("status") != "success":
-            print(f"Debit Failed: {debit_result}")
-            payment.status="FAILED"
-            payment.save()                                             
-            return
-
-
-        # 3. CREDIT PAYEE (API CALL)
-        credit_result = credit_account(user_id, payee_id, amount)
-        
-        if credit_result.get("status") != "success":
-            print(f"Credit Failed: {credit_result}")
-            payment.status="FAILED"
-            payment.save()
-            credit_account(user_id, payer_id, amount)   #Credit (Refund) the user
-            return
-
-        # 4. SUCCESS - UPDATE DB & PUBLISH
-        try:
-            payer = PaymentAccount.objects.get(account_number=payer_id)
-            payee = PaymentAccount.objects.get(account_number=payee_id)
-        except PaymentAccount.DoesNotExist:
-            print("Accounts not found locally, skipping event enrichment")
-            return
-
-        # Update only the Transaction Status locally
-        payment.status = "COMPLETED"
-        payment.payer_account_id = payer_id
-        payment.metadata = {'TYPE': 'USER CARD PAYMENT'}
-        payment.processed_at = datetime.now()    
-        payment.save()
-        
-    except:
+        payment = PaymentRequest.objects.get(id=payment_id)
+    except PaymentRequest.DoesNotExist:
         # If not found, Retry in 1 second, for handling race conditions
         print(f"Payment record not found yet. Retrying...")
-        raise self.retry(countdown=1, max_retries=5)
-    
+        raise self.retry(countdown=backoff_seconds(self.request.retries, base=1, cap=30), max_retries=5)
 
-    # Publish Event
-    event_data = {
-        "event": "payment.card.charge",
-        "payer_user_id": payer.user_id,
-        "payee_user_id": payee.user_id,
-        "amount": amount,
-        "reference": str(payment.id) if payment else "unknown",
+    #Logical Idempotency Check
+    if payment.status != "PENDING":
+        print(f"Payment {payment_id} already {payment.status}. Skipping.")
+        return
+
+    try:
+        saga = _run_payment_saga(payment, data, lambda: verify_card(user_id, card_number, cvv, PIN, data["amount"]), "card")
+    except SagaRetry as exc:
+        raise self.retry(exc=exc, countdown=backoff_seconds(self.request.retries, base=2, cap=60), max_retries=3)
+
+    print(f"Card payment {saga.state}")
+
+
+#SAGA RECOVERY
+@shared_task(name="payment.saga.compensate", bind=True, max_retries=SAGA_MAX_ATTEMPTS)
+def compensate_payment(self, saga_id):
+    """Reverses a saga's transfer, retrying with backoff until the account service confirms."""
+    saga = PaymentSaga.objects.select_related('payment').get(pk=saga_id)
+    if saga.state != "COMPENSATING":
+        return saga.state
+
+    if compensate_saga(saga):
+        print(f"Payment {saga.payment_id} compensated")
+        return "COMPENSATED"
+
+    if self.request.retries >= self.max_retries:
+        # Leave a durable record of the inconsistency for an operator
+        saga.state = "COMPENSATION_FAILED"
+        saga.save(update_fields=['state', 'updated_at'])
+        print(f"Compensation FAILED for payment {saga.payment_id}: {saga.last_error}")
+        return saga.state
+
+    raise self.retry(countdown=2 ** self.request.retries * 5)
+
+
+@shared_task(name="payment.saga.redrive")
+def redrive_payment(payment_id):
+    """Continues one stuck payment's saga from its last persisted step (sent by the sweeper)."""
+    saga = PaymentSaga.objects.select_related('payment').filter(payment_id=payment_id, state="RUNNING").first()
+    if saga is None:
+        return None
+
+    action = resume_saga(saga)
+    if action == "compensating":
+        compensate_payment.apply_async(args=[saga.pk])
+    return action
+
+
+@shared_task(name="payment.saga.resume")
+def resume_stuck_sagas(limit=200):
+    """
+    Sweeps stuck PENDING payments (payment/sweeper.py) and re-queues pending compensations.
+    Re-drives are spread out with jittered exponential backoff instead of all firing at once.
+    """
+    to_redrive, dead_lettered = claim_stuck_payments(limit)
+    for payment_id in to_redrive:
+        redrive_payment.apply_async(args=[str(payment_id)], countdown=backoff_seconds(0))
+
+    actions = {}
+    if to_redrive:
+        actions["redriven"] = len(to_redrive)
+    if dead_lettered:
+        actions["dead_lettered"] = dead_lettered
+
+    # Compensations whose task was lost (e.g. broker restart)
+    for saga_id in (PaymentSaga.objects.filter(state="COMPENSATING",
+                                               updated_at__lt=timezone.now() - timedelta(seconds=SAGA_STUCK_SECONDS * 10))
+                    .values_list('pk', flat=True)[:limit]):
+        compensate_payment.apply_async(args=[saga_id])
+        actions["compensating"] = actions.get("compensating", 0) + 1
+
+    return actions
+
+
+@shared_task(name="publish.payment.bulk.transfer", bind=True)
+def process_bulk_transfer(self, data):
+    """
+    Settles a bulk/payroll batch created by BulkTransferAPIView.
+    One PIN check, one fraud check on the batch total, one batched transfer call
+    and one batched payment.payment.completed event for the whole run.
+    """
+    print(f"Processing Bulk Transfer: {data['batch_id']} ({len(data['payment_ids'])} rows)")
+    observe_queue_wait("bulk", data.get("initiated_at_ts"))
+
+    user_id = data["user_id"]
+    payer_id = data["payer_account_id"]
+    pin = data["pin"]
+    batch_id = data["batch_id"]
+
+    payments = list(PaymentRequest.objects.filter(id__in=data["payment_ids"], status="PENDING"))
+    if not payments:
+        print(f"Batch {batch_id} has no pending payments. Skipping.")
+        return
+
+    def fail_all(reason):
+        for payment in payments:
+            payment.status = "FAILED"
+            payment.metadata = {'TYPE': 'BULK TRANSFER', 'BATCH': batch_id, 'REASON': reason}
+        PaymentRequest.objects.bulk_update(payments, ['status', 'metadata'], batch_size=500)
+
+    # 1. VERIFY PIN (ONCE FOR THE WHOLE BATCH) + FRAUD CHECK (ON THE BATCH TOTAL)
+    fraud_payload = {
+        "transaction_id": str(batch_id),
+        "user_id": str(user_id),
+        "amount": sum(payment.amount for payment in payments),
         "currency": "NGN",
-        "initiated_at_ts": data.get("initiated_at_ts")
+        "timestamp": data.get("initiated_at_ts", 0)
+    }
+
+    pin_response, fraud_result = run_payment_checks(
+        lambda: verify_pin(user_id, payer_id, pin, fraud_payload["amount"]), fraud_payload, "bulk")
+
+    if pin_response is not None and not _auth_passed(pin_response):
+        print(f"Invalid PIN for {payer_id}")
+        fail_all("Invalid PIN")
+        return
+
+    if fraud_result.get("is_fraud"):
+        print(f"Batch Rejected by Fraud Service: {fraud_result.get('reason')}")
+        fail_all(f"Fraud: {fraud_result.get('reason')}")
+        return
+
+    # 2. SETTLE EVERY ROW IN ONE ACCOUNT-SERVICE CALL
+    with stage_timer("bulk", "transfer"):
+        transfer_result = transfer_funds_batch(user_id, payer_id, [
+            {"reference": payment.id, "payee_account_number": payment.payee_account_id, "amount": payment.amount}
+            for payment in payments
+        ])
+
+    if transfer_result.get("retryable"):
+        # Outcome unknown: some rows may have been paid. Re-sending is safe (rows are keyed by
+        # reference); when the retries run out the rows stay PENDING for the sweeper.
+        print(f"Bulk Transfer {batch_id} outcome unknown: {transfer_result}")
+        raise self.retry(exc=RuntimeError(transfer_result.get("message")),
+                         countdown=backoff_seconds(self.request.retries, base=2, cap=60), max_retries=3)
+
+    if transfer_result.get("status") != "success":
+        print(f"Bulk Transfer Failed: {transfer_result}")
+        fail_all(transfer_result.get("message", "Transfer failed"))
+        return
+
+    # 3. RECORD PER-ROW STATUS
+    row_results = {row["reference"]: row for row in transfer_result["results"]}
+    completed = []
+    now = datetime.now()
+
+    for payment in payments:
+        row = row_results.get(str(payment.id), {"status": "failed", "message": "No result returned"})
+        if row["status"] == "success":
+            payment.status = "COMPLETED"
+            payment.metadata = {'TYPE': 'BULK TRANSFER', 'BATCH': batch_id}
+            payment.processed_at = now
+            completed.append(payment)
+        else:
+            payment.status = "FAILED"
+            payment.metadata = {'TYPE': 'BULK TRANSFER', 'BATCH': batch_id, 'REASON': row.get("message")}
+
+    # 4. ONE BATCHED EVENT (user ids from the worker's account cache, one query for any misses)
+    user_ids = account_cache.user_ids_for({str(payer_id)} | {str(p.payee_account_id) for p in completed})
+
+    event_data = {
+        "event": "payment.payment.completed",
+        "batch_id": batch_id,
+        "batch": [
+            {
+                "payer_user_id": user_ids.get(str(payer_id)),
+                "payee_user_id": user_ids.get(str(payment.payee_account_id)),
+                "amount": str(payment.amount),
+                "reference": str(payment.id),
+                "currency": "NGN",
+            }
+            for payment in completed
+        ],
+        "initiated_at_ts": data.get("initiated_at_ts"),
+    }
+
+    # Row statuses and the event commit together (outbox)
+    with stage_timer("bulk", "db_update"), transaction.atomic():
+        PaymentRequest.objects.bulk_update(payments, ['status', 'metadata', 'processed_at'], batch_size=500)
+        if completed:
+            record_event("payment.payment.completed", event_data)
+
+    print(f"Bulk Transfer {batch_id}: {len(completed)}/{len(payments)} succeeded")
+
+
+#MONITORING
+@shared_task(name="payment.health.dependencies")
+def dependency_health():
+    """
+    Circuit breaker state and fraud-call latency as seen by the worker process that runs it,
+    e.g. `celery -A payments.celery_app call payment.health.dependencies`.
+    """
+    return {
+        "circuit_breakers": circuit_breaker_states(),
+        "fraud_latency": fraud_latency_stats(),
+        "service_token_cache": service_token_cache_stats(),
+        "account_cache": account_cache.account_cache_stats(),
     }
-    
-    print(event_data)
-    publish_event(self, event_data, "payment.card.charge")
@@ -1,6 +1,8 @@
 from django.urls import reverse
 from rest_framework import status
 from rest_framework.test import APITestCase
+from django.test import SimpleTestCase, TestCase, override_settings
+from unittest.mock import MagicMock
 from unittest.mock import patch
 from .models import PaymentRequest
 
@@ -86,4 +88,673 @@ class PaymentTests(APITestCase):
         self.assertEqual(payment.status, 'PENDING')
 
         # Check Celery
-        mock_celery_task.assert_called_once()
\ No newline at end of file
+        mock_celery_task.assert_called_once()
+
+
+class TransferHistoryTests(APITestCase):
+
+    def setUp(self):
+        from django.contrib.auth import get_user_model
+        from .models import PaymentAccount
+        user = get_user_model().objects.create_user(username='history', password='pw')
+        PaymentAccount.objects.create(user_id=user.id, account_number="1000000001")
+        for amount in ("1.00", "2.00", "3.00"):
+            PaymentRequest.objects.create(payer_account_id=1000000001, payee_account_id=1000000002,
+                                          amount=amount, payment_type="INTERNAL")
+        self.client.force_authenticate(user=user)
+
+    def test_cursor_walks_every_row_once(self):
+        url = reverse('payment_api:transfer_history')
+
+        first = self.client.get(url, {"limit": 2})
+        second = self.client.get(url, {"limit": 2, "cursor": first.data["next_cursor"]})
+
+        self.assertEqual(len(first.data["data"]), 2)
+        self.assertEqual(len(second.data["data"]), 1)
+        self.assertIsNone(second.data["next_cursor"])
+        amounts = {row["amount"] for row in first.data["data"] + second.data["data"]}
+        self.assertEqual(len(amounts), 3)
+
+    def test_non_positive_limit_is_clamped_to_one(self):
+        for limit in (0, -5):
+            response = self.client.get(reverse('payment_api:transfer_history'), {"limit": limit})
+
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertEqual(len(response.data["data"]), 1)
+            self.assertIsNotNone(response.data["next_cursor"])
+
+
+class GeneralHistoryExportTests(APITestCase):
+
+    def setUp(self):
+        import datetime
+        from django.contrib.auth import get_user_model
+        for amount, created_at in (("1.00", "2026-01-01T00:00:00"), ("2.00", "2026-01-01T23:59:59"),
+                                   ("3.00", "2026-01-02T00:00:00")):
+            payment = PaymentRequest.objects.create(payer_account_id=1000000001, payee_account_id=1000000002,
+                                                    amount=amount, payment_type="INTERNAL")
+            PaymentRequest.objects.filter(pk=payment.pk).update(
+                created_at=datetime.datetime.fromisoformat(created_at).replace(tzinfo=datetime.timezone.utc))
+        self.client.force_authenticate(user=get_user_model().objects.create_user(username='reports', password='pw'))
+
+    def test_export_streams_the_inclusive_date_range(self):
+        import json
+
+        response = self.client.get(reverse('payment_api:general_history'),
+                                   {"export": "ndjson", "start": "2026-01-01", "end": "2026-01-01"})
+
+        self.assertTrue(response.streaming)
+        rows = [json.loads(line) for line in b"".join(response.streaming_content).decode().splitlines()]
+        self.assertEqual(sorted(row["amount"] for row in rows), ["1.00", "2.00"])
+
+
+class ReconciliationFeedTests(APITestCase):
+
+    def setUp(self):
+        for amount in ("1.00", "2.00"):
+            PaymentRequest.objects.create(payer_account_id=1000000001, payee_account_id=1000000002,
+                                          amount=amount, payment_type="INTERNAL")
+
+    def _caller(self, user_id, is_staff=False):
+        from django.contrib.auth import get_user_model
+        user, _ = get_user_model().objects.get_or_create(id=user_id, defaults={'username': f"caller-{user_id}",
+                                                                               'is_staff': is_staff})
+        self.client.force_authenticate(user=user)
+
+    @override_settings(RECONCILIATION_SERVICE_USER_ID=1)
+    def test_feed_is_limited_to_staff_and_the_service_user(self):
+        url = reverse('payment_api:reconciliation_feed')
+
+        self._caller(5)
+        refused = self.client.get(url)
+        self._caller(6, is_staff=True)
+        staff = self.client.get(url)
+        self._caller(1)
+        service = self.client.get(url)
+
+        self.assertEqual(refused.status_code, status.HTTP_403_FORBIDDEN)
+        self.assertEqual(len(staff.data["data"]), 2)
+        self.assertEqual(len(service.data["data"]), 2)
+
+    @override_settings(RECONCILIATION_SERVICE_USER_ID=1)
+    def test_non_positive_limit_is_clamped_to_one(self):
+        self._caller(1)
+
+        response = self.client.get(reverse('payment_api:reconciliation_feed'), {"limit": 0})
+
+        self.assertEqual(len(response.data["data"]), 1)
+        self.assertIsNotNone(response.data["next_cursor"])
+
+    @override_settings(RECONCILIATION_SERVICE_USER_ID=None)
+    def test_feed_is_closed_to_non_staff_when_no_service_user_is_set(self):
+        self._caller(1)
+
+        response = self.client.get(reverse('payment_api:reconciliation_feed'))
+
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+
+class ServiceTokenCacheTests(SimpleTestCase):
+
+    def setUp(self):
+        from . import account_service_client as client
+        self.client_module = client
+        client._service_token_cache.clear()
+        client._service_token_stats.update(hits=0, misses=0)
+
+    def test_token_is_reused_for_same_user(self):
+        first = self.client_module.generate_service_token(7)
+        second = self.client_module.generate_service_token(7)
+
+        self.assertEqual(first, second)
+        self.assertEqual(self.client_module.service_token_cache_stats()["hits"], 1)
+        self.assertEqual(self.client_module.service_token_cache_stats()["misses"], 1)
+
+    @patch('payment.account_service_client.SERVICE_TOKEN_CACHE_SIZE', 2)
+    def test_least_recently_used_user_is_evicted(self):
+        for user_id in (1, 2, 3):
+            self.client_module.generate_service_token(user_id)
+
+        self.assertNotIn("1", self.client_module._service_token_cache)
+        self.assertEqual(self.client_module.service_token_cache_stats()["size"], 2)
+
+
+class TransferGrantCacheTests(SimpleTestCase):
+
+    def setUp(self):
+        from . import account_service_client as client
+        self.client_module = client
+        client._transfer_grants.clear()
+
+    def _response(self, data):
+        response = MagicMock()
+        response.json.return_value = {"message": "Valid" if data["validity"] else "Invalid", "data": data}
+        return response
+
+    @patch('payment.account_service_client.account_service_session')
+    def test_issued_grant_is_presented_on_the_next_check(self, mock_session):
+        mock_session.post.side_effect = [
+            self._response({"validity": True, "grant": "signed-grant", "grant_expires_in": 300}),
+            self._response({"validity": True, "grant": "signed-grant"}),
+        ]
+
+        self.client_module.verify_pin(7, "1000000001", "1234", "50.00")
+        self.client_module.verify_pin(7, "1000000001", "1234", "20.00")
+
+        first, second = (call.kwargs["json"] for call in mock_session.post.call_args_list)
+        self.assertNotIn("grant", first)
+        self.assertEqual(second["grant"], "signed-grant")
+        self.assertEqual(second["amount"], "20.00")
+
+    @patch('payment.account_service_client.account_service_session')
+    def test_failed_check_drops_the_grant(self, mock_session):
+        import requests
+
+        # The account service answers a wrong PIN with a 403, so raise_for_status() raises
+        rejected = self._response({"validity": False})
+        rejected.status_code = 403
+        rejected.raise_for_status.side_effect = requests.exceptions.HTTPError("403 Client Error: Forbidden")
+        mock_session.post.side_effect = [
+            self._response({"validity": True, "grant": "signed-grant", "grant_expires_in": 300}),
+            rejected,
+        ]
+
+        self.client_module.verify_pin(7, "1000000001", "1234")
+        self.assertIn(("account", "7"), self.client_module._transfer_grants)
+        result = self.client_module.verify_pin(7, "1000000001", "9999")
+
+        self.assertFalse(result["validity"])
+        self.assertNotIn(("account", "7"), self.client_module._transfer_grants)
+
+
+class OutboxTests(TestCase):
+
+    def test_event_is_discarded_with_a_rolled_back_transaction(self):
+        from django.db import transaction
+        from .models import OutboxEvent
+        from .outbox import record_event
+
+        try:
+            with transaction.atomic():
+                record_event("payment.payment.completed", {"reference": "abc"})
+                raise RuntimeError("worker died")
+        except RuntimeError:
+            pass
+
+        self.assertFalse(OutboxEvent.objects.exists())
+
+    def test_relay_publishes_in_order_and_marks_published(self):
+        from .models import OutboxEvent
+        from .outbox import record_event, relay_pending_events
+
+        record_event("payment.payment.completed", {"reference": "first"})
+        record_event("payment.card.charge", {"reference": "second"})
+        producer = MagicMock()
+
+        sent = relay_pending_events(producer, batch_size=10)
+
+        self.assertEqual(sent, 2)
+        keys = [call.kwargs['routing_key'] for call in producer.publish.call_args_list]
+        self.assertEqual(keys, ["payment.payment.completed", "payment.card.charge"])
+        self.assertFalse(OutboxEvent.objects.filter(published_at__isnull=True).exists())
+
+
+class IdempotencyKeyTests(TestCase):
+
+    def test_same_key_and_body_replays_the_stored_response(self):
+        from .idempotency import get_stored_response, store_response
+
+        data = {"payee_account_id": "0123456789", "amount": "50.00"}
+        store_response(7, "retry-1", data, {"status": "Processing"})
+
+        replay = get_stored_response(7, "retry-1", data)
+
+        self.assertEqual(replay.status_code, 200)
+        self.assertEqual(replay.data, {"status": "Processing"})
+        self.assertEqual(replay['Idempotent-Replayed'], 'true')
+
+    def test_same_key_with_a_different_body_is_rejected(self):
+        from .idempotency import get_stored_response, store_response
+
+        store_response(7, "retry-2", {"amount": "50.00"}, {"status": "Processing"})
+
+        self.assertEqual(get_stored_response(7, "retry-2", {"amount": "5000.00"}).status_code, 422)
+        self.assertIsNone(get_stored_response(8, "retry-2", {"amount": "50.00"}))
+
+    def test_stored_hash_does_not_depend_on_credentials(self):
+        import hashlib
+        import json
+        from .idempotency import store_response
+        from .models import IdempotencyKey
+
+        data = {"payer_account_id": "0123456789", "amount": "50.00", "pin": "1234"}
+        store_response(7, "retry-3", data, {"status": "Processing"})
+        store_response(7, "retry-4", {**data, "pin": "9999"}, {"status": "Processing"})
+
+        hashes = set(IdempotencyKey.objects.filter(key__in=["retry-3", "retry-4"]).values_list('request_hash', flat=True))
+        self.assertEqual(len(hashes), 1)
+        # Not an unkeyed digest of the body either, with or without the PIN
+        for body in (data, {"payer_account_id": "0123456789", "amount": "50.00"}):
+            self.assertNotIn(hashlib.sha256(json.dumps(body, sort_keys=True).encode()).hexdigest(), hashes)
+
+
+class CircuitBreakerTests(SimpleTestCase):
+
+    def make_breaker(self, **kwargs):
+        from .circuit_breaker import CircuitBreaker
+        options = dict(error_rate=0.5, slow_call_ms=100, min_calls=4, window_seconds=30, open_seconds=10)
+        options.update(kwargs)
+        return CircuitBreaker("test", **options)
+
+    def test_trips_on_error_rate_and_rejects_while_open(self):
+        breaker = self.make_breaker()
+        for ok in (True, False, False, True):
+            self.assertTrue(breaker.allow())
+            breaker.record(5, ok=ok)
+
+        self.assertEqual(breaker.state()["state"], "open")
+        self.assertFalse(breaker.allow())
+        self.assertEqual(breaker.state()["rejected"], 1)
+
+    def test_trips_on_p95_latency(self):
+        breaker = self.make_breaker()
+        for _ in range(4):
+            breaker.record(250, ok=True)
+
+        self.assertEqual(breaker.state()["state"], "open")
+
+    def test_half_open_allows_one_probe_and_closes_on_success(self):
+        breaker = self.make_breaker(open_seconds=0)
+        for _ in range(4):
+            breaker.record(5, ok=False)
+
+        probe = breaker.allow()
+        self.assertTrue(probe)
+        self.assertFalse(breaker.allow())       # everyone else waits for it
+        breaker.record(5, ok=True, ticket=probe)
+
+        self.assertEqual(breaker.state()["state"], "closed")
+        self.assertTrue(breaker.allow())
+
+    def test_only_the_probe_settles_the_half_open_state(self):
+        breaker = self.make_breaker(open_seconds=0)
+        early, late = breaker.allow(), breaker.allow()      # let through while closed
+        for _ in range(4):
+            breaker.record(5, ok=False)
+
+        probe = breaker.allow()
+        breaker.record(5, ok=True, ticket=early)            # stale success: stays half-open
+        self.assertFalse(breaker.allow())
+        breaker.record(5, ok=False, ticket=late)            # stale failure: does not re-trip
+        self.assertFalse(breaker.allow())
+        self.assertEqual(breaker.state()["trips"], 1)
+
+        breaker.record(5, ok=True, ticket=probe)
+        self.assertEqual(breaker.state()["state"], "closed")
+
+    def test_batch_calls_are_judged_by_their_own_breaker(self):
+        from . import account_service_client as client
+        from .circuit_breaker import account_batch_breaker, account_breaker
+
+        batch_adapter = client.account_batch_session.get_adapter(client.ACCOUNT_SERVICE_BASE_URL)
+        payment_adapter = client.account_service_session.get_adapter(client.ACCOUNT_SERVICE_BASE_URL)
+
+        self.assertIs(batch_adapter.breaker, account_batch_breaker)
+        self.assertIs(payment_adapter.breaker, account_breaker)
+        self.assertGreater(account_batch_breaker.slow_call_ms, account_breaker.slow_call_ms)
+
+
+class FraudClientTests(SimpleTestCase):
+
+    def setUp(self):
+        from collections import deque
+        from . import fraud_client
+
+        # Fresh per-process latency stats for every test
+        for name, value in (('_latency_samples', deque(maxlen=1000)),
+                            ('_latency_stats', {"calls": 0, "errors": 0, "total_ms": 0.0, "max_ms": 0.0})):
+            patcher = patch.object(fraud_client, name, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_checks_reuse_the_pooled_session(self):
+        from . import fraud_client
+        from .circuit_breaker import CircuitBreakerAdapter
+
+        response = MagicMock(status_code=200)
+        response.json.return_value = {"is_fraud": False, "risk_score": 0.1, "reason": "ok"}
+        with patch.object(fraud_client.fraud_service_session, 'post', return_value=response) as post:
+            fraud_client.check_for_fraud({"amount": 10})
+            fraud_client.check_for_fraud({"amount": 20})
+
+        self.assertEqual(post.call_count, 2)
+        self.assertEqual(post.call_args.kwargs["timeout"], fraud_client.FRAUD_TIMEOUT)
+        adapter = fraud_client.fraud_service_session.get_adapter(fraud_client.FRAUD_SERVICE_BASE_URL)
+        self.assertIsInstance(adapter, CircuitBreakerAdapter)
+        self.assertEqual(adapter.max_retries.read, 0)
+
+    def test_timeout_fails_open_and_counts_an_error(self):
+        import requests
+        from . import fraud_client
+
+        with patch.object(fraud_client.fraud_service_session, 'post',
+                          side_effect=requests.exceptions.ReadTimeout("read timed out")):
+            result = fraud_client.check_for_fraud({"amount": 10}, timeout=0.1)
+
+        self.assertFalse(result["is_fraud"])
+        stats = fraud_client.fraud_latency_stats()
+        self.assertEqual((stats["calls"], stats["errors"]), (1, 1))
+
+    def test_latency_stats_report_percentiles(self):
+        from . import fraud_client
+
+        for duration_ms in range(1, 101):
+            fraud_client._record_latency(float(duration_ms))
+
+        stats = fraud_client.fraud_latency_stats()
+        self.assertEqual(stats["calls"], 100)
+        self.assertEqual((stats["p50_ms"], stats["p95_ms"], stats["max_ms"]), (51.0, 96.0, 100.0))
+        self.assertAlmostEqual(stats["avg_ms"], 50.5)
+
+class ShardRoutingTests(SimpleTestCase):
+
+    def test_account_always_maps_to_the_same_queue(self):
+        from .sharding import transfer_queue
+        self.assertEqual(transfer_queue("0123456789"), transfer_queue("0123456789"))
+        self.assertTrue(transfer_queue("0123456789").startswith("payment.transfer.shard."))
+
+    def test_adding_a_shard_moves_few_accounts(self):
+        from .sharding import shard_for_account
+        accounts = [f"{n:010d}" for n in range(2000)]
+        moved = sum(shard_for_account(a, 4) != shard_for_account(a, 5) for a in accounts)
+
+        self.assertEqual({shard_for_account(a, 4) for a in accounts}, {0, 1, 2, 3})
+        self.assertLess(moved, len(accounts) * 0.3)   # ~1/5 expected, not a full reshuffle
+
+
+class PaymentSagaTests(TestCase):
+
+    def setUp(self):
+        from .models import PaymentAccount, PaymentSaga
+        PaymentAccount.objects.create(user_id=1, account_number="1000000001")
+        PaymentAccount.objects.create(user_id=2, account_number="1000000002")
+        self.payment = PaymentRequest.objects.create(payer_account_id=1000000001, payee_account_id=1000000002,
+                                                     amount="25.00", payment_type="INTERNAL_TRANSFER")
+        self.saga = PaymentSaga.objects.create(payment=self.payment, context={"user_id": "1"})
+
+    def test_credited_saga_is_rolled_forward_once(self):
+        from .models import OutboxEvent
+        from .saga import advance, resume_saga, complete_saga
+
+        advance(self.saga, "CREDITED")
+        self.assertEqual(resume_saga(self.saga), "completed")
+        complete_saga(self.saga)
+
+        self.payment.refresh_from_db()
+        self.assertEqual(self.payment.status, "COMPLETED")
+        self.assertEqual(OutboxEvent.objects.filter(routing_key="payment.payment.completed").count(), 1)
+
+    @patch('payment.saga.transfer_funds', return_value={"status": "failed", "message": "timeout", "retryable": True})
+    def test_unknown_transfer_outcome_is_compensated_after_max_attempts(self, _transfer):
+        from .saga import advance, resume_saga, SAGA_MAX_ATTEMPTS
+
+        advance(self.saga, "TRANSFER_SENT")
+        self.saga.attempts = SAGA_MAX_ATTEMPTS - 1
+
+        self.assertEqual(resume_saga(self.saga), "compensating")
+        self.saga.refresh_from_db()
+        self.assertEqual(self.saga.state, "COMPENSATING")
+
+
+class PaymentChecksTests(SimpleTestCase):
+
+    VALID = {"data": {"validity": True}}
+    INVALID = {"data": {"validity": False}}
+
+    @override_settings(PAYMENT_CONCURRENT_CHECKS=True)
+    def test_bad_pin_fails_fast_without_waiting_for_fraud(self):
+        import threading
+        from .tasks import run_payment_checks
+
+        release = threading.Event()
+        def slow_fraud(_payload):
+            release.wait(5)
+            return {"is_fraud": False}
+
+        try:
+            with patch('payment.tasks.check_for_fraud', side_effect=slow_fraud):
+                auth, fraud = run_payment_checks(lambda: self.INVALID, {"amount": 10})
+                self.assertFalse(release.is_set())      # Returned while fraud scoring was still running
+        finally:
+            release.set()
+
+        self.assertEqual((auth, fraud), (self.INVALID, {}))
+
+    @override_settings(PAYMENT_CONCURRENT_CHECKS=True)
+    @patch('payment.tasks.check_for_fraud', return_value={"is_fraud": True, "reason": "velocity"})
+    def test_fraud_rejection_is_returned_without_the_auth_result(self, _fraud):
+        import threading
+        from .tasks import run_payment_checks
+
+        release = threading.Event()
+        def slow_auth():
+            release.wait(5)
+            return self.VALID
+
+        try:
+            auth, fraud = run_payment_checks(slow_auth, {"amount": 10})
+        finally:
+            release.set()
+
+        self.assertIsNone(auth)
+        self.assertEqual(fraud["reason"], "velocity")
+
+    @override_settings(PAYMENT_CONCURRENT_CHECKS=False)
+    @patch('payment.tasks.check_for_fraud', return_value={"is_fraud": False})
+    def test_sequential_fallback_skips_fraud_after_a_bad_pin(self, fraud):
+        from .tasks import run_payment_checks
+
+        self.assertEqual(run_payment_checks(lambda: self.INVALID, {"amount": 10}), (self.INVALID, {}))
+        fraud.assert_not_called()
+
+        self.assertEqual(run_payment_checks(lambda: self.VALID, {"amount": 10}), (self.VALID, {"is_fraud": False}))
+        fraud.assert_called_once_with({"amount": 10})
+
+@patch('payment.tasks.run_payment_checks', return_value=({"data": {"validity": True}}, {"is_fraud": False}))
+class BulkTransferTests(TestCase):
+
+    def setUp(self):
+        self.payments = [PaymentRequest.objects.create(payer_account_id=1000000001, payee_account_id=1000000002,
+                                                       amount="10.00", payment_type="INTERNAL")
+                         for _ in range(2)]
+        self.data = {"user_id": 1, "payer_account_id": 1000000001, "pin": "1234", "batch_id": "batch-1",
+                     "payment_ids": [str(payment.id) for payment in self.payments]}
+
+    @patch('payment.tasks.transfer_funds_batch', return_value={"status": "failed", "message": "timeout",
+                                                               "retryable": True})
+    def test_unknown_outcome_is_retried_not_failed(self, _batch, _checks):
+        from celery.exceptions import Retry
+        from .tasks import process_bulk_transfer
+
+        with patch.object(process_bulk_transfer, 'retry', side_effect=Retry()) as retry:
+            with self.assertRaises(Retry):
+                process_bulk_transfer.run(self.data)
+
+        self.assertEqual(retry.call_args.kwargs["max_retries"], 3)
+        self.assertEqual(PaymentRequest.objects.filter(status="PENDING").count(), 2)
+
+    @patch('payment.tasks.transfer_funds_batch')
+    def test_duplicate_rows_are_completed(self, batch, _checks):
+        from .tasks import process_bulk_transfer
+        batch.return_value = {"status": "success", "results": [
+            {"reference": str(payment.id), "status": "success", "duplicate": True} for payment in self.payments]}
+
+        process_bulk_transfer.run(self.data)
+
+        self.assertEqual(PaymentRequest.objects.filter(status="COMPLETED").count(), 2)
+
+
+class LoanRepaymentRunTests(TestCase):
+
+    @patch('payment.tasks.settle_due_loan_repayments')
+    def test_each_chunk_is_recorded_with_one_batched_event(self, settle):
+        from .models import OutboxEvent
+        from .tasks import run_due_loan_repayments
+
+        def row(n, outcome):
+            return {"reference": f"loan:{n}:2026-01-01", "loan_id": str(n), "user_id": n,
+                    "account_number": f"300000000{n}", "amount": "100.00", "status": outcome}
+        settle.side_effect = [
+            {"status": "success", "results": [row(1, "success"), row(2, "failed")], "next_cursor": "2"},
+            {"status": "success", "results": [row(3, "success")], "next_cursor": None},
+        ]
+
+        totals = run_due_loan_repayments(run_date="2026-01-01")
+
+        self.assertEqual(totals, {"success": 2, "failed": 1})
+        self.assertEqual(settle.call_args_list[1].kwargs["after"], "2")
+        self.assertEqual(PaymentRequest.objects.filter(status="COMPLETED", payee_account_id=1).count(), 2)
+        events = OutboxEvent.objects.filter(routing_key="payment.loan.repayment")
+        self.assertEqual(events.count(), 2)
+        self.assertEqual(len(events.first().payload["batch"]), 1)
+
+    @patch('payment.tasks.settle_due_loan_repayments')
+    def test_retry_records_a_chunk_whose_response_was_lost(self, settle):
+        from .models import OutboxEvent
+        from .tasks import run_due_loan_repayments
+
+        def row(n, **extra):
+            return {"reference": f"loan:{n}:2026-01-01", "loan_id": str(n), "user_id": n,
+                    "account_number": f"300000000{n}", "amount": "100.00", "status": "success", **extra}
+        PaymentRequest.objects.create(payer_account_id=3000000001, payee_account_id=1, amount="100.00",
+                                      status="COMPLETED", payment_type="INTERNAL TRANSFER",
+                                      metadata={'TYPE': 'LOAN REPAYMENT', 'REFERENCE': "loan:1:2026-01-01"})
+        # Loan 1's chunk was recorded before the failure, loan 2's response was lost
+        settle.return_value = {"status": "success", "next_cursor": None,
+                               "results": [row(1, replayed=True), row(2, replayed=True), row(3)]}
+
+        totals = run_due_loan_repayments(run_date="2026-01-01", started_at="2026-01-01T02:00:00+00:00")
+
+        self.assertEqual(settle.call_args.kwargs["settled_since"], "2026-01-01T02:00:00+00:00")
+        self.assertEqual(totals, {"success": 2, "failed": 0})
+        self.assertEqual(PaymentRequest.objects.filter(payee_account_id=1).count(), 3)
+        batch = OutboxEvent.objects.get(routing_key="payment.loan.repayment").payload["batch"]
+        self.assertEqual([entry["loan_id"] for entry in batch], ["2", "3"])
+
+
+class StuckPaymentSweeperTests(TestCase):
+
+    def _stuck_payment(self, **fields):
+        from datetime import timedelta
+        from django.utils import timezone
+        payment = PaymentRequest.objects.create(payer_account_id=1000000001, payee_account_id=1000000002,
+                                                amount="10.00", payment_type="INTERNAL_TRANSFER", **fields)
+        PaymentRequest.objects.filter(id=payment.id).update(created_at=timezone.now() - timedelta(hours=1))
+        return payment
+
+    def test_backoff_is_jittered_and_capped(self):
+        from .sweeper import backoff_seconds
+
+        delays = [backoff_seconds(attempt, base=30, cap=3600) for attempt in range(20)]
+
+        self.assertTrue(all(0 <= delay <= 3600 for delay in delays))
+        self.assertGreater(len(set(delays)), 1)
+
+    def test_payment_that_never_started_is_dead_lettered_after_max_attempts(self):
+        from .sweeper import claim_stuck_payments, PENDING_MAX_ATTEMPTS
+
+        payment = self._stuck_payment(attempts=PENDING_MAX_ATTEMPTS)
+
+        to_redrive, dead_lettered = claim_stuck_payments()
+
+        payment.refresh_from_db()
+        self.assertEqual((to_redrive, dead_lettered), ([], 1))
+        self.assertEqual(payment.status, "DEAD_LETTER")
+
+    def test_stalled_saga_is_redriven_and_not_claimed_again_until_its_backoff_expires(self):
+        from datetime import timedelta
+        from django.utils import timezone
+        from .models import PaymentSaga
+        from .sweeper import claim_stuck_payments
+
+        payment = self._stuck_payment()
+        saga = PaymentSaga.objects.create(payment=payment, step="TRANSFER_SENT")
+        PaymentSaga.objects.filter(pk=saga.pk).update(updated_at=timezone.now() - timedelta(hours=1))
+
+        first, _ = claim_stuck_payments()
+        PaymentRequest.objects.filter(id=payment.id).update(next_attempt_at=timezone.now() + timedelta(minutes=5))
+        second, _ = claim_stuck_payments()
+
+        self.assertEqual(first, [payment.id])
+        self.assertEqual(second, [])
+
+
+class AccountCacheTests(TestCase):
+
+    def setUp(self):
+        from . import account_cache
+        account_cache._account_cache.clear()
+
+    def test_miss_falls_back_to_one_query_then_hits(self):
+        from .models import PaymentAccount
+        from .account_cache import user_ids_for
+
+        PaymentAccount.objects.create(user_id=7, account_number="1000000007")
+        PaymentAccount.objects.create(user_id=8, account_number="1000000008")
+
+        with self.assertNumQueries(1):
+            self.assertEqual(user_ids_for(["1000000007", "1000000008"]), {"1000000007": 7, "1000000008": 8})
+        with self.assertNumQueries(0):
+            self.assertEqual(user_ids_for([1000000007]), {"1000000007": 7})
+
+    def test_updated_event_invalidates_the_entry(self):
+        from .models import PaymentAccount
+        from .account_cache import remember, user_ids_for
+        from .tasks import consume_BankAccount_updated
+
+        PaymentAccount.objects.create(user_id=9, account_number="1000000009")
+        remember("1000000009", 9)
+
+        consume_BankAccount_updated({"account_number": "1000000009", "user_id": 10, "currency": "NGN"})
+
+        self.assertEqual(user_ids_for(["1000000009"]), {"1000000009": 10})
+
+
+class StageMetricsTests(SimpleTestCase):
+
+    def test_stage_timer_records_into_the_histogram(self):
+        from prometheus_client import REGISTRY
+        from .instrumentation import stage_timer
+
+        labels = {"flow": "internal", "stage": "transfer"}
+        before = REGISTRY.get_sample_value("payment_stage_seconds_count", labels) or 0
+
+        with stage_timer("internal", "transfer"):
+            pass
+
+        self.assertEqual(REGISTRY.get_sample_value("payment_stage_seconds_count", labels), before + 1)
+
+
+class BenchmarkHarnessTests(SimpleTestCase):
+
+    def test_account_stand_in_applies_a_reference_once_and_records_lock_waits(self):
+        from decimal import Decimal
+        from .benchmark import AccountStandIn
+
+        stand_in = AccountStandIn(opening_balance=Decimal('10'))
+        stand_in.transfer("ref-1", "A", "B", Decimal('4'))
+        body, status = stand_in.transfer("ref-1", "A", "B", Decimal('4'))
+        stand_in.server_close()
+
+        self.assertTrue(body["duplicate"])
+        self.assertEqual(stand_in.balances["A"], Decimal('6'))
+        self.assertEqual(len(stand_in.lock_waits), 2)
+
+    def test_compare_flags_throughput_and_tail_latency_regressions(self):
+        from .benchmark import compare
+
+        baseline = {"throughput_tps": 100, "latency_ms": {"p95": 50, "p99": 80}}
+        slower = {"throughput_tps": 80, "latency_ms": {"p95": 70, "p99": 82}}
+
+        self.assertEqual(len(compare(slower, baseline, 0.10)), 2)
+        self.assertEqual(compare(baseline, baseline, 0.10), [])
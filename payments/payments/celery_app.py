@@ -1,7 +1,9 @@
 import os
 
 from celery import Celery, bootsteps
-from .settings import CELERY_BROKER_URL
+from celery.schedules import crontab
+from celery.signals import worker_ready, worker_process_init
+from .settings import CELERY_BROKER_URL, PAYMENT_SHARD_COUNT, LOAN_REPAYMENT_RUN_HOUR
 from kombu import Exchange, Queue, Consumer
 
 # Set the default Django settings module for the 'celery' program.
@@ -25,6 +27,9 @@ account_exchange = Exchange("account_service", type="topic", durable=True)
 payment_exchange = Exchange("payment", type="topic", durable=True)
 ledger_exchange = Exchange("ledger_service", type="topic")
 identity_exchange = Exchange("Identity_service", type="topic", durable=True)
+# Direct exchange for the account-sharded transfer queues (kept off the "payment" topic
+# exchange so the ledger's payment.# binding never sees task messages)
+transfer_exchange = Exchange("payment.transfers", type="direct", durable=True)
 
 
 #PRODUCERS & CONSUMERS
@@ -74,6 +79,15 @@ app.conf.task_queues = [
           routing_key="payment.loan.repayment", durable=True),
 ]
 
+# ACCOUNT-SHARDED TRANSFER QUEUES (see payment/sharding.py)
+# One queue per shard, each drained by its own single-process worker
+from payment.sharding import shard_queue_name
+
+app.conf.task_queues += [
+    Queue(shard_queue_name(i), transfer_exchange, routing_key=shard_queue_name(i), durable=True)
+    for i in range(PAYMENT_SHARD_COUNT)
+]
+
 app.conf.task_routes = {
     # Outbound publisher tasks
     
@@ -81,6 +95,9 @@ app.conf.task_routes = {
         'queue': 'payment.internal',
         "routing_key": "payment.payment.completed"
     },
+    "publish.payment.bulk.transfer": {
+        'queue': 'payment.internal',
+    },
     "publish.payment.card.charge": {
         "queue": "payment.card.charge",
         "routing_key": "payment.card.charge"
@@ -99,6 +116,7 @@ app.conf.task_routes = {
         "queue": 'payment.loan.repayment',
         "routing_key": "payment.loan.repayment"
     },
+    "payment.loan.repayment.run_due": {'queue': 'payment.internal'},
 
     # Consumers
     'consume.payment.*': {'queue': 'payment.internal'},
@@ -125,6 +143,15 @@ app.conf.task_routes = {
 }
 
 
+# Scheduled jobs (celery -A payments beat, see docker-compose payments_beat)
+app.conf.beat_schedule = {
+    'daily-loan-repayment-run': {
+        'task': 'payment.loan.repayment.run_due',
+        'schedule': crontab(hour=LOAN_REPAYMENT_RUN_HOUR, minute=0),
+    },
+}
+
+
 
 # B. The "Catch-All" Event Queue
 # Listens to "Identity_service.#" -> Everything starting with payment.
@@ -187,6 +214,7 @@ class EventRouter(bootsteps.ConsumerStep):
                 'Identity_service.staff.created': 'consume.payment.staff.created',
                 'Identity_service.user.logged_in':   'consume.payment.user.logged_in',
                 'account_service.BankAccount.created': 'consume.payment.BankAccount.created',
+                'account_service.BankAccount.updated': 'consume.payment.BankAccount.updated',
                 'account_service.loan.updated': 'consume.payment.loan.updated',
             }
 
@@ -215,4 +243,27 @@ app.steps['consumer'].add(EventRouter)
 
 @app.task(bind=True, ignore_result=True)
 def debug_task(self):
-    print(f'Request: {self.request!r}')
\ No newline at end of file
+    print(f'Request: {self.request!r}')
+
+
+# Worker metrics (Prometheus): served by the main worker process on METRICS_PORT,
+# aggregated over all pool processes through PROMETHEUS_MULTIPROC_DIR
+@worker_ready.connect
+def start_metrics_server(**kwargs):
+    port = os.environ.get('METRICS_PORT')
+    if port:
+        from payments.metrics import start_worker_metrics_server
+        start_worker_metrics_server(int(port))
+
+
+# Warm each pool process's account_number -> user_id cache (payment/account_cache.py)
+@worker_process_init.connect
+def warm_account_cache(**kwargs):
+    from django.conf import settings
+    if getattr(settings, 'ACCOUNT_CACHE_WARM_UP', True):
+        from payment.account_cache import warm_up
+        try:
+            print(f"Account cache warmed with {warm_up()} accounts")
+        except Exception as exc:
+            # A cold cache only costs DB lookups; never stop the worker over it
+            print(f"Account cache warm-up failed: {exc}")
@@ -79,6 +79,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'payments.metrics.MetricsMiddleware',   # first, so it times the whole stack
     'django.middleware.security.SecurityMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware', 
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -143,6 +144,91 @@ CELERY_TASK_REJECT_ON_WORKER_LOST = True
 CELERY_TASK_TRACK_STARTED = True
 CELERY_TASK_DEFAULT_QUEUE = 'payment.internal'
 
+# Transfers are routed by payer account onto this many shard queues (payment/sharding.py).
+# Each shard needs its own worker: celery -A payments worker -Q payment.transfer.shard.<n> -c 1
+PAYMENT_SHARD_COUNT = int(os.environ.get('PAYMENT_SHARD_COUNT', 4))
+
+# Bulk / payroll transfers: max rows accepted in one request
+BULK_TRANSFER_MAX_ROWS = int(os.environ.get('BULK_TRANSFER_MAX_ROWS', 1000))
+
+# Per-worker cache of signed service JWTs (LRU, keyed by user_id)
+SERVICE_TOKEN_CACHE_SIZE = int(os.environ.get('SERVICE_TOKEN_CACHE_SIZE', 1024))
+
+# Per-worker cache of transfer grants from the account service (LRU, keyed by user and
+# account/card); a grant lets the next PIN check skip PBKDF2
+TRANSFER_GRANT_CACHE_SIZE = int(os.environ.get('TRANSFER_GRANT_CACHE_SIZE', 10000))
+
+# Run PIN/card verification and fraud scoring concurrently (one round trip instead of two)
+PAYMENT_CONCURRENT_CHECKS = os.environ.get('PAYMENT_CONCURRENT_CHECKS', 'True') == 'True'
+PAYMENT_CHECK_THREADS = int(os.environ.get('PAYMENT_CHECK_THREADS', 4))
+
+# Fraud service client: keep-alive pool size per worker and timeout budget (seconds)
+FRAUD_SERVICE_URL = os.environ.get('FRAUD_SERVICE_URL', 'http://fraud:8006')
+FRAUD_POOL_SIZE = int(os.environ.get('FRAUD_POOL_SIZE', 10))
+FRAUD_CONNECT_TIMEOUT = float(os.environ.get('FRAUD_CONNECT_TIMEOUT', 0.5))
+FRAUD_READ_TIMEOUT = float(os.environ.get('FRAUD_READ_TIMEOUT', 2))
+
+# Transactional outbox relay (manage.py relay_outbox)
+OUTBOX_BATCH_SIZE = int(os.environ.get('OUTBOX_BATCH_SIZE', 200))
+OUTBOX_RETENTION_DAYS = int(os.environ.get('OUTBOX_RETENTION_DAYS', 7))
+
+# Idempotency-Key replay window for payment initiation endpoints
+IDEMPOTENCY_KEY_TTL_HOURS = int(os.environ.get('IDEMPOTENCY_KEY_TTL_HOURS', 24))
+
+# Payment saga recovery (manage.py resume_sagas): a RUNNING saga untouched for this long is
+# resumed; after SAGA_MAX_ATTEMPTS unknown transfer outcomes it is compensated
+SAGA_STUCK_SECONDS = int(os.environ.get('SAGA_STUCK_SECONDS', 120))
+SAGA_MAX_ATTEMPTS = int(os.environ.get('SAGA_MAX_ATTEMPTS', 5))
+
+# Stuck-PENDING sweeper (payment/sweeper.py): age before a PENDING payment is swept, sweeps
+# before one that never reached a worker is dead-lettered, and the jittered backoff between sweeps
+PENDING_STUCK_SECONDS = int(os.environ.get('PENDING_STUCK_SECONDS', 300))
+PENDING_MAX_ATTEMPTS = int(os.environ.get('PENDING_MAX_ATTEMPTS', 6))
+PENDING_BACKOFF_BASE_SECONDS = int(os.environ.get('PENDING_BACKOFF_BASE_SECONDS', 30))
+PENDING_BACKOFF_MAX_SECONDS = int(os.environ.get('PENDING_BACKOFF_MAX_SECONDS', 3600))
+
+# Worker-local account_number -> user_id cache (payment/account_cache.py)
+ACCOUNT_CACHE_SIZE = int(os.environ.get('ACCOUNT_CACHE_SIZE', 100000))
+ACCOUNT_CACHE_TTL_SECONDS = int(os.environ.get('ACCOUNT_CACHE_TTL_SECONDS', 3600))
+ACCOUNT_CACHE_WARM_UP = os.environ.get('ACCOUNT_CACHE_WARM_UP', 'True') == 'True'
+
+# Daily loan repayment run (Celery beat): hour of day, loans settled per account-service call,
+# and the Identity user the service token is signed for (no default: it must be the dedicated
+# service user the account service allows to run the collection)
+LOAN_REPAYMENT_RUN_HOUR = int(os.environ.get('LOAN_REPAYMENT_RUN_HOUR', 2))
+LOAN_REPAYMENT_CHUNK_SIZE = int(os.environ.get('LOAN_REPAYMENT_CHUNK_SIZE', 500))
+LOAN_ENGINE_SERVICE_USER_ID = (int(os.environ['LOAN_ENGINE_SERVICE_USER_ID'])
+                               if os.environ.get('LOAN_ENGINE_SERVICE_USER_ID') else None)
+
+# Identity user the ledger's reconciliation job signs its service tokens for; allowed on the
+# staff-only reconciliation feed. No default: while unset, only staff get in
+RECONCILIATION_SERVICE_USER_ID = (int(os.environ['RECONCILIATION_SERVICE_USER_ID'])
+                                  if os.environ.get('RECONCILIATION_SERVICE_USER_ID') else None)
+
+# Account service client timeout budget (seconds)
+ACCOUNT_CONNECT_TIMEOUT = float(os.environ.get('ACCOUNT_CONNECT_TIMEOUT', 0.5))
+ACCOUNT_READ_TIMEOUT = float(os.environ.get('ACCOUNT_READ_TIMEOUT', 3))
+
+# Circuit breakers (payment/circuit_breaker.py): trip when the rolling error rate or p95
+# latency over the window crosses the threshold, then fail fast for OPEN_SECONDS
+ACCOUNT_BREAKER_ERROR_RATE = float(os.environ.get('ACCOUNT_BREAKER_ERROR_RATE', 0.5))
+ACCOUNT_BREAKER_SLOW_CALL_MS = float(os.environ.get('ACCOUNT_BREAKER_SLOW_CALL_MS', 1000))
+ACCOUNT_BREAKER_MIN_CALLS = int(os.environ.get('ACCOUNT_BREAKER_MIN_CALLS', 20))
+ACCOUNT_BREAKER_WINDOW_SECONDS = int(os.environ.get('ACCOUNT_BREAKER_WINDOW_SECONDS', 30))
+ACCOUNT_BREAKER_OPEN_SECONDS = int(os.environ.get('ACCOUNT_BREAKER_OPEN_SECONDS', 10))
+FRAUD_BREAKER_ERROR_RATE = float(os.environ.get('FRAUD_BREAKER_ERROR_RATE', 0.5))
+FRAUD_BREAKER_SLOW_CALL_MS = float(os.environ.get('FRAUD_BREAKER_SLOW_CALL_MS', 500))
+FRAUD_BREAKER_MIN_CALLS = int(os.environ.get('FRAUD_BREAKER_MIN_CALLS', 20))
+FRAUD_BREAKER_WINDOW_SECONDS = int(os.environ.get('FRAUD_BREAKER_WINDOW_SECONDS', 30))
+FRAUD_BREAKER_OPEN_SECONDS = int(os.environ.get('FRAUD_BREAKER_OPEN_SECONDS', 10))
+# Bulk transfer / loan repayment chunk calls (30-60s budgets) are few and slow by design, so
+# they are judged on their own breaker instead of skewing the per-payment account breaker
+ACCOUNT_BATCH_BREAKER_ERROR_RATE = float(os.environ.get('ACCOUNT_BATCH_BREAKER_ERROR_RATE', 0.5))
+ACCOUNT_BATCH_BREAKER_SLOW_CALL_MS = float(os.environ.get('ACCOUNT_BATCH_BREAKER_SLOW_CALL_MS', 30000))
+ACCOUNT_BATCH_BREAKER_MIN_CALLS = int(os.environ.get('ACCOUNT_BATCH_BREAKER_MIN_CALLS', 5))
+ACCOUNT_BATCH_BREAKER_WINDOW_SECONDS = int(os.environ.get('ACCOUNT_BATCH_BREAKER_WINDOW_SECONDS', 600))
+ACCOUNT_BATCH_BREAKER_OPEN_SECONDS = int(os.environ.get('ACCOUNT_BATCH_BREAKER_OPEN_SECONDS', 60))
+
 
 # ==========================================
 # 5. REST FRAMEWORK
@@ -16,9 +16,11 @@ Including another URLconf
 """
 from django.contrib import admin
 from django.urls import path, include
+from .metrics import metrics_view
 
 urlpatterns = [
     path('admin/', admin.site.urls),
+    path('metrics', metrics_view, name='metrics'),      # Prometheus scrape target
     #path('payments/', include('payment.urls')),
     path('payment_api/', include('payment.api.urls', namespace='api')),
 ]